@@ -0,0 +1,316 @@
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+# Shared modules live in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic import (
+    SYNTHETIC_GAME_PREFIX, boxscore_payloads, camel_case_box, synthetic_player_box, synthetic_slate
+)
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+DEFAULT_SCALES = [1, 10, 100]
+
+# Per-call benchmarks (one game per call) stop after this many calls
+MAX_CALLS = 500
+
+BENCHMARKS = []
+
+
+def benchmark(name, needs_db=False, needs_redis=False):
+    """
+    Registers a benchmark. The decorated function takes the scale factor and
+    returns (call, iterations, cleanup): `call(i)` runs iteration i and returns
+    the number of rows it processed, and `cleanup` (or None) undoes any writes.
+    """
+    def register(func):
+        BENCHMARKS.append({"name": name, "func": func, "needs_db": needs_db, "needs_redis": needs_redis})
+        return func
+    return register
+
+
+@benchmark("calculate_FPTS")
+def bench_calculate_fpts(scale):
+    from update_player_box import calculate_FPTS
+    df = camel_case_box(synthetic_player_box(scale))
+    return (lambda i: len(calculate_FPTS(df))), 5, None
+
+
+@benchmark("prepare_dataframe_for_sql")
+def bench_prepare_dataframe(scale):
+    from update_player_box import prepare_dataframe_for_sql
+    df = camel_case_box(synthetic_player_box(scale))
+    return (lambda i: len(prepare_dataframe_for_sql(df))), 5, None
+
+
+@benchmark("build_boxscore_dataframe")
+def bench_build_boxscore(scale):
+    from update_player_box import build_boxscore_dataframe
+    payloads = list(boxscore_payloads(synthetic_player_box(scale)).items())
+    return (lambda i: len(build_boxscore_dataframe(*payloads[i]))), min(len(payloads), MAX_CALLS), None
+
+
+@benchmark("fetch_and_save_boxscore", needs_db=True)
+def bench_fetch_and_save(scale):
+    import update_player_box
+    from db import get_cursor
+    from features import refresh_player_features
+
+    player_box = synthetic_player_box(scale)
+    payloads = boxscore_payloads(player_box)
+    game_ids = list(payloads)[:MAX_CALLS]
+    # Serve payloads from memory instead of the stats CDN
+    update_player_box.fetch_boxscore = lambda game_id, **kwargs: payloads[game_id]
+
+    def call(i):
+        if not update_player_box.fetch_and_save_boxscore(game_ids[i], use_cache=False):
+            raise RuntimeError(f"fetch_and_save_boxscore failed for {game_ids[i]}")
+        return len(player_box[player_box['game_id'] == game_ids[i]])
+
+    def cleanup():
+        person_ids = player_box['personid'].unique()
+        with get_cursor() as cur:
+            cur.execute("DELETE FROM player_box WHERE game_id LIKE %s;", (SYNTHETIC_GAME_PREFIX + '%',))
+            update_player_box.refresh_player_fpm(cur, person_ids)
+            refresh_player_features(cur, person_ids)
+
+    return call, len(game_ids), cleanup
+
+
+@benchmark("process_salary_file", needs_db=True, needs_redis=True)
+def bench_process_salary_file(scale):
+    import main
+    from db import get_cursor
+
+    slate_id = f"bench{scale}x"
+    synthetic_slate(scale).to_csv(f"sal-{slate_id}.csv", index=False)
+
+    def call(i):
+        result = main.process_salary_file(slate_id)
+        if result.get("status") != "success":
+            raise RuntimeError(result.get("error"))
+        return result["processed_rows"]
+
+    def cleanup():
+        with get_cursor() as cur:
+            cur.execute("DELETE FROM dksal WHERE slateid = %s;", (slate_id,))
+
+    return call, 3, cleanup
+
+
+@benchmark("GET /get-slate-data (cold)")
+def bench_get_slate_data_cold(scale):
+    import main
+    from fastapi.testclient import TestClient
+    slate_id, rows = _write_processed_slate(scale)
+    client = TestClient(main.app)
+
+    def call(i):
+        main.slate_cache.entries.clear()
+        response = client.get(f"/get-slate-data/{slate_id}")
+        response.raise_for_status()
+        return rows
+
+    return call, 20, None
+
+
+@benchmark("GET /get-slate-data (cached)")
+def bench_get_slate_data_cached(scale):
+    import main
+    from fastapi.testclient import TestClient
+    slate_id, rows = _write_processed_slate(scale)
+    client = TestClient(main.app)
+    client.get(f"/get-slate-data/{slate_id}").raise_for_status()
+
+    def call(i):
+        client.get(f"/get-slate-data/{slate_id}").raise_for_status()
+        return rows
+
+    return call, 200, None
+
+
+@benchmark("GET /get-updated-data")
+def bench_get_updated_data(scale):
+    import main
+    from fastapi.testclient import TestClient
+    from projections import ProjectionFeed
+    rows = _write_projection_file(scale)
+    main.projection_feed = ProjectionFeed("bench_proj.csv")
+    client = TestClient(main.app)
+
+    def call(i):
+        # Touch the file so every call re-parses it, as after a projection update
+        os.utime("bench_proj.csv", ns=(time.time_ns(), time.time_ns() + i))
+        client.get("/get-updated-data/Main").raise_for_status()
+        return rows
+
+    return call, 20, None
+
+
+@benchmark("GET /get-slate-ids", needs_redis=True)
+def bench_get_slate_ids(scale):
+    import main
+    from fastapi.testclient import TestClient
+    main.redis_store.set_slate_ids([f"bench{i}" for i in range(scale * 3)])
+    client = TestClient(main.app)
+
+    def call(i):
+        client.get("/get-slate-ids/").raise_for_status()
+        return scale * 3
+
+    return call, 200, None
+
+
+def _write_processed_slate(scale):
+    import main
+    slate_id = f"bench{scale}x"
+    slate = synthetic_slate(scale)
+    slate.columns = [col.replace(' ', '').lower() for col in slate.columns]
+    slate.to_csv(main.slate_cache.file_path(slate_id), index=False)
+    return slate_id, len(slate)
+
+
+def _write_projection_file(scale):
+    slate = synthetic_slate(scale)
+    copy = slate.index // (len(slate) // scale)
+    names = slate['Name'] + np.where(copy > 0, " " + copy.astype(str), "")
+    projections = slate.assign(Name=names, Fpts=slate['AvgPointsPerGame'], Minutes=30.0)
+    projections[['Name', 'Fpts', 'Minutes']].to_csv("bench_proj.csv", index=False)
+    return len(projections)
+
+
+def measure(call, iterations):
+    """
+    Runs a warm-up call under tracemalloc for peak memory, then times the
+    remaining calls without it. Progress prints from the code under test are
+    discarded.
+
+    Returns:
+        dict: calls, rows, throughput, p50/p99 latency and peak memory.
+    """
+    latencies, rows = [], 0
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        tracemalloc.start()
+        call(0)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        for i in range(1 if iterations > 1 else 0, iterations):
+            start = time.perf_counter()
+            rows += call(i)
+            latencies.append(time.perf_counter() - start)
+
+    latencies = np.array(latencies) * 1000
+    return {
+        "calls": len(latencies),
+        "rows": rows,
+        "rows_per_s": round(rows / (latencies.sum() / 1000), 1) if latencies.sum() else None,
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+        "peak_mb": round(peak / 1024 ** 2, 2)
+    }
+
+
+def database_available():
+    try:
+        from db import get_cursor
+        with get_cursor() as cur:
+            cur.execute("SELECT 1;")
+        return True
+    except Exception as e:
+        print(f"Skipping database benchmarks: {e}")
+        return False
+
+
+def redis_available():
+    try:
+        import main
+        main.redis_store.client.ping()
+        return True
+    except Exception as e:
+        print(f"Skipping Redis benchmarks: {e}")
+        return False
+
+
+def compare(results, baseline, threshold):
+    """
+    Prints p50 changes against the baseline.
+
+    Returns:
+        list[str]: Benchmarks whose p50 regressed by more than `threshold`.
+    """
+    regressions = []
+    for name, scales in results.items():
+        for scale, current in scales.items():
+            previous = baseline.get(name, {}).get(scale)
+            if not previous:
+                print(f"{name} [{scale}x]: no baseline")
+                continue
+            change = current["p50_ms"] / previous["p50_ms"] - 1 if previous["p50_ms"] else 0.0
+            print(f"{name} [{scale}x]: p50 {previous['p50_ms']:.3f} -> {current['p50_ms']:.3f} ms ({change:+.1%})")
+            if change > threshold:
+                regressions.append(f"{name} [{scale}x]")
+    return regressions
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description="Benchmark the ingestion and slate-processing hot paths.")
+    arg_parser.add_argument('--scales', type=int, nargs='+', default=DEFAULT_SCALES, help="Multiples of the sample data sizes.")
+    arg_parser.add_argument('--only', nargs='+', help="Run only benchmarks whose name contains one of these strings.")
+    arg_parser.add_argument('--save-baseline', action='store_true', help="Store these results as the new baseline.")
+    arg_parser.add_argument('--threshold', type=float, default=0.2, help="p50 slowdown reported as a regression.")
+    arg_parser.add_argument('--no-db', action='store_true', help="Skip benchmarks that need PostgreSQL.")
+    args = arg_parser.parse_args()
+
+    have_db = not args.no_db and database_available()
+    have_redis = redis_available()
+
+    # File-based benchmarks read and write in a scratch directory
+    workdir = tempfile.mkdtemp(prefix="bench-")
+    os.chdir(workdir)
+
+    results = {}
+    try:
+        for bench in BENCHMARKS:
+            if args.only and not any(part in bench["name"] for part in args.only):
+                continue
+            if (bench["needs_db"] and not have_db) or (bench["needs_redis"] and not have_redis):
+                continue
+            for scale in args.scales:
+                call, iterations, cleanup = bench["func"](scale)
+                try:
+                    stats = measure(call, iterations)
+                finally:
+                    if cleanup:
+                        cleanup()
+                results.setdefault(bench["name"], {})[str(scale)] = stats
+                print(f"{bench['name']} [{scale}x]: {json.dumps(stats)}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.save_baseline:
+        with open(BASELINE_FILE, "w") as file:
+            json.dump({
+                "_meta": {"created": datetime.now().isoformat(timespec='seconds'), "machine": platform.platform()},
+                **results
+            }, file, indent=2)
+        print(f"Baseline saved to {BASELINE_FILE}")
+    elif os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE) as file:
+            regressions = compare(results, json.load(file), args.threshold)
+        if regressions:
+            print(f"Regressions over {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+    else:
+        print("No baseline found; run with --save-baseline to create one.")
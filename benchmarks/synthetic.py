@@ -0,0 +1,98 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_SLATE = os.path.join(REPO_ROOT, "sal-Main.csv")
+SAMPLE_PLAYER_BOX = os.path.join(REPO_ROOT, "fetch", "player_box_data.csv")
+
+# Statistics block of a live BoxScore player, in camelCase as nba_api returns it
+BOX_STAT_COLUMNS = [
+    'assists', 'blocks', 'blocksReceived', 'fieldGoalsAttempted', 'fieldGoalsMade', 'fieldGoalsPercentage',
+    'foulsOffensive', 'foulsDrawn', 'foulsPersonal', 'foulsTechnical', 'freeThrowsAttempted', 'freeThrowsMade',
+    'freeThrowsPercentage', 'minus', 'minutes', 'minutesCalculated', 'plus', 'plusMinusPoints', 'points',
+    'pointsFastBreak', 'pointsInThePaint', 'pointsSecondChance', 'reboundsDefensive', 'reboundsOffensive',
+    'reboundsTotal', 'steals', 'threePointersAttempted', 'threePointersMade', 'threePointersPercentage',
+    'turnovers', 'twoPointersAttempted', 'twoPointersMade', 'twoPointersPercentage'
+]
+
+# Synthetic game ids start with this prefix so benchmark rows can be removed afterwards
+SYNTHETIC_GAME_PREFIX = "99"
+
+
+def synthetic_slate(scale, seed=0):
+    """
+    Repeats the sample DraftKings salary file `scale` times with fresh player
+    IDs and jittered salaries. Names are kept, so name resolution still matches.
+
+    Returns:
+        pd.DataFrame: Rows in the raw `sal-{slate}.csv` layout.
+    """
+    sample = pd.read_csv(SAMPLE_SLATE)
+    rng = np.random.default_rng(seed)
+    copies = []
+    for copy in range(scale):
+        rows = sample.copy()
+        rows['ID'] = rows['ID'] + copy * 10_000_000
+        rows['Name + ID'] = rows['Name'] + ' (' + rows['ID'].astype(str) + ')'
+        rows['Salary'] = (rows['Salary'] + rng.integers(-5, 6, len(rows)) * 100).clip(lower=3000)
+        copies.append(rows)
+    return pd.concat(copies, ignore_index=True)
+
+
+def synthetic_player_box(scale, seed=0):
+    """
+    Repeats the sample player_box export `scale` times under synthetic game IDs,
+    with counting stats resampled around the originals.
+
+    Returns:
+        pd.DataFrame: Rows in the lowercase player_box layout.
+    """
+    sample = pd.read_csv(SAMPLE_PLAYER_BOX, dtype={'game_id': str})
+    rng = np.random.default_rng(seed)
+    copies = []
+    for copy in range(scale):
+        rows = sample.copy()
+        rows['game_id'] = SYNTHETIC_GAME_PREFIX + f"{copy:03d}" + rows['game_id'].str[-5:]
+        for col in ['points', 'reboundstotal', 'assists', 'steals', 'blocks', 'turnovers', 'threepointersmade']:
+            rows[col] = rng.poisson(rows[col].fillna(0).clip(lower=0))
+        copies.append(rows)
+    return pd.concat(copies, ignore_index=True)
+
+
+def boxscore_payloads(player_box):
+    """
+    Rebuilds live BoxScore-shaped payloads from player_box rows, one per game.
+
+    Returns:
+        dict: game_id -> payload as returned by `BoxScore.get_dict()`.
+    """
+    columns = {col.lower(): col for col in BOX_STAT_COLUMNS}
+    payloads = {}
+    for game_id, game in player_box.groupby('game_id', sort=False):
+        teams = list(dict.fromkeys(game['team']))
+        teams = teams * 2 if len(teams) == 1 else teams[:2]
+        sides = {}
+        for side, team in zip(('awayTeam', 'homeTeam'), teams):
+            players = []
+            for row in game[game['team'] == team].to_dict(orient='records'):
+                statistics = {camel: (None if pd.isna(row[lower]) else row[lower]) for lower, camel in columns.items()}
+                players.append({
+                    'status': row['status'], 'order': int(row['order_num']), 'personId': int(row['personid']),
+                    'jerseyNum': str(row['jerseynum']), 'position': '' if pd.isna(row['position']) else row['position'],
+                    'starter': '1' if row['starter'] else '0', 'oncourt': '1' if row['oncourt'] else '0',
+                    'played': '1' if row['played'] else '0', 'name': row['name'], 'statistics': statistics
+                })
+            sides[side] = {'teamName': team, 'players': players}
+        payloads[game_id] = {'game': {'gameId': game_id, 'gameStatus': 3, **sides}}
+    return payloads
+
+
+def camel_case_box(player_box):
+    """
+    Renames lowercase player_box columns to the camelCase names used at ingest.
+    """
+    columns = {col.lower(): col for col in BOX_STAT_COLUMNS}
+    return player_box.rename(columns=columns)
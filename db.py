@@ -0,0 +1,167 @@
+import asyncio
+import os
+import threading
+from contextlib import asynccontextmanager, contextmanager
+
+import psycopg2
+from psycopg2.pool import PoolError, ThreadedConnectionPool
+from dotenv import load_dotenv
+
+from metrics import CountingCursor
+
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Access the variables
+DB_HOST = os.getenv('DB_HOST', 'localhost')
+DB_USER = os.getenv('DB_USER', 'db_user')
+DB_PASS = os.getenv('DB_PASS', 'hello')
+DB_NAME = os.getenv('DB_NAME', 'nba_api')
+DB_PORT = int(os.getenv('DB_PORT', 5432))
+DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', 1))
+DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', 10))
+# Seconds a caller waits for a free pooled connection before giving up
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 30))
+
+_pool = None
+_pool_lock = threading.Lock()
+# ThreadedConnectionPool raises as soon as it is exhausted, so callers queue here instead
+_pool_slots = threading.BoundedSemaphore(DB_POOL_MAX)
+_async_pool = None
+_async_pool_lock = asyncio.Lock()
+
+
+def get_pool():
+    """
+    Returns the process-wide PostgreSQL connection pool, creating it on first use.
+    Its connections default to `CountingCursor`, so every statement is counted
+    as a database round trip.
+
+    Returns:
+        ThreadedConnectionPool: psycopg2 pool shared by all threads.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadedConnectionPool(
+                    DB_POOL_MIN,
+                    DB_POOL_MAX,
+                    host=DB_HOST,
+                    port=DB_PORT,
+                    user=DB_USER,
+                    password=DB_PASS,
+                    dbname=DB_NAME,
+                    cursor_factory=CountingCursor
+                )
+    return _pool
+
+
+@contextmanager
+def get_connection():
+    """
+    Borrows a connection from the pool. The transaction is committed when the
+    block exits normally and rolled back on error; the connection is always
+    returned to the pool.
+
+    When all DB_POOL_MAX connections are in use, waits up to DB_POOL_TIMEOUT
+    seconds for one to be returned before raising PoolError.
+    """
+    pool = get_pool()
+    if not _pool_slots.acquire(timeout=DB_POOL_TIMEOUT):
+        raise PoolError(f"No database connection free after {DB_POOL_TIMEOUT:g}s")
+    try:
+        conn = pool.getconn()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            if not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            pool.putconn(conn, close=bool(conn.closed))
+    finally:
+        _pool_slots.release()
+
+
+@contextmanager
+def get_cursor(**cursor_kwargs):
+    """
+    Borrows a pooled connection and yields a cursor on it, with the same
+    commit/rollback semantics as `get_connection`.
+    """
+    with get_connection() as conn:
+        with conn.cursor(**cursor_kwargs) as cur:
+            yield cur
+
+
+def missing_columns(cur, table, columns):
+    """
+    Returns the names in `columns` that `table` does not have yet. Names are
+    compared in lowercase, as PostgreSQL stores unquoted identifiers.
+
+    Checking first lets migrations skip `ALTER TABLE ... ADD COLUMN IF NOT
+    EXISTS`, which takes an ACCESS EXCLUSIVE lock even when the column exists.
+    """
+    cur.execute(
+        "SELECT column_name FROM information_schema.columns WHERE table_schema = current_schema() AND table_name = %s;",
+        (table.lower(),)
+    )
+    existing = {row[0] for row in cur.fetchall()}
+    return [column for column in columns if column.lower() not in existing]
+
+
+def close_pool():
+    """
+    Closes every connection held by the pool.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
+
+async def get_async_pool():
+    """
+    Returns the asyncpg pool used by the FastAPI handlers, creating it on first use.
+    Concurrent first callers wait on a lock, so only one pool is ever created.
+    """
+    global _async_pool
+    if _async_pool is None:
+        async with _async_pool_lock:
+            if _async_pool is None:
+                import asyncpg
+
+                _async_pool = await asyncpg.create_pool(
+                    host=DB_HOST,
+                    port=DB_PORT,
+                    user=DB_USER,
+                    password=DB_PASS,
+                    database=DB_NAME,
+                    min_size=DB_POOL_MIN,
+                    max_size=DB_POOL_MAX
+                )
+    return _async_pool
+
+
+@asynccontextmanager
+async def get_async_connection():
+    """
+    Acquires a connection from the asyncpg pool for the duration of the block.
+    """
+    pool = await get_async_pool()
+    async with pool.acquire() as conn:
+        yield conn
+
+
+async def close_async_pool():
+    """
+    Closes the asyncpg pool, e.g. on application shutdown.
+    """
+    global _async_pool
+    if _async_pool is not None:
+        await _async_pool.close()
+        _async_pool = None
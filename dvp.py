@@ -0,0 +1,268 @@
+import argparse
+
+import pandas as pd
+
+from db import get_cursor
+from metrics import add_rows, print_summary, stage
+
+
+# Positions tracked, as listed in boxscores and on DraftKings
+DVP_POSITIONS = ['PG', 'SG', 'SF', 'PF', 'C']
+
+# Window name -> number of most recent games of the defense, None for the whole current season
+DVP_WINDOWS = {'l5': 5, 'l15': 15, 'season': None}
+
+DVP_COLUMNS = [f"{window}_{kind}" for window in DVP_WINDOWS for kind in ('fpts', 'factor')]
+
+# Columns added to slate rows: factor of the opponent against the player's positions
+SLATE_DVP_COLUMNS = [f"dvp_{window}" for window in DVP_WINDOWS]
+
+
+# Function to create the per-game and aggregate DvP tables
+def create_dvp_tables(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS dvp_game (
+            game_id TEXT NOT NULL,
+            defense_team_id INT NOT NULL,
+            position TEXT NOT NULL,
+            season_id TEXT NOT NULL,
+            game_date DATE NOT NULL,
+            players INT NOT NULL,
+            fpts FLOAT NOT NULL,
+            PRIMARY KEY (game_id, defense_team_id, position)
+        );
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS dvp_game_defense_idx ON dvp_game (defense_team_id, position, game_date DESC);")
+    columns = ",\n            ".join(f"{column} FLOAT" for column in DVP_COLUMNS)
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS dvp (
+            defense_team_id INT NOT NULL,
+            position TEXT NOT NULL,
+            season_id TEXT NOT NULL,
+            season_games INT NOT NULL,
+            {columns},
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            PRIMARY KEY (defense_team_id, position)
+        );
+    """)
+
+
+def _slate_positions_sql(cur):
+    # Latest DraftKings primary position, for players who never started a game
+    cur.execute("SELECT to_regclass('dksal') IS NOT NULL;")
+    if not cur.fetchone()[0]:
+        return "SELECT NULL::int AS personId, NULL::text AS position WHERE false"
+    return """
+        SELECT DISTINCT ON (player_id) player_id::int AS personId, split_part(position, '/', 1) AS position
+        FROM dksal
+        WHERE player_id ~ '^[0-9]+$'
+        ORDER BY player_id, game_date DESC
+    """
+
+
+# Function to record fantasy points allowed per defense and position for new games
+def refresh_dvp_games(cur, game_ids=None):
+    """
+    Writes dvp_game rows: per game, the FPTS scored against each defense by
+    players of each position. The defense is the opponent in the player's team
+    row of `games` (third token of its matchup, e.g. 'NYK @ NOP').
+
+    Starters carry their boxscore position. Bench players fall back to the
+    position they are most often listed at in player_box, then to their latest
+    DraftKings primary position. Players with none of these are left out.
+
+    Parameters:
+        cur: Open cursor.
+        game_ids (list[str], optional): Games to (re)compute. When omitted, only
+            games not yet in dvp_game are processed.
+
+    Returns:
+        list[int]: Defenses with new or changed rows.
+    """
+    create_dvp_tables(cur)
+    if game_ids is not None:
+        game_ids = sorted({str(game_id) for game_id in game_ids})
+        if not game_ids:
+            return []
+        cur.execute("DELETE FROM dvp_game WHERE game_id = ANY(%s);", (game_ids,))
+        scope, params = "pb.game_id = ANY(%s)", (game_ids,)
+    else:
+        scope, params = "NOT EXISTS (SELECT 1 FROM dvp_game d WHERE d.game_id = pb.game_id)", None
+
+    cur.execute(f"""
+        WITH scoped AS (
+            SELECT pb.game_id, pb.personId, pb.team, pb.FPTS, NULLIF(pb.position, '') AS position
+            FROM player_box pb
+            WHERE pb.minutesPlayed > 0 AND {scope}
+        ),
+        listed_positions AS (
+            SELECT DISTINCT ON (personId) personId, position
+            FROM player_box
+            WHERE position IN ({", ".join(f"'{position}'" for position in DVP_POSITIONS)})
+            AND personId IN (SELECT personId FROM scoped)
+            GROUP BY personId, position
+            ORDER BY personId, count(*) DESC, position
+        ),
+        slate_positions AS ({_slate_positions_sql(cur)})
+        INSERT INTO dvp_game (game_id, defense_team_id, position, season_id, game_date, players, fpts)
+        SELECT s.game_id, opp.nba_team_id, COALESCE(s.position, lp.position, sp.position),
+               g.season_id, g.game_date::date, count(*), sum(s.FPTS)
+        FROM scoped s
+        JOIN teams t ON t.team_nickname = s.team
+        JOIN games g ON g.game_id = s.game_id AND g.team_abbreviation = t.abv
+        JOIN teams opp ON opp.abv = split_part(g.matchup, ' ', 3)
+        LEFT JOIN listed_positions lp ON lp.personId = s.personId
+        LEFT JOIN slate_positions sp ON sp.personId = s.personId
+        WHERE COALESCE(s.position, lp.position, sp.position) IN ({", ".join(f"'{position}'" for position in DVP_POSITIONS)})
+        GROUP BY 1, 2, 3, 4, 5
+        RETURNING defense_team_id;
+    """, params)
+    defenses = sorted({row[0] for row in cur.fetchall()})
+    if game_ids is not None:
+        # Defenses whose rows were deleted but not replaced still need their aggregates rebuilt
+        cur.execute("""
+            SELECT DISTINCT opp.nba_team_id
+            FROM games g JOIN teams opp ON opp.abv = split_part(g.matchup, ' ', 3)
+            WHERE g.game_id = ANY(%s);
+        """, (game_ids,))
+        defenses = sorted(set(defenses) | {row[0] for row in cur.fetchall()})
+    return defenses
+
+
+def _window_aggregates():
+    aggregates = []
+    for window, size in DVP_WINDOWS.items():
+        condition = "season_id = current_season" if size is None else f"game_rank <= {size}"
+        aggregates.append(f"avg(fpts) FILTER (WHERE {condition}) AS {window}_fpts")
+    return ",\n                ".join(aggregates)
+
+
+# Function to rebuild rolling DvP aggregates
+def refresh_dvp(cur, defense_team_ids=None):
+    """
+    Recomputes rolling averages of FPTS allowed per game for the given defenses,
+    or for every defense when `defense_team_ids` is None. The season window
+    covers the season_id of each defense's latest game, so regular season and
+    playoff games are never mixed. Every row's factors are then rescaled
+    against the league average for the position (1.0 = average,
+    above 1.0 = the defense allows more than average).
+
+    Returns:
+        int: Number of defense/position rows written.
+    """
+    create_dvp_tables(cur)
+    if defense_team_ids is not None:
+        defense_team_ids = sorted({int(team_id) for team_id in defense_team_ids})
+        if not defense_team_ids:
+            return 0
+
+    fpts_columns = [f"{window}_fpts" for window in DVP_WINDOWS]
+    cur.execute(f"""
+        WITH ranked AS (
+            SELECT
+                defense_team_id, position, season_id, fpts,
+                row_number() OVER (PARTITION BY defense_team_id, position ORDER BY game_date DESC, game_id DESC) AS game_rank,
+                -- Season (and season type) of the defense's latest game
+                first_value(season_id) OVER (PARTITION BY defense_team_id ORDER BY game_date DESC, game_id DESC) AS current_season
+            FROM dvp_game
+            {"WHERE defense_team_id = ANY(%s)" if defense_team_ids is not None else ""}
+        )
+        INSERT INTO dvp (defense_team_id, position, season_id, season_games, {", ".join(fpts_columns)})
+        SELECT
+            defense_team_id,
+            position,
+            max(current_season),
+            count(*) FILTER (WHERE season_id = current_season),
+            {_window_aggregates()}
+        FROM ranked
+        GROUP BY defense_team_id, position
+        ON CONFLICT (defense_team_id, position) DO UPDATE SET
+            season_id = EXCLUDED.season_id,
+            season_games = EXCLUDED.season_games,
+            {", ".join(f"{column} = EXCLUDED.{column}" for column in fpts_columns)},
+            updated_at = now();
+    """, (defense_team_ids,) if defense_team_ids is not None else None)
+    written = cur.rowcount
+
+    # League averages move with every defense, so factors are rescaled for all rows
+    cur.execute(f"""
+        UPDATE dvp d SET
+            {", ".join(f"{window}_factor = d.{window}_fpts / NULLIF(league.{window}_fpts, 0)" for window in DVP_WINDOWS)}
+        FROM (
+            SELECT position, {", ".join(f"avg({window}_fpts) AS {window}_fpts" for window in DVP_WINDOWS)}
+            FROM dvp
+            GROUP BY position
+        ) league
+        WHERE league.position = d.position;
+    """)
+    return written
+
+
+# Function to bring DvP up to date with player_box
+def refresh_dvp_incremental(cur, game_ids=None):
+    """
+    Records new (or the given) games in dvp_game and rebuilds the aggregates of
+    only the defenses they touched.
+
+    Returns:
+        int: Number of defense/position rows written.
+    """
+    defenses = refresh_dvp_games(cur, game_ids)
+    return refresh_dvp(cur, defenses) if defenses else 0
+
+
+# Function to read the DvP aggregates
+def load_dvp():
+    """
+    Returns:
+        pd.DataFrame: defense_team_id, position and the factor of each window.
+    """
+    factor_columns = [f"{window}_factor" for window in DVP_WINDOWS]
+    with get_cursor() as cur:
+        cur.execute("SELECT to_regclass('dvp') IS NOT NULL;")
+        if not cur.fetchone()[0]:
+            return pd.DataFrame(columns=['defense_team_id', 'position'] + factor_columns)
+        cur.execute(f"SELECT defense_team_id, position, {', '.join(factor_columns)} FROM dvp;")
+        return pd.DataFrame(cur.fetchall(), columns=['defense_team_id', 'position'] + factor_columns)
+
+
+# Function to attach opponent DvP factors to slate rows
+def add_dvp_columns(salary_df, dvp=None, position_column='Position', opp_column='opp_team_id'):
+    """
+    Adds SLATE_DVP_COLUMNS to a salary DataFrame: the opponent's factor against
+    each of the player's DraftKings positions (e.g. 'SF/PF'), averaged.
+
+    Parameters:
+        salary_df (pd.DataFrame): Slate rows with positions and opponent team IDs.
+        dvp (pd.DataFrame, optional): Rows from `load_dvp`; loaded when omitted.
+    """
+    dvp = load_dvp() if dvp is None else dvp
+    factor_columns = [f"{window}_factor" for window in DVP_WINDOWS]
+
+    positions = salary_df[position_column].fillna('').str.split('/').explode().rename('position').to_frame()
+    positions['defense_team_id'] = pd.to_numeric(salary_df[opp_column], errors='coerce').reindex(positions.index)
+    dvp = dvp.assign(defense_team_id=pd.to_numeric(dvp['defense_team_id']))
+    merged = positions.reset_index().merge(dvp, on=['defense_team_id', 'position'], how='left')
+    factors = merged.groupby('index')[factor_columns].mean().astype(float).round(3)
+
+    for window, column in zip(DVP_WINDOWS, SLATE_DVP_COLUMNS):
+        salary_df[column] = factors[f"{window}_factor"].reindex(salary_df.index)
+    return salary_df
+
+
+# Main Execution
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description="Refresh defense-vs-position aggregates from player_box.")
+    arg_parser.add_argument('--rebuild', action='store_true', help="Recompute every game, e.g. after changing positions or windows.")
+    args = arg_parser.parse_args()
+
+    with get_cursor() as cur:
+        if args.rebuild:
+            cur.execute("DROP TABLE IF EXISTS dvp_game, dvp;")
+        with stage('dvp', 'games'):
+            defenses = refresh_dvp_games(cur)
+        with stage('dvp', 'aggregates'):
+            count = refresh_dvp(cur, defenses) if defenses else 0
+    add_rows('dvp', 'aggregates', count)
+    print(f"Refreshed DvP for {len(defenses)} defenses ({count} rows).")
+    print_summary('dvp')
@@ -0,0 +1,127 @@
+import argparse
+
+from db import get_async_connection, get_cursor
+from metrics import add_rows, print_summary, stage
+
+
+# player_box columns averaged over each window (lowercase, as stored by PostgreSQL)
+FEATURE_STATS = [
+    'fpts', 'minutesplayed', 'points', 'reboundstotal', 'assists', 'steals',
+    'blocks', 'turnovers', 'threepointersmade'
+]
+
+# Window name -> number of most recent games, None for the whole current season
+FEATURE_WINDOWS = {'l5': 5, 'l10': 10, 'season': None}
+
+FEATURE_COLUMNS = [f"{window}_{stat}" for window in FEATURE_WINDOWS for stat in FEATURE_STATS]
+
+
+# Function to create the player_features table
+def create_player_features_table(cur):
+    columns = ",\n            ".join(f"{column} FLOAT" for column in FEATURE_COLUMNS)
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS player_features (
+            personId INT PRIMARY KEY,
+            season_id TEXT NOT NULL,
+            season_games INT NOT NULL,
+            last_game_date TEXT NOT NULL,
+            {columns},
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        );
+    """)
+
+
+def _window_aggregates():
+    aggregates = []
+    for window, size in FEATURE_WINDOWS.items():
+        condition = "season_id = current_season" if size is None else f"game_rank <= {size}"
+        for stat in FEATURE_STATS:
+            aggregates.append(f"avg({stat}) FILTER (WHERE {condition}) AS {window}_{stat}")
+    return ",\n                ".join(aggregates)
+
+
+# Function to refresh rolling features for a set of players
+def refresh_player_features(cur, person_ids=None):
+    """
+    Recomputes last-5, last-10 and current-season averages from player_box and
+    games.game_date for the given players, or for everyone when `person_ids` is
+    None. Only games the player actually played in count towards a window.
+
+    Returns:
+        int: Number of player rows written.
+    """
+    create_player_features_table(cur)
+    if person_ids is not None:
+        person_ids = sorted({int(person_id) for person_id in person_ids})
+        if not person_ids:
+            return 0
+
+    cur.execute(f"""
+        WITH game_dates AS (
+            SELECT DISTINCT game_id, game_date, season_id FROM games
+        ),
+        played AS (
+            SELECT
+                pb.personId,
+                gd.game_date,
+                gd.season_id,
+                {", ".join(f"pb.{stat}" for stat in FEATURE_STATS)},
+                row_number() OVER w AS game_rank,
+                first_value(gd.season_id) OVER w AS current_season
+            FROM player_box pb
+            JOIN game_dates gd ON gd.game_id = pb.game_id
+            WHERE pb.minutesPlayed > 0 {"AND pb.personId = ANY(%s)" if person_ids is not None else ""}
+            WINDOW w AS (PARTITION BY pb.personId ORDER BY gd.game_date DESC, pb.game_id DESC)
+        )
+        INSERT INTO player_features (personId, season_id, season_games, last_game_date, {", ".join(FEATURE_COLUMNS)})
+        SELECT
+            personId,
+            max(current_season),
+            count(*) FILTER (WHERE season_id = current_season),
+            max(game_date),
+            {_window_aggregates()}
+        FROM played
+        GROUP BY personId
+        ON CONFLICT (personId) DO UPDATE SET
+            season_id = EXCLUDED.season_id,
+            season_games = EXCLUDED.season_games,
+            last_game_date = EXCLUDED.last_game_date,
+            {", ".join(f"{column} = EXCLUDED.{column}" for column in FEATURE_COLUMNS)},
+            updated_at = now();
+    """, (person_ids,) if person_ids is not None else None)
+    return cur.rowcount
+
+
+# Function to fetch features for many players in one query
+async def fetch_player_features(person_ids):
+    """
+    Reads player_features rows for a batch of players over the asyncpg pool.
+
+    Parameters:
+        person_ids (list[int]): NBA player IDs.
+
+    Returns:
+        list[dict]: One row per player that has features.
+    """
+    async with get_async_connection() as conn:
+        rows = await conn.fetch(
+            "SELECT * FROM player_features WHERE personId = ANY($1::int[]) ORDER BY personId;",
+            list(person_ids)
+        )
+    return [{**dict(row), 'updated_at': row['updated_at'].isoformat()} for row in rows]
+
+
+# Main Execution
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description="Rebuild the player_features table from player_box.")
+    arg_parser.add_argument('--drop', action='store_true', help="Recreate the table, e.g. after changing FEATURE_STATS.")
+    args = arg_parser.parse_args()
+
+    with stage('features', 'refresh'):
+        with get_cursor() as cur:
+            if args.drop:
+                cur.execute("DROP TABLE IF EXISTS player_features;")
+            count = refresh_player_features(cur)
+    add_rows('features', 'refresh', count)
+    print(f"Refreshed features for {count} players.")
+    print_summary('features')
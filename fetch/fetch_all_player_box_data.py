@@ -1,56 +1,244 @@
-import psycopg2
-import pandas as pd
-
-# Database connection details
-DB_HOST = 'localhost'
-DB_USER = 'db_user'
-DB_PASS = 'hello'
-DB_NAME = 'nba_api'
-OUTPUT_CSV_FILE = "player_box_data.csv"  # Path to save the CSV file
-
-
-# Function to connect to PostgreSQL
-def connect_to_postgres():
-    try:
-        conn = psycopg2.connect(
-            host=DB_HOST,
-            user=DB_USER,
-            password=DB_PASS,
-            dbname=DB_NAME
-        )
-        return conn
-    except psycopg2.Error as e:
-        print(f"Error connecting to PostgreSQL: {e}")
-        exit(1)
-
-
-# Function to retrieve all data from player_box table
-def fetch_player_box_data():
-    conn = connect_to_postgres()
-    try:
-        query = "SELECT * FROM player_box;"
-        # Use pandas to execute the query and fetch data
-        df = pd.read_sql_query(query, conn)
-        return df
-    except Exception as e:
-        print(f"Error retrieving data from player_box: {e}")
-    finally:
-        conn.close()
-
-
-# Main function to fetch data and save as CSV
-def save_player_box_to_csv():
-    print("Fetching data from player_box table...")
-    df = fetch_player_box_data()
-
-    if df is not None and not df.empty:
-        # Save DataFrame to a CSV file
-        df.to_csv(OUTPUT_CSV_FILE, index=False)
-        print(f"Data successfully saved to {OUTPUT_CSV_FILE}")
-    else:
-        print("No data found in player_box table or an error occurred.")
-
-
-# Execute the main function
-if __name__ == "__main__":
-    save_player_box_to_csv()
+import argparse
+import json
+import os
+import shutil
+import sys
+import uuid
+from datetime import datetime
+import pandas as pd
+
+# Shared modules live in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import get_connection
+
+OUTPUT_CSV_FILE = "player_box_data.csv"  # Path to save the CSV file
+EXPORT_DIR = "player_box_export"  # Root of the partitioned Parquet / NDJSON exports
+CHUNK_SIZE = 10000  # Rows fetched per round trip from the server-side cursor
+
+# PostgreSQL type OIDs mapped to explicit export types; anything else is exported as text
+PG_TYPE_NAMES = {
+    16: "bool",
+    20: "int64",
+    21: "int16",
+    23: "int32",
+    700: "float32",
+    701: "float64",
+    1082: "date"
+}
+
+# player_box's own game_date copy is left out in favour of the games table's, cast so partitions are typed as dates
+EXPORT_QUERY = """
+    SELECT {columns}, g.season_id, g.game_date::date AS game_date
+    FROM player_box pb
+    JOIN (SELECT DISTINCT game_id, season_id, game_date FROM games) g ON g.game_id = pb.game_id
+    WHERE g.game_date >= %s
+    ORDER BY g.game_date, pb.game_id;
+"""
+
+
+# Function to retrieve all data from player_box table
+def fetch_player_box_data():
+    try:
+        with get_connection() as conn:
+            query = "SELECT * FROM player_box;"
+            # Use pandas to execute the query and fetch data
+            df = pd.read_sql_query(query, conn)
+            return df
+    except Exception as e:
+        print(f"Error retrieving data from player_box: {e}")
+
+
+# Main function to fetch data and save as CSV
+def save_player_box_to_csv():
+    print("Fetching data from player_box table...")
+    df = fetch_player_box_data()
+
+    if df is not None and not df.empty:
+        # Save DataFrame to a CSV file
+        df.to_csv(OUTPUT_CSV_FILE, index=False)
+        print(f"Data successfully saved to {OUTPUT_CSV_FILE}")
+    else:
+        print("No data found in player_box table or an error occurred.")
+
+
+# Function to stream player_box rows in fixed-size chunks
+def stream_player_box_chunks(since_date, chunk_size=CHUNK_SIZE):
+    """
+    Streams player_box rows joined to their season and game date through a
+    server-side (named) cursor, so only one chunk is held in memory at a time.
+
+    Args:
+        since_date (str): Only games on or after this YYYY-MM-DD date are exported.
+        chunk_size (int): Rows per chunk.
+
+    Yields:
+        The column names and their export type names first, then lists of row tuples.
+    """
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT * FROM player_box LIMIT 0;")
+            columns = ", ".join(f"pb.{col.name}" for col in cur.description if col.name != "game_date")
+        with conn.cursor(name=f"player_box_export_{uuid.uuid4().hex}") as cur:
+            cur.itersize = chunk_size
+            cur.execute(EXPORT_QUERY.format(columns=columns), (since_date,))
+            first = cur.fetchmany(chunk_size)
+            columns = [col.name for col in cur.description]
+            types = [PG_TYPE_NAMES.get(col.type_code, "string") for col in cur.description]
+            yield columns, types
+            chunk = first
+            while chunk:
+                yield chunk
+                chunk = cur.fetchmany(chunk_size)
+
+
+def export_root(export_format):
+    return os.path.join(EXPORT_DIR, export_format)
+
+
+def watermark_path(root):
+    return os.path.join(root, "_watermark.json")
+
+
+def read_watermark(export_format):
+    try:
+        with open(watermark_path(export_root(export_format))) as file:
+            return json.load(file)["game_date"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def write_watermark(root, game_date):
+    with open(watermark_path(root), "w") as file:
+        json.dump({"game_date": game_date, "exported_at": datetime.now().isoformat()}, file)
+
+
+def partition_dir(root, season_id, game_date):
+    return os.path.join(root, f"season_id={season_id}", f"game_date={game_date}")
+
+
+def drop_date_partitions(export_format, since_date):
+    """
+    Removes existing partitions for dates on or after `since_date` so an
+    incremental run can rewrite the watermark date without duplicating rows.
+    """
+    root = export_root(export_format)
+    if not os.path.isdir(root):
+        return
+    for season_dir in os.listdir(root):
+        season_path = os.path.join(root, season_dir)
+        if not os.path.isdir(season_path):
+            continue
+        for date_dir in os.listdir(season_path):
+            if date_dir.startswith("game_date=") and date_dir[len("game_date="):] >= since_date:
+                shutil.rmtree(os.path.join(season_path, date_dir))
+
+
+def write_parquet_chunk(root, chunk, columns, types, run_id, chunk_number):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    arrow_types = {
+        "bool": pa.bool_(), "int16": pa.int16(), "int32": pa.int32(), "int64": pa.int64(),
+        "float32": pa.float32(), "float64": pa.float64(), "date": pa.date32(), "string": pa.string()
+    }
+    schema = pa.schema([(col, arrow_types[col_type]) for col, col_type in zip(columns, types)])
+    table = pa.Table.from_arrays(
+        [pa.array(values, type=field.type) for values, field in zip(zip(*chunk), schema)],
+        schema=schema
+    )
+    pq.write_to_dataset(
+        table,
+        root_path=root,
+        partition_cols=["season_id", "game_date"],
+        basename_template=f"part-{run_id}-{chunk_number}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore"
+    )
+
+
+def write_ndjson_chunk(root, chunk, columns):
+    season_idx, date_idx = columns.index("season_id"), columns.index("game_date")
+    handles = {}
+    try:
+        for row in chunk:
+            key = (row[season_idx], row[date_idx])
+            if key not in handles:
+                path = partition_dir(root, *key)
+                os.makedirs(path, exist_ok=True)
+                handles[key] = open(os.path.join(path, "player_box.ndjson"), "a")
+            handles[key].write(json.dumps(dict(zip(columns, row)), default=str) + "\n")
+    finally:
+        for handle in handles.values():
+            handle.close()
+
+
+# Main function to export player_box as partitioned Parquet or NDJSON
+def export_player_box(export_format, incremental=False, chunk_size=CHUNK_SIZE):
+    """
+    Exports player_box partitioned by season_id and game_date with bounded memory.
+
+    In incremental mode only games on or after the last export's watermark date
+    are exported; that date's partitions are rewritten so late-arriving games are
+    picked up without duplicates.
+
+    A full export is written to a temporary directory next to the export and
+    swapped in only once it completes, so a failed run leaves the previous
+    export in place.
+
+    Returns:
+        int: Number of rows exported.
+    """
+    since_date = (read_watermark(export_format) if incremental else None) or "0000-00-00"
+    run_id = uuid.uuid4().hex[:8]
+    final_root = export_root(export_format)
+    if incremental:
+        drop_date_partitions(export_format, since_date)
+        root = final_root
+    else:
+        root = os.path.join(EXPORT_DIR, f".{export_format}-{run_id}")
+    os.makedirs(root, exist_ok=True)
+
+    print(f"Exporting player_box as {export_format} for games on or after {since_date}...")
+    try:
+        chunks = stream_player_box_chunks(since_date, chunk_size)
+        columns, types = next(chunks)
+        exported, max_game_date = 0, None
+        for chunk_number, chunk in enumerate(chunks):
+            if export_format == "parquet":
+                write_parquet_chunk(root, chunk, columns, types, run_id, chunk_number)
+            else:
+                write_ndjson_chunk(root, chunk, columns)
+            exported += len(chunk)
+            max_game_date = chunk[-1][columns.index("game_date")]
+            print(f"Exported {exported} rows...")
+
+        if max_game_date is not None:
+            write_watermark(root, str(max_game_date))
+    except Exception:
+        if not incremental:
+            shutil.rmtree(root, ignore_errors=True)
+        raise
+
+    if not incremental:
+        # os.replace cannot overwrite a non-empty directory, so the old export is moved aside first
+        old_root = os.path.join(EXPORT_DIR, f".{export_format}-old-{run_id}")
+        if os.path.isdir(final_root):
+            os.replace(final_root, old_root)
+        os.replace(root, final_root)
+        shutil.rmtree(old_root, ignore_errors=True)
+    print(f"Data successfully exported to {final_root} ({exported} rows)")
+    return exported
+
+
+# Execute the main function
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Export the player_box table.")
+    arg_parser.add_argument("--format", choices=["csv", "parquet", "ndjson"], default="csv")
+    arg_parser.add_argument("--incremental", action="store_true", help="Only export games since the last export's watermark.")
+    arg_parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = arg_parser.parse_args()
+
+    if args.format == "csv":
+        save_player_box_to_csv()
+    else:
+        export_player_box(args.format, incremental=args.incremental, chunk_size=args.chunk_size)
@@ -0,0 +1,153 @@
+import base64
+import json
+from datetime import date
+
+from db import get_async_connection
+
+
+# Columns a client may request, as stored by PostgreSQL (lowercase)
+GAME_LOG_FIELDS = [
+    'game_id', 'game_date', 'personid', 'name', 'team', 'status', 'order_num', 'jerseynum',
+    'position', 'starter', 'oncourt', 'played', 'assists', 'blocks', 'blocksreceived',
+    'fieldgoalsattempted', 'fieldgoalsmade', 'fieldgoalspercentage', 'foulsoffensive',
+    'foulsdrawn', 'foulspersonal', 'foulstechnical', 'freethrowsattempted', 'freethrowsmade',
+    'freethrowspercentage', 'minus', 'minutes', 'minutescalculated', 'plus', 'plusminuspoints',
+    'points', 'pointsfastbreak', 'pointsinthepaint', 'pointssecondchance', 'reboundsdefensive',
+    'reboundsoffensive', 'reboundstotal', 'steals', 'threepointersattempted', 'threepointersmade',
+    'threepointerspercentage', 'turnovers', 'twopointersattempted', 'twopointersmade',
+    'twopointerspercentage', 'dd', 'td', 'fpts', 'secondsplayed', 'minutesplayed'
+]
+
+DEFAULT_FIELDS = [
+    'game_id', 'game_date', 'personid', 'name', 'team', 'position', 'starter', 'minutesplayed',
+    'points', 'reboundstotal', 'assists', 'steals', 'blocks', 'turnovers', 'threepointersmade', 'fpts'
+]
+
+# The keyset columns are always selected so the next cursor can be built
+KEYSET_FIELDS = ['game_date', 'game_id', 'personid']
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 500
+
+
+class InvalidQueryError(ValueError):
+    pass
+
+
+def parse_fields(fields):
+    """
+    Validates a comma-separated field list against GAME_LOG_FIELDS.
+
+    Returns:
+        list[str]: Requested fields, or DEFAULT_FIELDS when `fields` is empty.
+    """
+    if not fields:
+        return list(DEFAULT_FIELDS)
+    requested = [field.strip().lower() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in GAME_LOG_FIELDS]
+    if unknown:
+        raise InvalidQueryError(f"Unknown fields: {', '.join(unknown)}")
+    return list(dict.fromkeys(requested))
+
+
+def encode_cursor(row):
+    raw = json.dumps([row['game_date'].isoformat(), row['game_id'], row['personid']]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(cursor):
+    try:
+        game_date, game_id, person_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return date.fromisoformat(game_date), str(game_id), int(person_id)
+    except Exception:
+        raise InvalidQueryError("Invalid cursor")
+
+
+def parse_date(value, name):
+    if value is None:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise InvalidQueryError(f"{name} must be a YYYY-MM-DD date")
+
+
+def _serialize(row, fields):
+    return {
+        field: row[field].isoformat() if isinstance(row[field], date) else row[field]
+        for field in fields
+    }
+
+
+async def _fetch_page(column, value, fields=None, limit=DEFAULT_LIMIT, cursor=None, since=None, until=None):
+    """
+    Reads one page of game logs for a player or team, newest first.
+
+    Pages are keyed on (game_date, game_id, personId) rather than offsets, so
+    each page is a range scan on the matching (column, game_date DESC, ...)
+    index however deep the client pages. Rows whose game is not in the games
+    table have no game_date and are not listed.
+
+    Returns:
+        dict: data rows and next_cursor (None on the last page).
+    """
+    fields = parse_fields(fields)
+    limit = max(1, min(int(limit), MAX_LIMIT))
+    selected = list(dict.fromkeys(fields + KEYSET_FIELDS))
+
+    conditions, params = [f"{column} = $1", "game_date IS NOT NULL"], [value]
+    if since is not None:
+        params.append(parse_date(since, "since"))
+        conditions.append(f"game_date >= ${len(params)}")
+    if until is not None:
+        params.append(parse_date(until, "until"))
+        conditions.append(f"game_date <= ${len(params)}")
+    if cursor:
+        params.extend(decode_cursor(cursor))
+        conditions.append(f"(game_date, game_id, personId) < (${len(params) - 2}, ${len(params) - 1}, ${len(params)})")
+    params.append(limit + 1)
+
+    async with get_async_connection() as conn:
+        rows = await conn.fetch(
+            f"""
+            SELECT {", ".join(selected)} FROM player_box
+            WHERE {" AND ".join(conditions)}
+            ORDER BY game_date DESC, game_id DESC, personId DESC
+            LIMIT ${len(params)};
+            """,
+            *params
+        )
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1])
+    return {"data": [_serialize(row, fields) for row in rows], "next_cursor": next_cursor}
+
+
+# Function to page through a player's games
+async def fetch_player_games(person_id, **kwargs):
+    return await _fetch_page("personId", int(person_id), **kwargs)
+
+
+# Function to page through a team's player rows
+async def fetch_team_games(team, **kwargs):
+    return await _fetch_page("team", team, **kwargs)
+
+
+# Function to read the box score of one game
+async def fetch_game_box(game_id, fields=None):
+    """
+    Returns every player row of a game, starters first, using the primary key.
+    """
+    fields = parse_fields(fields)
+    async with get_async_connection() as conn:
+        rows = await conn.fetch(
+            f"""
+            SELECT {", ".join(fields)} FROM player_box
+            WHERE game_id = $1
+            ORDER BY team, starter DESC NULLS LAST, order_num;
+            """,
+            str(game_id)
+        )
+    return [_serialize(row, fields) for row in rows]
@@ -0,0 +1,105 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class JobManager:
+    """
+    Runs batches of independent tasks (e.g. one slate each) on a shared worker
+    pool and tracks per-task progress under a job id.
+
+    Parameters:
+        max_workers (int): Tasks processed in parallel across all jobs.
+        max_jobs (int): Finished jobs kept for status queries.
+    """
+
+    def __init__(self, max_workers=4, max_jobs=100):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self.max_jobs = max_jobs
+        self.jobs = OrderedDict()
+        self.futures = {}
+        self.lock = threading.Lock()
+
+    def submit(self, func, items):
+        """
+        Schedules `func(item)` for every item and returns immediately.
+
+        `func` reports failures either by raising or by returning a dict with
+        "status": "error", as process_salary_file does.
+
+        Returns:
+            str: The job id.
+        """
+        job_id = uuid.uuid4().hex
+        job = {
+            "job_id": job_id,
+            "status": "queued",
+            "created_at": time.time(),
+            "finished_at": None,
+            "tasks": {item: {"status": "queued", "result": None, "started_at": None, "finished_at": None} for item in items}
+        }
+        with self.lock:
+            self.jobs[job_id] = job
+            self._prune()
+            self.futures[job_id] = [self.executor.submit(self._run, job_id, func, item) for item in job["tasks"]]
+        if not job["tasks"]:
+            self._finish_if_done(job_id)
+        return job_id
+
+    def _run(self, job_id, func, item):
+        with self.lock:
+            job = self.jobs[job_id]
+            job["status"] = "running"
+            job["tasks"][item].update(status="running", started_at=time.time())
+
+        try:
+            result = func(item)
+            failed = isinstance(result, dict) and result.get("status") == "error"
+        except Exception as e:
+            result, failed = {"status": "error", "error": str(e)}, True
+
+        with self.lock:
+            job["tasks"][item].update(status="failed" if failed else "completed", result=result, finished_at=time.time())
+        self._finish_if_done(job_id)
+        return result
+
+    def _finish_if_done(self, job_id):
+        with self.lock:
+            job = self.jobs[job_id]
+            statuses = [task["status"] for task in job["tasks"].values()]
+            if any(status in ("queued", "running") for status in statuses):
+                return
+            if "failed" not in statuses:
+                job["status"] = "completed"
+            elif "completed" in statuses:
+                job["status"] = "completed_with_errors"
+            else:
+                job["status"] = "failed"
+            job["finished_at"] = time.time()
+            self.futures.pop(job_id, None)
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job["finished_at"] is not None]
+        for job_id in finished[:max(0, len(self.jobs) - self.max_jobs)]:
+            del self.jobs[job_id]
+
+    def get(self, job_id):
+        """
+        Returns a snapshot of the job with per-task progress, or None if unknown.
+        """
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            tasks = {item: dict(task) for item, task in job["tasks"].items()}
+            done = sum(task["status"] in ("completed", "failed") for task in tasks.values())
+            return {**job, "tasks": tasks, "progress": {"done": done, "total": len(tasks)}}
+
+    def futures_for(self, job_id):
+        with self.lock:
+            return list(self.futures.get(job_id, []))
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
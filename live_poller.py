@@ -0,0 +1,251 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+import pandas as pd
+from nba_api.live.nba.endpoints import scoreboard
+
+from metrics import timed_request
+from rate_limit import TokenBucket, call_with_retries
+from scoring import RULE_SETS, score_fantasy_points
+from update_player_box import add_minutes_played, boxscore_player_records, fetch_boxscore
+
+
+# Poll intervals in seconds, picked from the state of today's games
+LIVE_INTERVAL = 10
+HALFTIME_INTERVAL = 60
+PREGAME_INTERVAL = 30
+IDLE_INTERVAL = 300
+
+# Games starting within this many seconds are polled at PREGAME_INTERVAL
+PREGAME_WINDOW = 15 * 60
+
+# The poller stops after this many seconds without subscribers
+STOP_AFTER_IDLE = 120
+
+# Box score columns pushed to clients per player
+LIVE_STAT_COLUMNS = [
+    'points', 'reboundsTotal', 'assists', 'steals', 'blocks', 'turnovers', 'threePointersMade'
+]
+
+
+# Function to summarize a scoreboard game for clients
+def game_summary(game):
+    return {
+        "game_id": game['gameId'],
+        "status": game['gameStatus'],
+        "status_text": game['gameStatusText'].strip(),
+        "period": game['period'],
+        "clock": game['gameClock'],
+        "start": game['gameTimeUTC'],
+        "away": game['awayTeam']['teamTricode'],
+        "home": game['homeTeam']['teamTricode'],
+        "away_score": game['awayTeam']['score'],
+        "home_score": game['homeTeam']['score']
+    }
+
+
+# Function to compute live fantasy points for every player in a boxscore
+def live_player_rows(game_id, game_stats_dict):
+    """
+    Scores a live or final boxscore with the DraftKings rule set.
+
+    Returns:
+        dict: personId (as a string) -> live stat row.
+    """
+    df = pd.DataFrame(boxscore_player_records(game_id, game_stats_dict))
+    if df.empty:
+        return {}
+    df['FPTS'] = score_fantasy_points(df, RULE_SETS['dk_classic'])
+    add_minutes_played(df)
+    df['minutesPlayed'] = df['minutesPlayed'].fillna(0).round(2)
+
+    rows = {}
+    for record in df[['personId', 'name', 'team', 'game_id', 'minutesPlayed', 'FPTS'] + LIVE_STAT_COLUMNS].to_dict(orient='records'):
+        record['FPTS'] = round(float(record['FPTS']), 2)
+        rows[str(record['personId'])] = record
+    return rows
+
+
+def next_poll_interval(games, now=None):
+    """
+    Picks the delay before the next poll from the scoreboard games: fast while
+    games are live, slower at halftime or shortly before tip-off, and idle
+    otherwise.
+    """
+    now = now or datetime.now(timezone.utc)
+    live = [game for game in games if game['gameStatus'] == 2]
+    if live:
+        if all(game['gameStatusText'].strip().lower() == 'half' for game in live):
+            return HALFTIME_INTERVAL
+        return LIVE_INTERVAL
+
+    upcoming = [
+        (datetime.fromisoformat(game['gameTimeUTC'].replace('Z', '+00:00')) - now).total_seconds()
+        for game in games if game['gameStatus'] == 1
+    ]
+    if not upcoming:
+        return IDLE_INTERVAL
+    until_start = min(upcoming)
+    if until_start <= PREGAME_WINDOW:
+        return PREGAME_INTERVAL
+    # Wake up in time for the pregame window of the next game
+    return max(PREGAME_INTERVAL, min(IDLE_INTERVAL, until_start - PREGAME_WINDOW))
+
+
+class LivePoller:
+    """
+    Single poller of the live scoreboard and in-progress boxscores shared by
+    every connected client.
+
+    Each poll scores the live boxscores, compares them with the previous poll
+    and records only the players whose line changed under a new version, in the
+    same since/diff shape as the projection feed. The poller starts with the
+    first subscriber and stops once nobody has been subscribed for
+    STOP_AFTER_IDLE seconds.
+
+    Parameters:
+        history (int): Number of diffs kept for `since` queries.
+        rate (float): Maximum nba_api requests per second.
+    """
+
+    def __init__(self, history=256, rate=1.0):
+        self.bucket = TokenBucket(rate, capacity=2)
+        self.version = 0
+        self.rows = {}
+        self.games = {}
+        self.changes = deque(maxlen=history)
+        self.finished = set()
+        self.interval = None
+        self.lock = threading.Lock()
+        self.subscribers = set()
+        self.loop = None
+        self.task = None
+        self.idle_since = None
+
+    def poll_once(self):
+        """
+        Fetches the scoreboard and the boxscores of live games, then records a
+        new version if anything changed.
+
+        Returns:
+            float: Seconds until the next poll.
+        """
+        board = call_with_retries(lambda: timed_request('ScoreBoard', lambda: scoreboard.ScoreBoard().get_dict()), bucket=self.bucket, max_retries=2)
+        games = board['scoreboard']['games']
+
+        # Players and finished games of games no longer on the scoreboard (e.g. yesterday's) are dropped
+        game_ids = {game['gameId'] for game in games}
+        rows = {key: row for key, row in self.rows.items() if row['game_id'] in game_ids}
+        self.finished &= game_ids
+        for game in games:
+            game_id = game['gameId']
+            # Live games every poll; finished games once more to catch final stats
+            if game['gameStatus'] == 1 or game_id in self.finished:
+                continue
+            try:
+                game_stats_dict = fetch_boxscore(game_id, bucket=self.bucket, max_retries=2)
+            except Exception as e:
+                print(f"Error fetching live boxscore for game {game_id}: {e}")
+                continue
+            rows.update(live_player_rows(game_id, game_stats_dict))
+            if game_stats_dict['game']['gameStatus'] == 3:
+                self.finished.add(game_id)
+
+        summaries = {game['gameId']: game_summary(game) for game in games}
+        self.apply(rows, summaries)
+        return next_poll_interval(games)
+
+    def apply(self, rows, games):
+        with self.lock:
+            changed = {key: row for key, row in rows.items() if self.rows.get(key) != row}
+            changed_games = {key: game for key, game in games.items() if self.games.get(key) != game}
+            removed = not (self.rows.keys() <= rows.keys() and self.games.keys() <= games.keys())
+            if not changed and not changed_games and not removed:
+                return False
+            self.version += 1
+            self.rows = rows
+            self.games = games
+            self.changes.append((self.version, changed, changed_games))
+            if removed:
+                # Diffs cannot express removals, so every client catching up gets a full snapshot
+                self.changes.clear()
+            version = self.version
+        self._publish(version)
+        return True
+
+    def snapshot(self, since=None):
+        """
+        Returns what a client needs to catch up to the current version.
+
+        Returns:
+            dict: version, whether the data is a full snapshot, the changed (or
+            all) player rows and the changed (or all) games.
+        """
+        with self.lock:
+            oldest = self.changes[0][0] if self.changes else self.version + 1
+            if since is None or since < oldest - 1 or since > self.version:
+                return {
+                    "version": self.version, "full": True,
+                    "data": list(self.rows.values()), "games": list(self.games.values())
+                }
+
+            changed, changed_games = {}, {}
+            for version, version_changed, version_games in self.changes:
+                if version > since:
+                    changed.update(version_changed)
+                    changed_games.update(version_games)
+            return {
+                "version": self.version, "full": False,
+                "data": list(changed.values()), "games": list(changed_games.values())
+            }
+
+    def subscribe(self):
+        """
+        Registers a subscriber queue that receives every new version number and
+        starts the poller if it is not running.
+        """
+        queue = asyncio.Queue()
+        self.subscribers.add(queue)
+        self.idle_since = None
+        if self.task is None or self.task.done():
+            self.loop = asyncio.get_running_loop()
+            self.task = self.loop.create_task(self.run())
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+        if not self.subscribers:
+            self.idle_since = time.monotonic()
+
+    def _publish(self, version):
+        if self.loop is None:
+            return
+        for queue in list(self.subscribers):
+            self.loop.call_soon_threadsafe(queue.put_nowait, version)
+
+    async def run(self):
+        """
+        Polls until cancelled or idle for STOP_AFTER_IDLE seconds.
+        """
+        while True:
+            if self.idle_since is not None and time.monotonic() - self.idle_since >= STOP_AFTER_IDLE:
+                print("Live poller stopped: no subscribers.")
+                return
+            try:
+                self.interval = await asyncio.to_thread(self.poll_once)
+            except Exception as e:
+                print(f"Error polling live scoreboard: {e}")
+                self.interval = LIVE_INTERVAL
+            await asyncio.sleep(self.interval)
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
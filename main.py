@@ -1,255 +1,619 @@
-import numpy as np
-import pandas as pd
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-
-import redis
-from typing import List
-import psycopg2
-import re
-
-app = FastAPI()
-
-# Redis connection
-rd = redis.Redis(
-    host='redis-15539.c331.us-west1-1.gce.redns.redis-cloud.com',
-    port=15539,
-    password='5p4mGkXnAklU5JcwbHoVrMg1c8U8IktY',
-    decode_responses=True
-)
-
-# CORS setup
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # Adjust for specific domains in production
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-
-
-# Function to connect to PostgreSQL
-def connect_to_postgres():
-    try:
-        conn = psycopg2.connect(
-            host='localhost',
-            user='db_user',
-            password='hello',
-            dbname='nba_api'
-        )
-        return conn
-    except psycopg2.Error as e:
-        print(f"Error connecting to PostgreSQL: {e}")
-        exit(1)
-
-
-# Helper function to process the CSV file
-def process_salary_file(slate_id: str):
-    try:
-        # Read the file
-        salary_df = pd.read_csv(f"sal-{slate_id}.csv")
-
-        # Process the DataFrame
-        game_info_split = salary_df['Game Info'].str.split(' ', expand=True)
-        date = game_info_split[1]
-        time_et = game_info_split[2].str.split(' ', expand=True)[0]
-        salary_df['datetime'] = date + ' ' + time_et
-        salary_df['datetime'] = pd.to_datetime(
-            salary_df['datetime'],
-            format='%m/%d/%Y %I:%M%p'
-        ).dt.tz_localize('US/Eastern')
-
-        unique_teams = sorted(salary_df['TeamAbbrev'].unique())
-        redis_key = f"react_slate_teams_{slate_id}"
-        rd.set(redis_key, ",".join(unique_teams))
-
-        def get_opponent(row):
-            teams = row['Game Info'].split(' ')[0].split('@')
-            return teams[0] if row['TeamAbbrev'] == teams[1] else teams[1]
-
-        salary_df['opp'] = salary_df.apply(get_opponent, axis=1)
-
-        conn = connect_to_postgres()
-        cursor = conn.cursor()
-
-        def get_team_id(team_abbrev):
-            query = "SELECT nba_team_id FROM teams WHERE abv = %s"
-            cursor.execute(query, (team_abbrev,))
-            result = cursor.fetchone()
-            return result[0] if result else None
-
-        salary_df['team_id'] = salary_df['TeamAbbrev'].apply(get_team_id)
-        salary_df['opp_team_id'] = salary_df['opp'].apply(get_team_id)
-
-        name_corrections = {
-            "jakobpoltl": "jakobpoeltl",
-            "ggjackson": "gregoryjackson"
-        }
-
-        def create_shortname(name: str) -> str:
-            name = re.sub(r'[^a-zA-Z0-9\s]', '', name)
-            for suffix in [" Jr", " III", " II", " IV", " Sr"]:
-                if name.endswith(suffix):
-                    name = name[: -len(suffix)]
-            return name.replace(" ", "").lower()
-
-        salary_df['shortname'] = salary_df['Name'].apply(create_shortname)
-
-        cursor.execute("SELECT id, unaccent(full_name) AS normalized_name FROM player_ids")
-        player_ids = cursor.fetchall()
-
-        player_ids_df = pd.DataFrame(player_ids, columns=['id', 'full_name'])
-        player_ids_df['shortname'] = player_ids_df['full_name'].apply(create_shortname)
-
-        player_ids_dict = player_ids_df.set_index('shortname')['id'].to_dict()
-        salary_df['player_id'] = salary_df['shortname'].map(player_ids_dict).apply(lambda x: int(x) if pd.notnull(x) else '')
-
-        unmatched_names = salary_df[salary_df['player_id'].isna()]['Name'].tolist()
-        if unmatched_names:
-            print("Unmatched Names:", unmatched_names)
-
-        conn.close()
-
-        salary_df['game_date'] = salary_df['datetime'].dt.strftime('%Y-%m-%d')
-        salary_df['slateID'] = slate_id
-        salary_df.columns = salary_df.columns.str.lower().str.replace(" ", "").str.replace("+", "")
-
-        # Save the processed DataFrame
-        file_path = f"sal-{slate_id}-processed.csv"
-        salary_df.to_csv(file_path, index=False)
-        print(salary_df)
-
-        # Insert into database
-        conn = connect_to_postgres()
-        cursor = conn.cursor()
-
-        # Create table if it doesn't exist
-        columns = salary_df.columns
-        create_table_query = f"""
-        CREATE TABLE IF NOT EXISTS dksal (
-            {", ".join(f"{col} TEXT" for col in columns)},
-            UNIQUE (player_id, game_date, slateid)
-        );
-        """
-        cursor.execute(create_table_query)
-        conn.commit()
-
-        # Insert unique records
-        for _, row in salary_df.iterrows():
-            columns_list = ', '.join(columns)
-            placeholders = ', '.join(['%s'] * len(columns))
-            insert_query = f"""
-            INSERT INTO dksal ({columns_list})
-            VALUES ({placeholders})
-            ON CONFLICT (player_id, game_date, slateid) DO NOTHING;
-            """
-            cursor.execute(insert_query, tuple(row))
-
-        conn.commit()
-        conn.close()
-
-        sal_file_date = salary_df['game_date'].max()
-
-        return {
-            "status": "success",
-            "max_game_date": sal_file_date,
-            "processed_rows": len(salary_df),
-            "unique_teams_key": redis_key
-        }
-    except Exception as e:
-        return {"status": "error", "error": str(e)}
-
-
-
-
-# Endpoint to process slate IDs
-@app.post("/process-slates/")
-async def process_slates(slates: List[str]):
-    results = {}
-    redis_key = "react_slateIDs_today"
-    rd.set(redis_key, ",".join(slates))
-    for slate_id in slates:
-        # Construct the file path for the slate
-        # file_path = f"sal-{slate_id}.csv"
-        result = process_salary_file(slate_id)
-        results[slate_id] = result
-
-    return results
-
-
-@app.get("/get-slate-ids/")
-async def get_slate_ids():
-    try:
-        slate_ids = rd.get("react_slateIDs_today")
-        if not slate_ids:
-            return {"status": "error", "message": "No slate IDs found in Redis"}
-        slate_ids_list = slate_ids.split(",")  # Convert the comma-separated string to a list
-        return {"status": "success", "slate_ids": slate_ids_list}
-    except Exception as e:
-        return {"status": "error", "message": str(e)}
-
-
-import os
-import pandas as pd
-from fastapi.responses import JSONResponse
-
-@app.get("/get-slate-data/{slate_id}")
-async def get_slate_data(slate_id: str):
-    try:
-        file_path = f"sal-{slate_id}-processed.csv"
-        if not os.path.exists(file_path):
-            return JSONResponse(
-                status_code=404,
-                content={"status": "error", "message": f"File {file_path} not found"}
-            )
-        # Load the CSV file
-        df = pd.read_csv(file_path)
-
-        # Replace NaN values with an appropriate placeholder
-        df = df.fillna("")  # Replace NaN with an empty string for JSON compatibility
-
-        # Convert to JSON format
-        data = df.to_dict(orient="records")
-
-        return {"status": "success", "data": data}
-    except Exception as e:
-        return {"status": "error", "message": str(e)}
-
-
-@app.get("/get-updated-data/{slate_id}")
-async def get_updated_data(slate_id: str):
-    try:
-        # Define the path to the CSV containing updated data
-        updated_file_path = f"awesemo_proj.csv"
-        if not os.path.exists(updated_file_path):
-            return JSONResponse(
-                status_code=404,
-                content={"status": "error", "message": f"File {updated_file_path} not found"}
-            )
-
-        # Load the CSV file
-        awesemo_proj = pd.read_csv(updated_file_path)
-        remove_words = [" Jr", " III", " II", " IV", " Sr"]
-        pat = "|".join(remove_words)
-        awesemo_proj['shortname'] = awesemo_proj['Name'].str.replace(pat, "", regex=True).str.lower()
-        awesemo_proj.drop_duplicates(subset="shortname", keep='first', inplace=True)
-        # awesemo_proj['FPM'] = (awesemo_proj['Fpts'] / awesemo_proj['Minutes']).round(3)
-        awesemo_proj.rename(columns={"Fpts": "proj", "Minutes": "min"}, inplace=True)
-
-        # Ensure the CSV contains 'shortname', 'proj', and 'min' columns
-        if not {'shortname', 'proj', 'min'}.issubset(awesemo_proj.columns):
-            return JSONResponse(
-                status_code=400,
-                content={"status": "error", "message": "CSV missing required columns"}
-            )
-
-        # Convert the data to a list of dictionaries
-        awesemo_updated_data = awesemo_proj[['shortname', 'proj', 'min']].fillna("").to_dict(orient="records")
-        print(awesemo_updated_data)
-
-
-        return {"status": "success", "data": awesemo_updated_data}
-    except Exception as e:
+import numpy as np
+import pandas as pd
+from fastapi import FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+from pydantic import BaseModel
+from typing import Dict, List, Optional
+import asyncio
+import io
+import json
+import os
+import time
+
+from db import get_connection, close_pool, close_async_pool, missing_columns
+from team_index import get_team_index
+from player_names import create_shortname, get_name_resolver
+from slate_cache import SlatePayloadCache, etag_matches
+from projections import MissingColumnsError, ProjectionFeed
+from jobs import JobManager
+from dvp import add_dvp_columns
+from features import fetch_player_features
+from team_ratings import add_env_columns
+from game_logs import InvalidQueryError, fetch_game_box, fetch_player_games, fetch_team_games
+from optimizer import default_workers, format_lineups, load_slate_players, optimize_lineups
+from simulator import SimulationCache, load_player_history, simulate_slate
+from live_poller import LivePoller
+from redis_store import RedisStore, legacy_teams_key
+from metrics import HTTP_SECONDS, add_rows, metrics_response, stage
+
+app = FastAPI()
+
+# Slate metadata in Redis (REDIS_HOST/REDIS_PORT/REDIS_PASSWORD), cached in memory for poll endpoints
+redis_store = RedisStore()
+
+# CORS setup
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],  # Adjust for specific domains in production
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+
+# Request latency per route template, so path parameters do not split the series
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        HTTP_SECONDS.labels(
+            request.method, route.path if route is not None else "unmatched", str(status)
+        ).observe(time.perf_counter() - start)
+
+
+# Serialized /get-slate-data payloads, rebuilt when the processed CSV changes
+slate_cache = SlatePayloadCache(max_entries=int(os.getenv('SLATE_CACHE_SIZE', 32)))
+
+
+# Background slate processing; each slate of a job runs on its own worker
+slate_jobs = JobManager(max_workers=int(os.getenv('SLATE_WORKERS', 4)))
+
+# Versioned projection snapshot, watched for changes in the background
+projection_feed = ProjectionFeed()
+
+# Slate simulation results keyed by slate, projection version and settings
+simulation_cache = SimulationCache()
+
+# Shared live scoreboard/boxscore poller, started by the first /live/stream client
+live_poller = LivePoller(rate=float(os.getenv('LIVE_POLL_RATE', 1.0)))
+
+
+@app.on_event("startup")
+async def start_projection_watcher():
+    app.state.projection_watcher = asyncio.create_task(
+        projection_feed.watch(float(os.getenv('PROJECTION_POLL_SECONDS', 1.0)))
+    )
+
+
+@app.on_event("startup")
+async def start_redis_listener():
+    await run_in_threadpool(redis_store.start_listener)
+
+
+@app.on_event("startup")
+async def warm_slate_cache():
+    try:
+        slate_ids = await run_in_threadpool(redis_store.get_slate_ids)
+        for slate_id in slate_ids:
+            await run_in_threadpool(slate_cache.get, slate_id)
+    except Exception as e:
+        print(f"Error warming slate cache: {e}")
+
+
+@app.on_event("shutdown")
+async def stop_projection_watcher():
+    app.state.projection_watcher.cancel()
+
+
+@app.on_event("shutdown")
+async def stop_redis_listener():
+    redis_store.stop_listener()
+
+
+@app.on_event("shutdown")
+async def stop_live_poller():
+    await live_poller.stop()
+
+
+@app.on_event("shutdown")
+async def stop_slate_jobs():
+    slate_jobs.shutdown()
+
+
+@app.on_event("shutdown")
+async def close_database_pools():
+    close_pool()
+    await close_async_pool()
+
+
+# Bulk load a processed slate into dksal
+def bulk_load_dksal(conn, salary_df):
+    """
+    Streams a processed salary DataFrame into the 'dksal' table with COPY into a
+    temporary staging table, then merges it with one set-based upsert. Everything
+    runs in a single transaction.
+
+    Parameters:
+        conn: psycopg2 connection object.
+        salary_df (pd.DataFrame): The processed slate.
+
+    Returns:
+        dict: Counts of inserted rows, skipped rows (duplicate keys within the
+        slate) and conflicting rows (keys already present in 'dksal').
+    """
+    columns = list(salary_df.columns)
+    columns_list = ", ".join(columns)
+
+    buffer = io.StringIO()
+    salary_df.to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+
+    with conn:
+        with conn.cursor() as cursor:
+            cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS dksal (
+                {", ".join(f"{col} TEXT" for col in columns)},
+                UNIQUE (player_id, game_date, slateid)
+            );
+            """)
+            # ALTER takes an ACCESS EXCLUSIVE lock even when nothing changes, so only run it for new columns
+            new_columns = missing_columns(cursor, 'dksal', columns)
+            if new_columns:
+                cursor.execute(
+                    "ALTER TABLE dksal "
+                    + ", ".join(f"ADD COLUMN IF NOT EXISTS {col} TEXT" for col in new_columns)
+                )
+            # src_row numbers the rows in file order, so duplicates resolve to the first one
+            cursor.execute("CREATE TEMP TABLE dksal_stage (LIKE dksal, src_row BIGSERIAL) ON COMMIT DROP;")
+
+            # Unmatched players keep an empty player_id, as the row-by-row insert did
+            cursor.copy_expert(
+                f"COPY dksal_stage ({columns_list}) FROM STDIN "
+                f"WITH (FORMAT csv, FORCE_NOT_NULL (player_id))",
+                buffer
+            )
+            staged = len(salary_df)
+
+            cursor.execute(f"""
+            WITH deduped AS (
+                SELECT DISTINCT ON (player_id, game_date, slateid) {columns_list}
+                FROM dksal_stage
+                ORDER BY player_id, game_date, slateid, src_row
+            ), inserted AS (
+                INSERT INTO dksal ({columns_list})
+                SELECT {columns_list} FROM deduped
+                ON CONFLICT (player_id, game_date, slateid) DO NOTHING
+                RETURNING 1
+            )
+            SELECT (SELECT COUNT(*) FROM deduped), (SELECT COUNT(*) FROM inserted);
+            """)
+            distinct_rows, inserted = cursor.fetchone()
+
+    return {
+        "inserted": inserted,
+        "skipped": staged - distinct_rows,
+        "conflicting": distinct_rows - inserted
+    }
+
+
+# Helper function to process the CSV file
+def process_salary_file(slate_id: str):
+    try:
+        # Read the file
+        with stage('slate', 'read_csv'):
+            salary_df = pd.read_csv(f"sal-{slate_id}.csv")
+        add_rows('slate', 'read_csv', len(salary_df))
+
+        # Process the DataFrame
+        with stage('slate', 'transform', rows=len(salary_df)):
+            game_info_split = salary_df['Game Info'].str.split(' ', expand=True)
+            date = game_info_split[1]
+            time_et = game_info_split[2].str.split(' ', expand=True)[0]
+            salary_df['datetime'] = date + ' ' + time_et
+            salary_df['datetime'] = pd.to_datetime(
+                salary_df['datetime'],
+                format='%m/%d/%Y %I:%M%p'
+            ).dt.tz_localize('US/Eastern')
+
+            unique_teams = sorted(salary_df['TeamAbbrev'].unique())
+
+            matchup = salary_df['Game Info'].str.split(' ').str[0].str.split('@', expand=True)
+            salary_df['opp'] = matchup[0].where(salary_df['TeamAbbrev'] == matchup[1], matchup[1])
+
+        with stage('slate', 'team_lookup', rows=len(salary_df)):
+            team_index = get_team_index()
+            salary_df['team_id'] = salary_df['TeamAbbrev'].map(team_index.abv_to_id)
+            salary_df['opp_team_id'] = salary_df['opp'].map(team_index.abv_to_id)
+
+        # Opponent defense-vs-position factors from the precomputed dvp table
+        with stage('slate', 'dvp', rows=len(salary_df)):
+            add_dvp_columns(salary_df)
+
+        # Implied pace and scoring environment from rolling team ratings
+        with stage('slate', 'team_ratings', rows=len(salary_df)):
+            add_env_columns(salary_df)
+
+        with stage('slate', 'name_matching', rows=len(salary_df)):
+            salary_df['shortname'] = salary_df['Name'].map(create_shortname)
+
+            player_ids_dict, unmatched_names = get_name_resolver().resolve(salary_df['Name'])
+            salary_df['player_id'] = salary_df['Name'].map(player_ids_dict).apply(lambda x: int(x) if pd.notnull(x) else '')
+
+        if unmatched_names:
+            print("Unmatched Names:", unmatched_names)
+
+        salary_df['game_date'] = salary_df['datetime'].dt.strftime('%Y-%m-%d')
+        salary_df['slateID'] = slate_id
+        salary_df.columns = salary_df.columns.str.lower().str.replace(" ", "").str.replace("+", "")
+
+        # Save the processed DataFrame
+        with stage('slate', 'write_csv', rows=len(salary_df)):
+            file_path = f"sal-{slate_id}-processed.csv"
+            salary_df.to_csv(file_path, index=False)
+        print(salary_df)
+
+        # Insert into database
+        with stage('slate', 'db_load', rows=len(salary_df)):
+            with get_connection() as conn:
+                load_stats = bulk_load_dksal(conn, salary_df)
+
+        sal_file_date = salary_df['game_date'].max()
+
+        # Teams, dates and counts go to the slate's hash in one round trip
+        with stage('slate', 'redis_metadata'):
+            redis_store.set_slate_metadata(
+                slate_id, unique_teams, status="processed", max_game_date=sal_file_date,
+                processed_rows=len(salary_df), inserted_rows=load_stats["inserted"]
+            )
+
+        return {
+            "status": "success",
+            "max_game_date": sal_file_date,
+            "processed_rows": len(salary_df),
+            "inserted_rows": load_stats["inserted"],
+            "skipped_rows": load_stats["skipped"],
+            "conflicting_rows": load_stats["conflicting"],
+            "unmatched_names": unmatched_names,
+            "unique_teams_key": legacy_teams_key(slate_id)
+        }
+    except Exception as e:
+        try:
+            redis_store.set_slate_metadata(slate_id, status="error", error=str(e))
+        except Exception as redis_error:
+            print(f"Error recording slate status for {slate_id}: {redis_error}")
+        return {"status": "error", "error": str(e)}
+
+
+
+
+# Endpoint to process slate IDs
+@app.post("/process-slates/")
+async def process_slates(slates: List[str], background: bool = False):
+    """
+    Processes the slates and returns each slate's result, keyed by slate id.
+    With ?background=true, returns a job id right away instead; progress and
+    results are then read from /jobs/{job_id}.
+    """
+    await run_in_threadpool(redis_store.set_slate_ids, slates)
+
+    # Slates are independent, so they are processed in parallel off the event loop
+    job_id = slate_jobs.submit(process_salary_file, slates)
+    if background:
+        return {"status": "accepted", "job_id": job_id, "slates": slates}
+
+    await asyncio.gather(*(asyncio.wrap_future(future) for future in slate_jobs.futures_for(job_id)))
+    job = slate_jobs.get(job_id)
+    return {slate_id: task["result"] for slate_id, task in job["tasks"].items()}
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = slate_jobs.get(job_id)
+    if job is None:
+        return JSONResponse(
+            status_code=404,
+            content={"status": "error", "message": f"Job {job_id} not found"}
+        )
+    return {"status": "success", "job": job}
+
+
+@app.get("/get-slate-ids/")
+async def get_slate_ids():
+    try:
+        # Served from the in-process copy until the version key moves
+        slate_ids_list = redis_store.get_slate_ids()
+        if not slate_ids_list:
+            return {"status": "error", "message": "No slate IDs found in Redis"}
+        return {"status": "success", "slate_ids": slate_ids_list}
+    except Exception as e:
         return {"status": "error", "message": str(e)}
+
+
+import os
+import pandas as pd
+from fastapi.responses import JSONResponse
+
+@app.get("/get-slate-data/{slate_id}")
+async def get_slate_data(slate_id: str, request: Request):
+    try:
+        file_path = slate_cache.file_path(slate_id)
+        # Cache misses read and serialize the CSV, so keep them off the event loop
+        cached = await run_in_threadpool(slate_cache.get, slate_id)
+        if cached is None:
+            return JSONResponse(
+                status_code=404,
+                content={"status": "error", "message": f"File {file_path} not found"}
+            )
+        etag, body = cached
+
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+
+@app.get("/get-updated-data/{slate_id}")
+async def get_updated_data(slate_id: str, since: Optional[int] = None):
+    try:
+        # Define the path to the CSV containing updated data
+        updated_file_path = projection_feed.file_path
+        if not projection_feed.exists():
+            return JSONResponse(
+                status_code=404,
+                content={"status": "error", "message": f"File {updated_file_path} not found"}
+            )
+
+        # Only re-parses the CSV when it changed on disk
+        await run_in_threadpool(projection_feed.refresh)
+        return {"status": "success", **projection_feed.snapshot(since)}
+    except MissingColumnsError as e:
+        return JSONResponse(
+            status_code=400,
+            content={"status": "error", "message": str(e)}
+        )
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+
+@app.get("/player-features/")
+async def get_player_features(player_ids: str):
+    """
+    Rolling L5/L10/season features for a comma-separated list of player IDs.
+    """
+    try:
+        person_ids = [int(player_id) for player_id in player_ids.split(",") if player_id.strip()]
+    except ValueError:
+        return JSONResponse(
+            status_code=400,
+            content={"status": "error", "message": "player_ids must be a comma-separated list of integers"}
+        )
+    try:
+        return {"status": "success", "data": await fetch_player_features(person_ids)}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+
+@app.get("/players/{player_id}/games")
+async def get_player_games(
+    player_id: int, fields: Optional[str] = None, limit: int = 20, cursor: Optional[str] = None,
+    since: Optional[str] = None, until: Optional[str] = None
+):
+    """
+    A player's game logs, newest first. `fields` is a comma-separated column
+    list; pass `next_cursor` back as `cursor` for the next page.
+    """
+    try:
+        page = await fetch_player_games(player_id, fields=fields, limit=limit, cursor=cursor, since=since, until=until)
+        return {"status": "success", **page}
+    except InvalidQueryError as e:
+        return JSONResponse(status_code=400, content={"status": "error", "message": str(e)})
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+
+@app.get("/teams/{team}/games")
+async def get_team_games(
+    team: str, fields: Optional[str] = None, limit: int = 20, cursor: Optional[str] = None,
+    since: Optional[str] = None, until: Optional[str] = None
+):
+    """
+    Player rows for a team (by nickname, as stored in player_box), newest first,
+    paginated like /players/{player_id}/games.
+    """
+    try:
+        page = await fetch_team_games(team, fields=fields, limit=limit, cursor=cursor, since=since, until=until)
+        return {"status": "success", **page}
+    except InvalidQueryError as e:
+        return JSONResponse(status_code=400, content={"status": "error", "message": str(e)})
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+
+@app.get("/games/{game_id}/box")
+async def get_game_box(game_id: str, fields: Optional[str] = None):
+    try:
+        rows = await fetch_game_box(game_id, fields=fields)
+        if not rows:
+            return JSONResponse(
+                status_code=404,
+                content={"status": "error", "message": f"Game {game_id} not found"}
+            )
+        return {"status": "success", "data": rows}
+    except InvalidQueryError as e:
+        return JSONResponse(status_code=400, content={"status": "error", "message": str(e)})
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+
+class OptimizeRequest(BaseModel):
+    num_lineups: int = 150
+    lock: List[int] = []
+    exclude: List[int] = []
+    min_unique: int = 1
+    max_exposure: float = 1.0
+    exposures: Dict[int, float] = {}
+    randomness: float = 0.1
+    seed: Optional[int] = None
+
+
+# Function to build lineups for a slate, run off the event loop
+def build_slate_lineups(slate_id, options):
+    players = load_slate_players(slate_id, projection_feed.rows)
+    # Locks, excludes and exposure caps use DraftKings player ids
+    row_by_id = {dk_id: row for row, dk_id in enumerate(players['id'])}
+    locked = [row_by_id[dk_id] for dk_id in options.lock if dk_id in row_by_id]
+    excluded = [row_by_id[dk_id] for dk_id in options.exclude if dk_id in row_by_id]
+    player_exposures = {row_by_id[dk_id]: value for dk_id, value in options.exposures.items() if dk_id in row_by_id}
+
+    lineups = optimize_lineups(
+        players, num_lineups=options.num_lineups, locked=locked, excluded=excluded,
+        min_unique=options.min_unique, max_exposure=options.max_exposure,
+        player_exposures=player_exposures, randomness=options.randomness,
+        workers=int(os.getenv('OPTIMIZER_WORKERS', default_workers())), seed=options.seed
+    )
+    return format_lineups(players, lineups)
+
+
+@app.post("/optimize/{slate_id}")
+async def optimize_slate(slate_id: str, options: OptimizeRequest):
+    """
+    Builds distinct DraftKings classic lineups for a processed slate from the
+    current projections.
+    """
+    try:
+        if not os.path.exists(slate_cache.file_path(slate_id)):
+            return JSONResponse(
+                status_code=404,
+                content={"status": "error", "message": f"File {slate_cache.file_path(slate_id)} not found"}
+            )
+        if projection_feed.exists():
+            await run_in_threadpool(projection_feed.refresh)
+        lineups, exposures = await run_in_threadpool(build_slate_lineups, slate_id, options)
+        return {
+            "status": "success",
+            "projection_version": projection_feed.version,
+            "lineups": lineups,
+            "exposures": exposures
+        }
+    except MissingColumnsError as e:
+        return JSONResponse(
+            status_code=400,
+            content={"status": "error", "message": str(e)}
+        )
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+
+class SimulateRequest(BaseModel):
+    sims: int = 10000
+    pool_size: int = 150
+    seed: Optional[int] = None
+
+
+# Function to simulate a slate over a pool of optimized lineups, run off the event loop
+def run_slate_simulation(slate_id, options):
+    players = load_slate_players(slate_id, projection_feed.rows)
+    workers = int(os.getenv('OPTIMIZER_WORKERS', default_workers()))
+    lineups = optimize_lineups(players, num_lineups=options.pool_size, workers=workers, seed=options.seed)
+    history = load_player_history(pd.to_numeric(players['player_id'], errors='coerce').dropna())
+    player_summaries, lineup_summaries = simulate_slate(
+        players, history, lineups, sims=options.sims, workers=workers, seed=options.seed
+    )
+    return {"players": player_summaries, "lineups": lineup_summaries}
+
+
+@app.post("/simulate/{slate_id}")
+async def simulate_slate_endpoint(slate_id: str, options: SimulateRequest):
+    """
+    Monte Carlo percentiles per player and optimal-lineup frequencies over a
+    pool of optimized lineups, cached per slate file and projection version.
+    """
+    try:
+        file_path = slate_cache.file_path(slate_id)
+        if not os.path.exists(file_path):
+            return JSONResponse(
+                status_code=404,
+                content={"status": "error", "message": f"File {file_path} not found"}
+            )
+        if projection_feed.exists():
+            await run_in_threadpool(projection_feed.refresh)
+        key = (slate_id, os.stat(file_path).st_mtime_ns, projection_feed.version, options.sims, options.pool_size, options.seed)
+        result, cached = await run_in_threadpool(
+            simulation_cache.get_or_run, key, lambda: run_slate_simulation(slate_id, options)
+        )
+        return {"status": "success", "projection_version": projection_feed.version, "cached": cached, **result}
+    except MissingColumnsError as e:
+        return JSONResponse(
+            status_code=400,
+            content={"status": "error", "message": str(e)}
+        )
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+
+@app.get("/projections/stream")
+async def stream_projections(request: Request, since: Optional[int] = None):
+    """
+    Server-sent events feed of projection diffs. The first event catches the
+    client up from `since`; later events carry only the rows that changed.
+    """
+    queue = projection_feed.subscribe()
+
+    async def events():
+        last_version = since
+        try:
+            while True:
+                snapshot = projection_feed.snapshot(last_version)
+                if last_version is None or snapshot["version"] != last_version:
+                    last_version = snapshot["version"]
+                    yield f"id: {last_version}\nevent: projections\ndata: {json.dumps(snapshot)}\n\n"
+                try:
+                    await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                if await request.is_disconnected():
+                    break
+        finally:
+            projection_feed.unsubscribe(queue)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.get("/live/snapshot")
+async def get_live_snapshot(since: Optional[int] = None):
+    return {"status": "success", "interval": live_poller.interval, **live_poller.snapshot(since)}
+
+
+@app.get("/live/stream")
+async def stream_live_scores(request: Request, since: Optional[int] = None):
+    """
+    Server-sent events feed of live fantasy points. All clients share one
+    poller; each event carries only the players and games that changed.
+    """
+    queue = live_poller.subscribe()
+
+    async def events():
+        last_version = since
+        try:
+            while True:
+                snapshot = live_poller.snapshot(last_version)
+                if last_version is None or snapshot["version"] != last_version:
+                    last_version = snapshot["version"]
+                    yield f"id: {last_version}\nevent: live\ndata: {json.dumps(snapshot)}\n\n"
+                try:
+                    await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                if await request.is_disconnected():
+                    break
+        finally:
+            live_poller.unsubscribe(queue)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.get("/metrics")
+async def get_metrics():
+    body, content_type = metrics_response()
+    return Response(content=body, media_type=content_type)
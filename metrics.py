@@ -0,0 +1,160 @@
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import psycopg2.extensions
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Histogram, generate_latest
+
+
+STAGE_SECONDS = Histogram(
+    'bolt_stage_duration_seconds', 'Duration of pipeline stages.', ['pipeline', 'stage'],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+)
+ROWS_PROCESSED = Counter('bolt_rows_processed', 'Rows processed by pipeline stages.', ['pipeline', 'stage'])
+DB_ROUND_TRIPS = Counter('bolt_db_round_trips', 'PostgreSQL round trips, by the stage issuing them.', ['pipeline', 'stage'])
+CACHE_REQUESTS = Counter('bolt_cache_requests', 'Cache lookups by outcome.', ['cache', 'result'])
+NBA_API_SECONDS = Histogram(
+    'bolt_nba_api_request_seconds', 'nba_api request latency.', ['endpoint', 'outcome'],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30)
+)
+HTTP_SECONDS = Histogram('bolt_http_request_duration_seconds', 'API request latency.', ['method', 'route', 'status'])
+
+# Stage currently running in this thread or task, used to attribute DB round trips
+_current_stage = ContextVar('current_stage', default=('other', 'other'))
+
+
+@contextmanager
+def stage(pipeline, name, rows=None):
+    """
+    Times a pipeline stage and attributes the DB round trips issued inside it.
+
+    Parameters:
+        pipeline (str): e.g. 'slate' or 'player_box'.
+        name (str): Stage name within the pipeline.
+        rows (int, optional): Rows processed, if known up front; use `add_rows` otherwise.
+    """
+    token = _current_stage.set((pipeline, name))
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(pipeline, name).observe(time.perf_counter() - start)
+        _current_stage.reset(token)
+        if rows is not None:
+            add_rows(pipeline, name, rows)
+
+
+def add_rows(pipeline, name, rows):
+    ROWS_PROCESSED.labels(pipeline, name).inc(rows)
+
+
+def record_cache(cache, hit):
+    CACHE_REQUESTS.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+def timed_request(endpoint, func, *args, **kwargs):
+    """
+    Calls an nba_api request function and records its latency and outcome.
+    """
+    start = time.perf_counter()
+    outcome = 'error'
+    try:
+        result = func(*args, **kwargs)
+        outcome = 'ok'
+        return result
+    finally:
+        NBA_API_SECONDS.labels(endpoint, outcome).observe(time.perf_counter() - start)
+
+
+class CountingCursor(psycopg2.extensions.cursor):
+    """
+    psycopg2 cursor that counts every statement, and every fetch from a
+    server-side cursor, as one database round trip.
+    """
+
+    def _count(self):
+        DB_ROUND_TRIPS.labels(*_current_stage.get()).inc()
+
+    def execute(self, query, vars=None):
+        self._count()
+        return super().execute(query, vars)
+
+    def executemany(self, query, vars_list):
+        self._count()
+        return super().executemany(query, vars_list)
+
+    def copy_expert(self, sql, file, size=8192):
+        self._count()
+        return super().copy_expert(sql, file, size)
+
+    def fetchmany(self, size=None):
+        if self.name is not None:
+            self._count()
+        return super().fetchmany(size) if size is not None else super().fetchmany()
+
+    def fetchall(self):
+        if self.name is not None:
+            self._count()
+        return super().fetchall()
+
+
+def metrics_response():
+    """
+    Returns (body, content type) in the Prometheus text format.
+    """
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def _samples(metric, suffix):
+    for family in REGISTRY.collect():
+        if family.name == metric:
+            for sample in family.samples:
+                if sample.name == metric + suffix:
+                    yield sample.labels, sample.value
+
+
+def print_summary(pipeline=None):
+    """
+    Prints per-stage totals collected in this process, for batch scripts.
+
+    Parameters:
+        pipeline (str, optional): Only report stages of this pipeline.
+    """
+    summary = defaultdict(lambda: {'calls': 0, 'seconds': 0.0, 'rows': 0, 'db_round_trips': 0})
+    for labels, value in _samples('bolt_stage_duration_seconds', '_count'):
+        summary[(labels['pipeline'], labels['stage'])]['calls'] = int(value)
+    for labels, value in _samples('bolt_stage_duration_seconds', '_sum'):
+        summary[(labels['pipeline'], labels['stage'])]['seconds'] = value
+    for labels, value in _samples('bolt_rows_processed', '_total'):
+        summary[(labels['pipeline'], labels['stage'])]['rows'] = int(value)
+    for labels, value in _samples('bolt_db_round_trips', '_total'):
+        summary[(labels['pipeline'], labels['stage'])]['db_round_trips'] = int(value)
+
+    print("Stage summary:")
+    for (stage_pipeline, name), totals in sorted(summary.items()):
+        if pipeline is not None and stage_pipeline not in (pipeline, 'other'):
+            continue
+        if stage_pipeline == 'other':
+            print(f"  outside stages: {totals['db_round_trips']} DB round trips")
+            continue
+        print(
+            f"  {stage_pipeline}/{name}: {totals['calls']} calls, {totals['seconds']:.2f}s, "
+            f"{totals['rows']} rows, {totals['db_round_trips']} DB round trips"
+        )
+
+    caches = defaultdict(dict)
+    for labels, value in _samples('bolt_cache_requests', '_total'):
+        caches[labels['cache']][labels['result']] = int(value)
+    for cache, counts in sorted(caches.items()):
+        total = counts.get('hit', 0) + counts.get('miss', 0)
+        print(f"  cache {cache}: {counts.get('hit', 0)}/{total} hits")
+
+    seconds = {
+        (labels['endpoint'], labels['outcome']): value
+        for labels, value in _samples('bolt_nba_api_request_seconds', '_sum')
+    }
+    for labels, value in _samples('bolt_nba_api_request_seconds', '_count'):
+        key = (labels['endpoint'], labels['outcome'])
+        average = seconds.get(key, 0.0) / value if value else 0.0
+        print(f"  nba_api {key[0]} ({key[1]}): {int(value)} requests, {average:.2f}s average")
@@ -0,0 +1,387 @@
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy.optimize import Bounds, LinearConstraint, milp
+from scipy.sparse import coo_matrix
+
+from player_names import create_shortname
+
+
+# DraftKings NBA classic roster
+DK_CLASSIC_SLOTS = ['PG', 'SG', 'SF', 'PF', 'C', 'G', 'F', 'UTIL']
+SALARY_CAP = 50000
+MIN_GAMES = 2
+
+# Columns of the processed slate needed to build lineups
+SLATE_COLUMNS = ['id', 'name', 'player_id', 'rosterposition', 'salary', 'teamabbrev', 'gameinfo']
+
+# Worker processes are spawned rather than forked: the API process holds
+# connection pools and listener threads that a forked child would inherit mid-use
+PROCESS_CONTEXT = multiprocessing.get_context('spawn')
+
+
+def default_workers():
+    """
+    Returns the number of CPUs this process may run on, which can be fewer
+    than `os.cpu_count()` in a container. With one CPU, pools are not used.
+    """
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def load_slate_players(slate_id, projections):
+    """
+    Joins a processed slate with projections.
+
+    Projection keys and slate names are both normalized with `create_shortname`,
+    so punctuation, spacing, accents and suffixes do not break the join.
+
+    Parameters:
+        slate_id (str): Slate whose `sal-{slate_id}-processed.csv` is read.
+        projections (dict): Projection rows as produced by `parse_projection_file`.
+
+    Returns:
+        pd.DataFrame: Slate players with a `proj` column; unprojected players are dropped.
+    """
+    players = pd.read_csv(f"sal-{slate_id}-processed.csv", usecols=SLATE_COLUMNS)
+    proj_by_key = {create_shortname(key): row['proj'] for key, row in projections.items()}
+    players['proj'] = pd.to_numeric(players['name'].map(lambda name: proj_by_key.get(create_shortname(name))), errors='coerce')
+    players = players[players['proj'] > 0].drop_duplicates(subset='id').reset_index(drop=True)
+    # Games are identified by the matchup part of "SAS@MIN 12/29/2024 08:00PM ET"
+    players['game'] = players['gameinfo'].str.split(' ').str[0]
+    return players
+
+
+def assign_slots(eligibility, slots=DK_CLASSIC_SLOTS):
+    """
+    Matches the players of a lineup to roster slots with augmenting paths.
+
+    Parameters:
+        eligibility (list[set]): Eligible slots per player.
+
+    Returns:
+        list[int] | None: Player position in `eligibility` per slot, or None if no matching exists.
+    """
+    slot_owner = {}
+
+    def place(player, seen):
+        for slot in slots:
+            if slot in eligibility[player] and slot not in seen:
+                seen.add(slot)
+                if slot not in slot_owner or place(slot_owner[slot], seen):
+                    slot_owner[slot] = player
+                    return True
+        return False
+
+    for player in range(len(eligibility)):
+        if not place(player, set()):
+            return None
+    if len(slot_owner) != len(slots):
+        return None
+    return [slot_owner[slot] for slot in slots]
+
+
+class LineupOptimizer:
+    """
+    Integer program for DraftKings NBA classic lineups.
+
+    There is one binary per player and one per game. Instead of assigning
+    players to slots inside the model, Hall's condition is imposed for every
+    set of slots: the chosen players whose eligible slots all fall within the
+    set may not outnumber it. That guarantees a valid slot assignment, which
+    `assign_slots` recovers after each solve, and keeps the model small enough
+    to solve in milliseconds.
+
+    Parameters:
+        players (pd.DataFrame): Rows from `load_slate_players`.
+        salary_cap (int): Maximum total salary.
+        min_games (int): Minimum number of distinct games in a lineup.
+    """
+
+    def __init__(self, players, salary_cap=SALARY_CAP, min_games=MIN_GAMES):
+        self.players = players.reset_index(drop=True)
+        self.salary_cap = salary_cap
+        self.min_games = min_games
+        self.slots = DK_CLASSIC_SLOTS
+        self.eligibility = [
+            set(positions.split('/')) & set(self.slots) for positions in self.players['rosterposition'].astype(str)
+        ]
+        self.num_players = len(self.players)
+        self.games, self.game_idx = np.unique(self.players['game'].to_numpy(), return_inverse=True)
+        self.num_vars = self.num_players + len(self.games)
+        self.base_constraints = self._base_constraints()
+
+    def _position_rows(self):
+        # Slot sets that bound at least one group of players; the full roster is covered by the size constraint
+        masks = np.array([sum(1 << self.slots.index(slot) for slot in eligible) for eligible in self.eligibility])
+        rows = []
+        for subset in range(1, (1 << len(self.slots)) - 1):
+            members = np.flatnonzero((masks & ~subset) == 0)
+            if len(members):
+                rows.append((members, bin(subset).count('1')))
+        # Drop sets whose bound is implied by a smaller set with the same members
+        unique = {}
+        for members, size in rows:
+            key = members.tobytes()
+            if key not in unique or size < unique[key][1]:
+                unique[key] = (members, size)
+        return list(unique.values())
+
+    def _base_constraints(self):
+        n_players, n_games = self.num_players, len(self.games)
+        players = np.arange(n_players)
+        constraints = []
+
+        # Roster size
+        size_row = coo_matrix((np.ones(n_players), (np.zeros(n_players), players)), shape=(1, self.num_vars))
+        constraints.append(LinearConstraint(size_row, len(self.slots), len(self.slots)))
+
+        # Position eligibility (Hall's condition per set of slots)
+        position_rows = self._position_rows()
+        rows = np.concatenate([np.full(len(members), r) for r, (members, _) in enumerate(position_rows)])
+        cols = np.concatenate([members for members, _ in position_rows])
+        position_matrix = coo_matrix((np.ones(len(rows)), (rows, cols)), shape=(len(position_rows), self.num_vars))
+        constraints.append(LinearConstraint(position_matrix, 0, [size for _, size in position_rows]))
+
+        # Salary cap
+        salaries = self.players['salary'].to_numpy(dtype=float)
+        salary_row = coo_matrix((salaries, (np.zeros(n_players), players)), shape=(1, self.num_vars))
+        constraints.append(LinearConstraint(salary_row, 0, self.salary_cap))
+
+        # A game only counts when one of its players is used, and enough games are used
+        game_rows = np.concatenate([self.game_idx, np.arange(n_games)])
+        game_cols = np.concatenate([players, n_players + np.arange(n_games)])
+        game_vals = np.concatenate([-np.ones(n_players), np.ones(n_games)])
+        game_link = coo_matrix((game_vals, (game_rows, game_cols)), shape=(n_games, self.num_vars))
+        constraints.append(LinearConstraint(game_link, -np.inf, 0))
+        min_games_row = coo_matrix(
+            (np.ones(n_games), (np.zeros(n_games), n_players + np.arange(n_games))), shape=(1, self.num_vars)
+        )
+        constraints.append(LinearConstraint(min_games_row, self.min_games, np.inf))
+        return constraints
+
+    def solve(self, projections, locked=(), excluded=(), previous=(), min_unique=1, time_limit=10):
+        """
+        Finds the highest projected lineup under the given constraints.
+
+        Parameters:
+            projections (np.ndarray): Projection per player row.
+            locked (Iterable[int]): Player rows that must be in the lineup.
+            excluded (Iterable[int]): Player rows that may not be used.
+            previous (Iterable[tuple]): Lineups (player rows) to differ from.
+            min_unique (int): Players that must differ from every previous lineup.
+            time_limit (float): Solver time limit in seconds.
+
+        Returns:
+            tuple[int, ...] | None: Player rows in slot order, or None if infeasible.
+        """
+        objective = np.zeros(self.num_vars)
+        objective[:self.num_players] = -np.asarray(projections, dtype=float)
+
+        lower, upper = np.zeros(self.num_vars), np.ones(self.num_vars)
+        upper[list(excluded)] = 0
+        lower[list(locked)] = 1
+
+        constraints = list(self.base_constraints)
+        previous = list(previous)
+        if previous:
+            # Shares at most (roster size - min_unique) players with each earlier lineup
+            rows = np.repeat(np.arange(len(previous)), len(self.slots))
+            cols = np.concatenate([list(lineup) for lineup in previous])
+            overlap = coo_matrix((np.ones(len(rows)), (rows, cols)), shape=(len(previous), self.num_vars))
+            constraints.append(LinearConstraint(overlap, 0, len(self.slots) - min_unique))
+
+        result = milp(
+            objective,
+            constraints=constraints,
+            integrality=np.ones(self.num_vars),
+            bounds=Bounds(lower, np.maximum(lower, upper)),
+            options={'time_limit': time_limit}
+        )
+        if result.x is None:
+            return None
+
+        chosen = np.flatnonzero(result.x[:self.num_players] > 0.5)
+        order = assign_slots([self.eligibility[row] for row in chosen], self.slots)
+        if order is None:
+            return None
+        return tuple(int(chosen[position]) for position in order)
+
+
+def exposure_limits(num_players, num_lineups, max_exposure=1.0, player_exposures=None, locked=()):
+    """
+    Converts exposure fractions into maximum lineup counts per player row.
+    """
+    limits = np.full(num_players, max(1, math.floor(max_exposure * num_lineups)))
+    for row, exposure in (player_exposures or {}).items():
+        limits[row] = math.floor(exposure * num_lineups)
+    limits[list(locked)] = num_lineups
+    return limits
+
+
+def generate_lineups(optimizer, projections, num_lineups, locked=(), excluded=(), min_unique=1,
+                     limits=None, randomness=0.0, seed=None, previous=()):
+    """
+    Builds lineups one solve at a time, each differing from all earlier ones.
+
+    Parameters:
+        randomness (float): Standard deviation of the multiplicative noise applied
+            to projections before every solve; 0 solves the true projections.
+        limits (np.ndarray, optional): Maximum lineups per player row.
+        previous (Iterable[tuple]): Lineups already built elsewhere to differ from.
+
+    Returns:
+        list[tuple]: Lineups as player rows in slot order.
+    """
+    rng = np.random.default_rng(seed)
+    projections = np.asarray(projections, dtype=float)
+    counts = np.zeros(len(projections), dtype=int)
+    previous = list(previous)
+    for lineup in previous:
+        counts[list(lineup)] += 1
+    max_shared = len(optimizer.slots) - min_unique
+
+    # Uniqueness cuts are added lazily: only lineups a solution actually collided
+    # with become constraints, which keeps later solves nearly as fast as the first
+    cuts, lineups = [], []
+    while len(lineups) < num_lineups:
+        capped = np.flatnonzero(counts >= limits) if limits is not None else []
+        noisy = projections * (1 + rng.normal(0, randomness, len(projections))) if randomness else projections
+        while True:
+            lineup = optimizer.solve(
+                noisy, locked=locked, excluded=set(excluded) | set(capped), previous=cuts, min_unique=min_unique
+            )
+            if lineup is None:
+                return lineups
+            members = set(lineup)
+            conflicts = [other for other in previous + lineups if len(members.intersection(other)) > max_shared]
+            if not conflicts:
+                break
+            cuts.extend(conflicts)
+        lineups.append(lineup)
+        counts[list(lineup)] += 1
+        if not randomness:
+            # Unperturbed solves would return the same lineup again
+            cuts.append(lineup)
+    return lineups
+
+
+def _worker_lineups(players, projections, num_lineups, locked, excluded, min_unique, limits, randomness, seed):
+    optimizer = LineupOptimizer(players)
+    return generate_lineups(
+        optimizer, projections, num_lineups, locked=locked, excluded=excluded, min_unique=min_unique,
+        limits=limits, randomness=randomness, seed=seed
+    )
+
+
+def optimize_lineups(players, num_lineups=150, locked=(), excluded=(), min_unique=1, max_exposure=1.0,
+                     player_exposures=None, randomness=0.1, workers=None, seed=None):
+    """
+    Generates distinct lineups across a process pool.
+
+    Every worker builds its share of lineups against independently perturbed
+    projections. The candidates are then merged best-first by true projection,
+    keeping only those that satisfy uniqueness and exposure caps across the whole
+    set, and any shortfall is filled by a final serial pass. With one worker or
+    no randomness everything runs in that serial pass.
+
+    Parameters:
+        players (pd.DataFrame): Rows from `load_slate_players`.
+        num_lineups (int): Lineups to return.
+        locked / excluded (Iterable[int]): Player rows forced in or out.
+        min_unique (int): Players each lineup must not share with any other.
+        max_exposure (float): Maximum share of lineups any player appears in.
+        player_exposures (dict, optional): Per-row exposure caps overriding `max_exposure`.
+        randomness (float): Projection noise for the parallel workers.
+        workers (int, optional): Worker processes; defaults to `default_workers()`.
+        seed (int, optional): Seed for reproducible results.
+
+    Returns:
+        list[tuple]: Lineups as player rows in slot order, best first.
+    """
+    players = players.reset_index(drop=True)
+    projections = players['proj'].to_numpy(dtype=float)
+    limits = exposure_limits(len(players), num_lineups, max_exposure, player_exposures, locked)
+    workers = workers or default_workers()
+    locked, excluded = list(locked), list(excluded)
+
+    candidates = []
+    if workers > 1 and randomness > 0:
+        # Oversample so the merge step can drop overlapping lineups
+        per_worker = math.ceil(num_lineups * 1.25 / workers)
+        worker_limits = exposure_limits(len(players), per_worker, max_exposure, player_exposures, locked)
+        seeds = np.random.SeedSequence(seed).spawn(workers)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=PROCESS_CONTEXT) as executor:
+            futures = [
+                executor.submit(
+                    _worker_lineups, players, projections, per_worker, locked, excluded, min_unique,
+                    worker_limits, randomness, worker_seed
+                )
+                for worker_seed in seeds
+            ]
+            for future in futures:
+                candidates.extend(future.result())
+
+    lineups, counts = [], np.zeros(len(players), dtype=int)
+    max_shared = len(DK_CLASSIC_SLOTS) - min_unique
+    for lineup in sorted(set(candidates), key=lambda lineup: -projections[list(lineup)].sum()):
+        if len(lineups) == num_lineups:
+            break
+        members = set(lineup)
+        if np.any(counts[list(members)] >= limits[list(members)]):
+            continue
+        if any(len(members.intersection(other)) > max_shared for other in lineups):
+            continue
+        lineups.append(lineup)
+        counts[list(members)] += 1
+
+    if len(lineups) < num_lineups:
+        lineups += generate_lineups(
+            LineupOptimizer(players), projections, num_lineups - len(lineups), locked=locked,
+            excluded=excluded, min_unique=min_unique, limits=limits, randomness=randomness, seed=seed,
+            previous=lineups
+        )
+    return sorted(lineups, key=lambda lineup: -projections[list(lineup)].sum())
+
+
+def player_id_value(player_id):
+    """
+    Returns an NBA player id from a slate row as an int, or None when the
+    player was not matched. Numeric frames carry it as a float.
+    """
+    return None if pd.isna(player_id) or player_id == "" else int(float(player_id))
+
+
+def format_lineups(players, lineups):
+    """
+    Turns lineups of player rows into JSON-ready dicts with per-player exposure.
+    """
+    records = players.fillna("").to_dict(orient='records')
+    formatted = []
+    for lineup in lineups:
+        entries = [
+            {
+                "slot": slot, "id": int(records[row]['id']), "name": records[row]['name'],
+                "player_id": player_id_value(records[row]['player_id']), "team": records[row]['teamabbrev'],
+                "salary": int(records[row]['salary']), "proj": float(records[row]['proj'])
+            }
+            for slot, row in zip(DK_CLASSIC_SLOTS, lineup)
+        ]
+        formatted.append({
+            "players": entries,
+            "salary": sum(entry["salary"] for entry in entries),
+            "proj": round(sum(entry["proj"] for entry in entries), 2)
+        })
+
+    counts = pd.Series([row for lineup in lineups for row in lineup], dtype=int).value_counts()
+    exposures = [
+        {"id": int(records[row]['id']), "name": records[row]['name'], "exposure": round(count / len(lineups), 4)}
+        for row, count in counts.items()
+    ]
+    return formatted, exposures
@@ -0,0 +1,219 @@
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime
+
+from nba_api.stats.static import players, teams
+
+from db import DB_HOST, get_cursor
+from metrics import print_summary, stage
+from todays_scoreboard import load_latest_hash, refresh_scoreboard
+from update_games_sched import create_game_ids_table, create_games_table, season, sync_recent_games
+from update_player_box import (
+    BOX_CACHE_MAX_AGE_DAYS, BOX_CACHE_MAX_BYTES, BOX_FOLDER, evict_box_cache, get_filtered_games, get_team_ids,
+    ingest_boxscores
+)
+from update_players import update_players
+from update_teams import update_teams
+
+
+# Input fingerprints of the last successful run of each step
+PIPELINE_STATE_FILE = "data/pipeline_state.json"
+
+
+class Step:
+    """
+    One node of the update pipeline.
+
+    Parameters:
+        name (str): Step name, used for dependencies, --only and the state file.
+        run (callable): Does the work; raising marks the step failed.
+        deps (list[str]): Steps that must finish (or be skipped) first.
+        fingerprint (callable, optional): Returns a hash of the step's inputs,
+            read once its dependencies are done. The step is skipped when it
+            matches the last successful run. Steps without one always run.
+    """
+
+    def __init__(self, name, run, deps=(), fingerprint=None):
+        self.name = name
+        self.run = run
+        self.deps = list(deps)
+        self.fingerprint = fingerprint
+
+
+def _hash(value):
+    body = json.dumps(value, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(body.encode('utf-8')).hexdigest()
+
+
+# Function to fingerprint the games table as seen by the boxscore step
+def games_table_fingerprint():
+    # New games are all the boxscore step looks for; stat corrections to existing rows don't matter
+    with get_cursor() as cur:
+        cur.execute("SELECT count(*), max(game_date) FROM games;")
+        return _hash(cur.fetchone())
+
+
+def run_games_sched():
+    create_game_ids_table()
+    create_games_table()
+    return sync_recent_games()
+
+
+def run_player_box():
+    os.makedirs(BOX_FOLDER, exist_ok=True)
+    game_ids = get_filtered_games(get_team_ids())
+    print(f"Found {len(game_ids)} unique game IDs to process.")
+    processed, failed = ingest_boxscores(game_ids)
+    evict_box_cache(max_bytes=BOX_CACHE_MAX_BYTES, max_age_days=BOX_CACHE_MAX_AGE_DAYS)
+    if failed:
+        # Left unrecorded so the next run retries the missing games
+        raise RuntimeError(f"{failed} of {len(game_ids)} games failed")
+    return processed
+
+
+STEPS = [
+    Step('teams', update_teams, fingerprint=lambda: _hash(teams.get_teams())),
+    Step('players', update_players, fingerprint=lambda: _hash(players.get_players())),
+    # The scoreboard skips unchanged payloads by itself
+    Step('scoreboard', refresh_scoreboard, deps=['teams']),
+    # Finished games change the scoreboard, so its latest hash gates the season sync
+    Step(
+        'games_sched', run_games_sched, deps=['teams', 'scoreboard'],
+        fingerprint=lambda: _hash([season, datetime.now().strftime('%Y-%m-%d'), load_latest_hash()])
+    ),
+    Step('player_box', run_player_box, deps=['games_sched'], fingerprint=games_table_fingerprint),
+]
+
+
+def load_state():
+    try:
+        with open(PIPELINE_STATE_FILE) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(state):
+    os.makedirs(os.path.dirname(PIPELINE_STATE_FILE), exist_ok=True)
+    tmp_path = f"{PIPELINE_STATE_FILE}.tmp"
+    with open(tmp_path, 'w') as file:
+        json.dump(state, file, indent=2, sort_keys=True)
+    os.replace(tmp_path, PIPELINE_STATE_FILE)
+
+
+# Function to run the update scripts as a dependency graph
+def run_pipeline(steps=STEPS, only=None, force=False, workers=3):
+    """
+    Runs every step once its dependencies are done, independent steps
+    concurrently on one thread pool. All steps share the process-wide
+    connection pool, team index and caches.
+
+    A step whose input fingerprint matches its last successful run is skipped.
+    Dependents of a failed step are not run. Steps left out by `only` are
+    treated as done.
+
+    Args:
+        steps (list[Step]): Pipeline steps; dependencies must name other steps.
+        only (list[str], optional): Names of the steps to run.
+        force (bool): Run steps even when their inputs are unchanged.
+        workers (int): Maximum steps running at once.
+
+    Returns:
+        dict: step name -> (status, seconds, detail), status being one of
+            'ok', 'skipped', 'failed' or 'blocked'.
+    """
+    by_name = {step.name: step for step in steps}
+    for step in steps:
+        unknown = [dep for dep in step.deps if dep not in by_name]
+        if unknown:
+            raise ValueError(f"Step {step.name} depends on unknown steps: {', '.join(unknown)}")
+    selected = set(by_name) if not only else set(only)
+    unknown = selected - set(by_name)
+    if unknown:
+        raise ValueError(f"Unknown steps: {', '.join(sorted(unknown))}")
+
+    state = load_state()
+    state_lock = threading.Lock()
+    results = {}
+
+    def execute(step):
+        start = time.monotonic()
+        try:
+            with stage('pipeline', step.name):
+                fingerprint = step.fingerprint() if step.fingerprint else None
+                if not force and fingerprint is not None and state.get(step.name) == fingerprint:
+                    return 'skipped', time.monotonic() - start, "inputs unchanged"
+                detail = step.run()
+        except Exception as e:
+            print(f"Step {step.name} failed: {e}")
+            return 'failed', time.monotonic() - start, str(e)
+        if fingerprint is not None:
+            with state_lock:
+                state[step.name] = fingerprint
+                save_state(state)
+        return 'ok', time.monotonic() - start, detail
+
+    waiting = [step for step in steps if step.name in selected]
+    pending = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while waiting or pending:
+            progressed = True
+            while progressed:
+                progressed = False
+                for step in list(waiting):
+                    deps = [dep for dep in step.deps if dep in selected]
+                    if any(results.get(dep, ('',))[0] in ('failed', 'blocked') for dep in deps):
+                        results[step.name] = ('blocked', 0.0, "a dependency failed")
+                    elif all(dep in results for dep in deps):
+                        print(f"Starting step {step.name}.")
+                        pending[executor.submit(execute, step)] = step
+                    else:
+                        continue
+                    waiting.remove(step)
+                    progressed = True
+            if not pending:
+                if waiting:
+                    raise ValueError(f"Dependency cycle between steps: {', '.join(step.name for step in waiting)}")
+                continue
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                step = pending.pop(future)
+                results[step.name] = future.result()
+                print(f"Step {step.name} {results[step.name][0]} in {results[step.name][1]:.2f}s.")
+
+    return {step.name: results[step.name] for step in steps if step.name in results}
+
+
+def print_results(results):
+    print(f"{'step':<14}{'status':<10}{'wall s':>9}  detail")
+    for name, (status, seconds, detail) in results.items():
+        wall = f"{seconds:.2f}" if status != 'blocked' else "-"
+        if isinstance(detail, list):
+            detail = f"{len(detail)} items"
+        print(f"{name:<14}{status:<10}{wall:>9}  {'' if detail is None else detail}")
+
+
+# Main Execution
+if __name__ == '__main__':
+    print(f"Database Host: {DB_HOST}")
+
+    arg_parser = argparse.ArgumentParser(description="Run the update scripts as one dependency graph, skipping steps whose inputs are unchanged.")
+    arg_parser.add_argument('--only', nargs='+', choices=[step.name for step in STEPS], help="Run only these steps; the others are treated as done.")
+    arg_parser.add_argument('--force', action='store_true', help="Run every selected step even if its inputs are unchanged.")
+    arg_parser.add_argument('--workers', type=int, default=3, help="Maximum steps running at once.")
+    args = arg_parser.parse_args()
+
+    start = time.monotonic()
+    results = run_pipeline(only=args.only, force=args.force, workers=args.workers)
+    print_results(results)
+    print(f"Pipeline finished in {time.monotonic() - start:.2f}s.")
+    print_summary()
+
+    if any(status in ('failed', 'blocked') for status, _, _ in results.values()):
+        raise SystemExit(1)
@@ -0,0 +1,252 @@
+import os
+import re
+import threading
+import unicodedata
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+
+from psycopg2.extras import execute_values
+
+from db import get_cursor, missing_columns
+
+
+# Touched by update_players.py so long-running processes reload the index
+PLAYER_INDEX_STAMP = "data/player_index.stamp"
+
+# Minimum similarity for a fuzzy match to be accepted; remembered ones still rank below exact keys
+FUZZY_MATCH_THRESHOLD = 0.85
+
+# Shortnames spelled differently by DraftKings and the NBA, applied in both directions
+NAME_CORRECTIONS = {
+    "jakobpoltl": "jakobpoeltl",
+    "ggjackson": "gregoryjackson"
+}
+NAME_CORRECTIONS.update({value: key for key, value in NAME_CORRECTIONS.items()})
+
+_resolver = None
+_resolver_stamp = None
+_resolver_lock = threading.Lock()
+
+
+def create_shortname(name: str) -> str:
+    """
+    Normalizes a player name to the key used for matching: accents folded,
+    punctuation and generational suffixes removed, spaces dropped, lowercased.
+    """
+    name = unicodedata.normalize('NFKD', name)
+    name = "".join(char for char in name if not unicodedata.combining(char))
+    name = re.sub(r'[^a-zA-Z0-9\s]', '', name)
+    for suffix in [" Jr", " III", " II", " IV", " Sr"]:
+        if name.endswith(suffix):
+            name = name[: -len(suffix)]
+    return name.replace(" ", "").lower()
+
+
+def _trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def ensure_name_tables(cur):
+    """
+    Adds the persisted shortname key to player_ids and creates the table of
+    confirmed DraftKings name mappings.
+
+    The catalog is checked first: ALTER TABLE and CREATE INDEX lock
+    player_ids even when there is nothing to do, and this runs on every
+    resolver load while the API is serving.
+    """
+    if missing_columns(cur, 'player_ids', ['shortname']):
+        cur.execute("ALTER TABLE player_ids ADD COLUMN IF NOT EXISTS shortname TEXT;")
+    cur.execute("SELECT to_regclass('player_ids_shortname_idx') IS NULL;")
+    if cur.fetchone()[0]:
+        cur.execute("CREATE INDEX IF NOT EXISTS player_ids_shortname_idx ON player_ids (shortname);")
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS player_name_map (
+            dk_name TEXT PRIMARY KEY,
+            player_id INT NOT NULL,
+            source TEXT NOT NULL,
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        );
+    """)
+
+
+def backfill_shortnames(cur):
+    """
+    Computes the shortname key for player_ids rows that do not have one yet.
+
+    Returns:
+        int: Number of rows updated.
+    """
+    cur.execute("SELECT id, full_name FROM player_ids WHERE shortname IS NULL;")
+    rows = [(player_id, create_shortname(full_name)) for player_id, full_name in cur.fetchall()]
+    if rows:
+        execute_values(
+            cur,
+            "UPDATE player_ids p SET shortname = v.shortname FROM (VALUES %s) AS v (id, shortname) WHERE p.id = v.id;",
+            rows
+        )
+    return len(rows)
+
+
+class PlayerNameResolver:
+    """
+    Resolves DraftKings player names to NBA player ids.
+
+    Lookups go through, in order: confirmed mappings from player_name_map, the
+    exact shortname key, NAME_CORRECTIONS, remembered fuzzy matches, and finally
+    a trigram-filtered fuzzy match. New matches are written back to
+    player_name_map so the next slate resolves them with a dictionary lookup.
+    Fuzzy matches are stored with source 'fuzzy' and rank below the exact and
+    corrected keys, so a wrong one is replaced as soon as a key matches.
+    """
+
+    def __init__(self, shortname_to_id, confirmed, active_shortnames=None, fuzzy=None):
+        self.shortname_to_id = shortname_to_id
+        self.confirmed = confirmed
+        self.fuzzy = fuzzy if fuzzy is not None else {}
+        self.active_shortnames = active_shortnames if active_shortnames is not None else set(shortname_to_id)
+        self._trigram_index = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls):
+        with get_cursor() as cur:
+            ensure_name_tables(cur)
+            backfill_shortnames(cur)
+            # Active players win when two players share a shortname
+            cur.execute("SELECT shortname, id, is_active FROM player_ids ORDER BY is_active, id;")
+            rows = cur.fetchall()
+            cur.execute("SELECT dk_name, player_id, source FROM player_name_map;")
+            mappings = cur.fetchall()
+        shortname_to_id = {shortname: player_id for shortname, player_id, _ in rows}
+        active_shortnames = {shortname for shortname, _, is_active in rows if is_active}
+        confirmed = {dk_name: player_id for dk_name, player_id, source in mappings if source != 'fuzzy'}
+        fuzzy = {dk_name: player_id for dk_name, player_id, source in mappings if source == 'fuzzy'}
+        return cls(shortname_to_id, confirmed, active_shortnames, fuzzy)
+
+    def _fuzzy_index(self):
+        if self._trigram_index is None:
+            # Slates only list active players, so fuzzy matches are limited to them
+            index = defaultdict(list)
+            for shortname in self.active_shortnames:
+                for gram in _trigrams(shortname):
+                    index[gram].append(shortname)
+            self._trigram_index = index
+        return self._trigram_index
+
+    def fuzzy_match(self, shortname, candidates=10):
+        """
+        Returns the closest known shortname and its similarity, or (None, 0.0).
+        """
+        index = self._fuzzy_index()
+        shared = Counter()
+        for gram in _trigrams(shortname):
+            shared.update(index.get(gram, ()))
+        best, best_score = None, 0.0
+        for candidate, _ in shared.most_common(candidates):
+            score = SequenceMatcher(None, shortname, candidate).ratio()
+            if score > best_score:
+                best, best_score = candidate, score
+        return best, best_score
+
+    def resolve_one(self, name):
+        """
+        Returns (player_id, source) for a DraftKings name, or (None, None).
+        """
+        if name in self.confirmed:
+            return self.confirmed[name], 'confirmed'
+
+        shortname = create_shortname(name)
+        if shortname in self.shortname_to_id:
+            return self.shortname_to_id[shortname], 'exact'
+
+        corrected = NAME_CORRECTIONS.get(shortname)
+        if corrected in self.shortname_to_id:
+            return self.shortname_to_id[corrected], 'correction'
+
+        if name in self.fuzzy:
+            return self.fuzzy[name], 'fuzzy'
+
+        match, score = self.fuzzy_match(shortname)
+        if match is not None and score >= FUZZY_MATCH_THRESHOLD:
+            return self.shortname_to_id[match], 'fuzzy'
+        return None, None
+
+    def resolve(self, names):
+        """
+        Resolves a batch of DraftKings names.
+
+        Parameters:
+            names (Iterable[str]): Names as they appear in the salary file.
+
+        Returns:
+            tuple[dict, list]: name -> player_id for every resolved name, and the
+            names that could not be resolved.
+        """
+        matches, unresolved, new_mappings = {}, [], []
+        with self._lock:
+            for name in dict.fromkeys(names):
+                player_id, source = self.resolve_one(name)
+                if player_id is None:
+                    unresolved.append(name)
+                    continue
+                matches[name] = player_id
+                if source == 'confirmed' or (source == 'fuzzy' and self.fuzzy.get(name) == player_id):
+                    continue
+                if source == 'fuzzy':
+                    self.fuzzy[name] = player_id
+                else:
+                    self.confirmed[name] = player_id
+                    self.fuzzy.pop(name, None)
+                new_mappings.append((name, player_id, source))
+
+        if new_mappings:
+            with get_cursor() as cur:
+                execute_values(
+                    cur,
+                    """
+                    INSERT INTO player_name_map (dk_name, player_id, source) VALUES %s
+                    ON CONFLICT (dk_name) DO UPDATE SET
+                        player_id = EXCLUDED.player_id,
+                        source = EXCLUDED.source,
+                        updated_at = now()
+                    WHERE player_name_map.source = 'fuzzy';
+                    """,
+                    new_mappings
+                )
+        return matches, unresolved
+
+
+def _stamp_mtime():
+    try:
+        return os.path.getmtime(PLAYER_INDEX_STAMP)
+    except OSError:
+        return None
+
+
+def get_name_resolver(refresh=False):
+    """
+    Returns the process-wide name resolver, reloading it when update_players.py
+    has touched the stamp file since the last load.
+
+    Parameters:
+        refresh (bool): Force a reload from the database.
+    """
+    global _resolver, _resolver_stamp
+    stamp = _stamp_mtime()
+    if _resolver is None or refresh or stamp != _resolver_stamp:
+        with _resolver_lock:
+            if _resolver is None or refresh or stamp != _resolver_stamp:
+                _resolver = PlayerNameResolver.load()
+                _resolver_stamp = stamp
+    return _resolver
+
+
+def mark_player_index_stale():
+    """
+    Touches the stamp file so every process reloads its name resolver on next use.
+    """
+    os.makedirs(os.path.dirname(PLAYER_INDEX_STAMP), exist_ok=True)
+    with open(PLAYER_INDEX_STAMP, "a"):
+        os.utime(PLAYER_INDEX_STAMP, None)
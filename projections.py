@@ -0,0 +1,156 @@
+import asyncio
+import os
+import threading
+from collections import deque
+
+import pandas as pd
+
+from metrics import record_cache
+
+
+PROJECTION_FILE = "awesemo_proj.csv"
+PROJECTION_COLUMNS = ['shortname', 'proj', 'min']
+
+
+class MissingColumnsError(ValueError):
+    pass
+
+
+def parse_projection_file(file_path):
+    """
+    Parses the projection CSV into rows keyed by shortname.
+
+    Returns:
+        dict: shortname -> {'shortname', 'proj', 'min'} in file order.
+    """
+    awesemo_proj = pd.read_csv(file_path)
+    remove_words = [" Jr", " III", " II", " IV", " Sr"]
+    pat = "|".join(remove_words)
+    awesemo_proj['shortname'] = awesemo_proj['Name'].str.replace(pat, "", regex=True).str.lower()
+    awesemo_proj.drop_duplicates(subset="shortname", keep='first', inplace=True)
+    # awesemo_proj['FPM'] = (awesemo_proj['Fpts'] / awesemo_proj['Minutes']).round(3)
+    awesemo_proj.rename(columns={"Fpts": "proj", "Minutes": "min"}, inplace=True)
+
+    # Ensure the CSV contains 'shortname', 'proj', and 'min' columns
+    if not set(PROJECTION_COLUMNS).issubset(awesemo_proj.columns):
+        raise MissingColumnsError("CSV missing required columns")
+
+    records = awesemo_proj[PROJECTION_COLUMNS].fillna("").to_dict(orient="records")
+    return {row['shortname']: row for row in records}
+
+
+class ProjectionFeed:
+    """
+    Versioned in-memory snapshot of the projection file.
+
+    The file is parsed once per change (detected by mtime and size). Each parse
+    that changes at least one row bumps the version and records the diff, so
+    clients can ask for everything since the version they already hold.
+
+    Parameters:
+        file_path (str): Projection CSV to watch.
+        history (int): Number of diffs kept for `since` queries.
+    """
+
+    def __init__(self, file_path=PROJECTION_FILE, history=64):
+        self.file_path = file_path
+        self.version = 0
+        self.rows = {}
+        self.changes = deque(maxlen=history)
+        self.file_version = None
+        self.lock = threading.Lock()
+        self.subscribers = set()
+        self.loop = None
+
+    def exists(self):
+        return os.path.exists(self.file_path)
+
+    def refresh(self):
+        """
+        Re-parses the file if it changed on disk.
+
+        Returns:
+            bool: True if the snapshot moved to a new version.
+        """
+        stat = os.stat(self.file_path)
+        file_version = (stat.st_mtime_ns, stat.st_size)
+        if file_version == self.file_version:
+            record_cache('projections', True)
+            return False
+
+        with self.lock:
+            if file_version == self.file_version:
+                record_cache('projections', True)
+                return False
+            record_cache('projections', False)
+            rows = parse_projection_file(self.file_path)
+            changed = {key: row for key, row in rows.items() if self.rows.get(key) != row}
+            removed = [key for key in self.rows if key not in rows]
+            self.file_version = file_version
+            if not changed and not removed and self.version:
+                return False
+            self.version += 1
+            self.rows = rows
+            self.changes.append((self.version, changed, removed))
+            version = self.version
+
+        self._publish(version)
+        return True
+
+    def snapshot(self, since=None):
+        """
+        Returns the rows a client needs to catch up to the current version.
+
+        Parameters:
+            since (int, optional): Version the client already holds.
+
+        Returns:
+            dict: version, whether the data is a full snapshot, the changed (or
+            all) rows and the shortnames removed since `since`.
+        """
+        with self.lock:
+            oldest = self.changes[0][0] if self.changes else self.version + 1
+            if since is None or since < oldest - 1 or since > self.version:
+                return {"version": self.version, "full": True, "data": list(self.rows.values()), "removed": []}
+
+            changed, removed = {}, set()
+            for version, version_changed, version_removed in self.changes:
+                if version <= since:
+                    continue
+                for key in version_removed:
+                    changed.pop(key, None)
+                    removed.add(key)
+                for key, row in version_changed.items():
+                    changed[key] = row
+                    removed.discard(key)
+            return {"version": self.version, "full": False, "data": list(changed.values()), "removed": sorted(removed)}
+
+    def subscribe(self):
+        """
+        Registers a subscriber queue that receives every new version number.
+        """
+        queue = asyncio.Queue()
+        self.subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+
+    def _publish(self, version):
+        if self.loop is None:
+            return
+        for queue in list(self.subscribers):
+            self.loop.call_soon_threadsafe(queue.put_nowait, version)
+
+    async def watch(self, interval=1.0):
+        """
+        Polls the file for changes until cancelled, pushing new versions to subscribers.
+        """
+        self.loop = asyncio.get_running_loop()
+        while True:
+            try:
+                if self.exists():
+                    await asyncio.to_thread(self.refresh)
+            except Exception as e:
+                print(f"Error refreshing projections: {e}")
+            await asyncio.sleep(interval)
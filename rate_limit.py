@@ -0,0 +1,99 @@
+import random
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket used to cap the request rate against the NBA stats CDN.
+
+    The bucket is adaptive: `penalize()` halves the current rate after a throttled
+    or failed request and `reward()` grows it back additively after successes, up
+    to `max_rate`. Starting near the limit and letting it settle finds the highest
+    rate the CDN will accept without hard-coding a delay.
+
+    Parameters:
+        rate (float): Initial tokens (requests) per second.
+        capacity (int): Maximum burst size.
+        max_rate (float): Ceiling for the adaptive rate. Defaults to `rate`.
+        min_rate (float): Floor for the adaptive rate.
+    """
+
+    def __init__(self, rate, capacity=1, max_rate=None, min_rate=0.1):
+        self.rate = float(rate)
+        self.capacity = max(1, int(capacity))
+        self.max_rate = float(max_rate) if max_rate else self.rate
+        self.min_rate = min(float(min_rate), self.rate)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """
+        Blocks until a token is available, then consumes it.
+        """
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def penalize(self):
+        """
+        Halves the rate and drains the bucket after a throttled request.
+        """
+        with self.lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = 0.0
+            self.updated = time.monotonic()
+
+    def reward(self, step=0.05):
+        """
+        Grows the rate back towards `max_rate` by `step` (a fraction of
+        `max_rate`) after a successful request.
+        """
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * step)
+
+
+def backoff_delay(attempt, base_delay=1.0, max_delay=60.0):
+    """
+    Exponential backoff with full jitter for the given (zero-based) retry attempt.
+
+    Returns:
+        float: Seconds to sleep before the next attempt.
+    """
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+
+def call_with_retries(func, *args, bucket=None, max_retries=3, base_delay=1.0, **kwargs):
+    """
+    Calls `func` under the token bucket, retrying with exponential backoff.
+
+    Every failure penalizes the bucket, so concurrent workers slow down together
+    when the CDN starts throttling. The last exception is re-raised once the
+    retries are exhausted.
+    """
+    for attempt in range(max_retries + 1):
+        if bucket is not None:
+            bucket.acquire()
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            if bucket is not None:
+                bucket.penalize()
+            if attempt == max_retries:
+                raise
+            time.sleep(backoff_delay(attempt, base_delay))
+        else:
+            if bucket is not None:
+                bucket.reward()
+            return result
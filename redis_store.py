@@ -0,0 +1,209 @@
+import json
+import os
+import threading
+import time
+
+import redis
+from dotenv import load_dotenv
+
+from metrics import record_cache
+
+
+# Load environment variables from .env file
+load_dotenv()
+
+REDIS_HOST = os.getenv('REDIS_HOST', 'localhost')
+REDIS_PORT = int(os.getenv('REDIS_PORT', 6379))
+REDIS_PASSWORD = os.getenv('REDIS_PASSWORD') or None
+REDIS_DB = int(os.getenv('REDIS_DB', 0))
+
+# Seconds a local copy is served before the version key is checked again
+REDIS_CACHE_TTL = float(os.getenv('REDIS_CACHE_TTL', 5))
+
+# Bumped by every metadata write; readers compare it to decide whether their copy is stale
+VERSION_KEY = "slates:version"
+SLATES_KEY = "slates:today"
+
+# String keys kept for existing readers of the comma-joined values
+LEGACY_SLATE_IDS_KEY = "react_slateIDs_today"
+
+
+def slate_key(slate_id):
+    return f"slate:{slate_id}"
+
+
+def legacy_teams_key(slate_id):
+    return f"react_slate_teams_{slate_id}"
+
+
+def get_redis():
+    """
+    Returns a Redis client configured from REDIS_HOST, REDIS_PORT, REDIS_PASSWORD and REDIS_DB.
+    """
+    return redis.Redis(
+        host=REDIS_HOST,
+        port=REDIS_PORT,
+        password=REDIS_PASSWORD,
+        db=REDIS_DB,
+        decode_responses=True
+    )
+
+
+class RedisStore:
+    """
+    Slate metadata in Redis behind an in-process read-through cache.
+
+    Slate IDs live in the `slates:today` hash and per-slate metadata in one
+    `slate:{slate_id}` hash each. Every write goes out as a single pipeline that
+    also increments `slates:version`. Cached reads are served from memory for
+    `ttl` seconds; after that, one GET of the version key decides whether the
+    copy is still current. Writes made through this store drop the local copies
+    at once. With `start_listener`, keyspace notifications on the version key
+    do the same for writes made by other processes.
+
+    Parameters:
+        client (redis.Redis, optional): Client with decode_responses=True; built from the environment by default.
+        ttl (float): Seconds a cached value is served without checking the version key.
+    """
+
+    def __init__(self, client=None, ttl=REDIS_CACHE_TTL):
+        self.client = client or get_redis()
+        self.ttl = ttl
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.listener = None
+
+    def invalidate(self):
+        with self.lock:
+            self.entries.clear()
+
+    def _read(self, key, queue, parse):
+        """
+        Returns a cached value, reloading it when the version key moved.
+
+        Parameters:
+            key (str): Local cache key.
+            queue (callable): Queues the read commands on a pipeline.
+            parse (callable): Builds the value from the pipeline results.
+        """
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry is not None:
+            value, version, expires = entry
+            if now < expires:
+                record_cache('redis', True)
+                return value
+            if self.client.get(VERSION_KEY) == version:
+                with self.lock:
+                    self.entries[key] = (value, version, now + self.ttl)
+                record_cache('redis', True)
+                return value
+
+        record_cache('redis', False)
+        # MULTI keeps the version and the data it describes consistent
+        pipe = self.client.pipeline(transaction=True)
+        pipe.get(VERSION_KEY)
+        queue(pipe)
+        results = pipe.execute()
+        value = parse(results[1:])
+        with self.lock:
+            self.entries[key] = (value, results[0], now + self.ttl)
+        return value
+
+    def _write(self, queue):
+        pipe = self.client.pipeline(transaction=True)
+        queue(pipe)
+        pipe.incr(VERSION_KEY)
+        pipe.execute()
+        self.invalidate()
+
+    def set_slate_ids(self, slate_ids, status="queued"):
+        """
+        Records today's slates and marks each one with `status`, in one round trip.
+        """
+        slate_ids = list(slate_ids)
+        updated_at = str(time.time())
+
+        def queue(pipe):
+            pipe.hset(SLATES_KEY, mapping={"ids": json.dumps(slate_ids), "updated_at": updated_at})
+            for slate_id in slate_ids:
+                pipe.hset(slate_key(slate_id), mapping={"status": status, "updated_at": updated_at})
+            pipe.set(LEGACY_SLATE_IDS_KEY, ",".join(slate_ids))
+
+        self._write(queue)
+
+    def get_slate_ids(self):
+        """
+        Returns today's slate IDs, or an empty list if none were recorded.
+        """
+        def queue(pipe):
+            pipe.hget(SLATES_KEY, "ids")
+            pipe.get(LEGACY_SLATE_IDS_KEY)
+
+        def parse(results):
+            ids, legacy = results
+            if ids:
+                return json.loads(ids)
+            # Written before slates were stored as hashes
+            return legacy.split(",") if legacy else []
+
+        return self._read("slate_ids", queue, parse)
+
+    def set_slate_metadata(self, slate_id, teams=None, **fields):
+        """
+        Stores the teams of a processed slate, if given, and any extra fields
+        (row counts, dates, status) in the slate's hash.
+        """
+        mapping = {key: json.dumps(value) if isinstance(value, (list, dict)) else str(value) for key, value in fields.items()}
+        mapping["updated_at"] = str(time.time())
+        if teams is not None:
+            mapping["teams"] = ",".join(teams)
+
+        def queue(pipe):
+            pipe.hset(slate_key(slate_id), mapping=mapping)
+            if teams is not None:
+                pipe.set(legacy_teams_key(slate_id), mapping["teams"])
+
+        self._write(queue)
+
+    def get_slate_metadata(self, slate_id):
+        """
+        Returns the slate's hash, with `teams` as a list, or an empty dict.
+        """
+        def parse(results):
+            metadata = results[0]
+            if metadata.get("teams") is not None:
+                metadata["teams"] = metadata["teams"].split(",") if metadata["teams"] else []
+            return metadata
+
+        return self._read(slate_key(slate_id), lambda pipe: pipe.hgetall(slate_key(slate_id)), parse)
+
+    def start_listener(self):
+        """
+        Subscribes to keyspace notifications for the version key so writes from
+        other processes invalidate the local cache immediately. Without
+        notifications (e.g. `notify-keyspace-events` is not enabled and cannot be
+        set), the TTL and version check still apply.
+
+        Returns:
+            bool: True if the listener is running.
+        """
+        if self.listener is not None:
+            return True
+        try:
+            events = self.client.config_get("notify-keyspace-events").get("notify-keyspace-events", "")
+            if not ({"K", "$"} <= set(events) or {"K", "A"} <= set(events)):
+                self.client.config_set("notify-keyspace-events", events + "K$")
+            pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{f"__keyspace@{REDIS_DB}__:{VERSION_KEY}": lambda message: self.invalidate()})
+            self.listener = pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+            return True
+        except Exception as e:
+            print(f"Keyspace notifications unavailable, using TTL checks only: {e}")
+            return False
+
+    def stop_listener(self):
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
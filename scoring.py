@@ -0,0 +1,197 @@
+import hashlib
+import io
+import json
+import sys
+
+import numpy as np
+import pandas as pd
+
+from db import get_connection
+from metrics import print_summary, stage
+
+
+# Stats counted towards double-doubles and triple-doubles
+DOUBLE_STATS = ['points', 'reboundsTotal', 'assists', 'steals', 'blocks']
+
+# Declarative scoring rules: per-stat weights, bonuses and a final multiplier
+RULE_SETS = {
+    'dk_classic': {
+        'weights': {
+            'points': 1, 'threePointersMade': 0.5, 'reboundsTotal': 1.25, 'assists': 1.5,
+            'steals': 2, 'blocks': 2, 'turnovers': -0.5
+        },
+        'double_double': 1.5,
+        'triple_double': 3,
+        'multiplier': 1.0
+    },
+    'dk_showdown_captain': {
+        'weights': {
+            'points': 1, 'threePointersMade': 0.5, 'reboundsTotal': 1.25, 'assists': 1.5,
+            'steals': 2, 'blocks': 2, 'turnovers': -0.5
+        },
+        'double_double': 1.5,
+        'triple_double': 3,
+        'multiplier': 1.5
+    },
+    'fd_classic': {
+        'weights': {
+            'points': 1, 'reboundsTotal': 1.2, 'assists': 1.5, 'steals': 3, 'blocks': 3, 'turnovers': -1
+        },
+        'multiplier': 1.0
+    },
+    'yahoo_classic': {
+        'weights': {
+            'points': 1, 'threePointersMade': 0.5, 'reboundsTotal': 1.2, 'assists': 1.5,
+            'steals': 3, 'blocks': 3, 'turnovers': -1
+        },
+        'multiplier': 1.0
+    }
+}
+
+
+def rule_set_key(name, rules):
+    """
+    Cache key for a rule set: its name plus a hash of the rules, so editing the
+    weights invalidates previously cached scores.
+    """
+    digest = hashlib.sha1(json.dumps(rules, sort_keys=True).encode()).hexdigest()[:8]
+    return f"{name}:{digest}"
+
+
+def stat_matrix(df, stats):
+    """
+    Builds a float matrix of the given stat columns, matching column names
+    case-insensitively (player_box columns are lowercase in PostgreSQL).
+    Missing values count as zero.
+    """
+    columns = {col.lower(): col for col in df.columns}
+    return np.column_stack([
+        pd.to_numeric(df[columns[stat.lower()]], errors='coerce').fillna(0).to_numpy(dtype=float)
+        for stat in stats
+    ])
+
+
+def count_doubles(df):
+    """
+    Counts, per row, the DOUBLE_STATS categories reaching double digits.
+    """
+    return (stat_matrix(df, DOUBLE_STATS) >= 10).sum(axis=1)
+
+
+def score_fantasy_points(df, rules):
+    """
+    Scores every row of a stat DataFrame in one vectorized pass.
+
+    Parameters:
+        df (pd.DataFrame): One row per player-game with the stat columns used by the rules.
+        rules (dict): A rule set shaped like the entries of RULE_SETS.
+
+    Returns:
+        np.ndarray: Fantasy points per row.
+    """
+    weights = rules['weights']
+    fpts = stat_matrix(df, list(weights)) @ np.array(list(weights.values()), dtype=float)
+
+    if rules.get('double_double') or rules.get('triple_double'):
+        double_counts = count_doubles(df)
+        fpts += rules.get('double_double', 0) * (double_counts >= 2)
+        fpts += rules.get('triple_double', 0) * (double_counts >= 3)
+
+    return fpts * rules.get('multiplier', 1.0)
+
+
+def create_scores_table(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS player_box_scores (
+            rule_set TEXT NOT NULL,
+            game_id TEXT NOT NULL,
+            personId INT NOT NULL,
+            FPTS FLOAT NOT NULL,
+            PRIMARY KEY (rule_set, game_id, personId)
+        );
+    """)
+
+
+def invalidate_scores(cur, game_ids):
+    """
+    Drops cached scores of games whose player_box rows were rewritten, in the
+    caller's transaction, so every rule set rescores them on its next run.
+
+    Returns:
+        int: Number of deleted score rows.
+    """
+    game_ids = sorted({str(game_id) for game_id in game_ids})
+    cur.execute("SELECT to_regclass('player_box_scores') IS NOT NULL;")
+    if not game_ids or not cur.fetchone()[0]:
+        return 0
+    cur.execute("DELETE FROM player_box_scores WHERE game_id = ANY(%s);", (game_ids,))
+    return cur.rowcount
+
+
+def score_player_box_history(name, rules=None):
+    """
+    Scores every player_box row not yet scored under the rule set and caches the
+    results in player_box_scores. Only games ingested since the last run are read.
+
+    Parameters:
+        name (str): Rule set name, looked up in RULE_SETS when `rules` is omitted.
+        rules (dict, optional): Custom rule set.
+
+    Returns:
+        int: Number of newly scored rows.
+    """
+    rules = rules or RULE_SETS[name]
+    key = rule_set_key(name, rules)
+    stats = list(dict.fromkeys(list(rules['weights']) + DOUBLE_STATS))
+
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            create_scores_table(cur)
+            with stage('scoring', 'read_new_rows'):
+                cur.execute(f"""
+                    SELECT pb.game_id, pb.personId, {", ".join(f"pb.{stat}" for stat in stats)}
+                    FROM player_box pb
+                    WHERE NOT EXISTS (
+                        SELECT 1 FROM player_box_scores s
+                        WHERE s.rule_set = %s AND s.game_id = pb.game_id AND s.personId = pb.personId
+                    );
+                """, (key,))
+                new_rows = pd.DataFrame(cur.fetchall(), columns=['game_id', 'personId'] + stats)
+            if new_rows.empty:
+                return 0
+
+            with stage('scoring', 'score', rows=len(new_rows)):
+                scores = new_rows[['game_id', 'personId']].copy()
+                scores.insert(0, 'rule_set', key)
+                scores['FPTS'] = score_fantasy_points(new_rows, rules)
+
+            with stage('scoring', 'copy', rows=len(scores)):
+                buffer = io.StringIO()
+                scores.to_csv(buffer, index=False, header=False)
+                buffer.seek(0)
+                cur.copy_expert("COPY player_box_scores (rule_set, game_id, personId, FPTS) FROM STDIN WITH (FORMAT csv)", buffer)
+    return len(scores)
+
+
+def get_scores(name, rules=None):
+    """
+    Returns the cached scores for a rule set, scoring any new games first.
+
+    Returns:
+        pd.DataFrame: game_id, personId and FPTS.
+    """
+    rules = rules or RULE_SETS[name]
+    score_player_box_history(name, rules)
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT game_id, personId, FPTS FROM player_box_scores WHERE rule_set = %s;",
+                (rule_set_key(name, rules),)
+            )
+            return pd.DataFrame(cur.fetchall(), columns=['game_id', 'personId', 'FPTS'])
+
+
+if __name__ == '__main__':
+    for rule_set_name in sys.argv[1:] or list(RULE_SETS):
+        print(f"Scored {score_player_box_history(rule_set_name)} new rows for {rule_set_name}.")
+    print_summary('scoring')
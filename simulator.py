@@ -0,0 +1,249 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from db import get_cursor
+from metrics import record_cache
+from optimizer import PROCESS_CONTEXT, default_workers, player_id_value
+
+
+# Games of history per player used for variance and correlation estimates
+HISTORY_GAMES = 82
+
+# Coefficient of variation for players without enough history
+DEFAULT_CV = 0.35
+MIN_HISTORY_GAMES = 5
+
+# Weight, in shared games, of the teammate/opponent prior when shrinking pair correlations
+CORRELATION_PRIOR_WEIGHT = 20
+
+# Simulated fantasy points are bucketed into fixed bins so chunks merge cheaply
+BIN_WIDTH = 0.5
+MAX_POINTS = 150
+
+PERCENTILES = [10, 25, 50, 75, 90, 99]
+
+
+# Function to load recent played games for the slate players
+def load_player_history(person_ids, games=HISTORY_GAMES):
+    """
+    Returns the last `games` played games of FPTS per player.
+
+    Returns:
+        pd.DataFrame: game_id, personId, team and FPTS.
+    """
+    with get_cursor() as cur:
+        cur.execute("""
+            SELECT game_id, personId, team, FPTS
+            FROM (
+                SELECT pb.game_id, pb.personId, pb.team, pb.FPTS,
+                       row_number() OVER (PARTITION BY pb.personId ORDER BY gd.game_date DESC, pb.game_id DESC) AS game_rank
+                FROM player_box pb
+                JOIN (SELECT DISTINCT game_id, game_date FROM games) gd ON gd.game_id = pb.game_id
+                WHERE pb.minutesPlayed > 0 AND pb.personId = ANY(%s)
+            ) recent
+            WHERE game_rank <= %s;
+        """, (sorted({int(person_id) for person_id in person_ids}), games))
+        return pd.DataFrame(cur.fetchall(), columns=['game_id', 'personId', 'team', 'FPTS'])
+
+
+def nearest_correlation(matrix, floor=1e-6):
+    """
+    Projects a symmetric matrix onto the nearest valid correlation matrix by
+    clipping negative eigenvalues and rescaling the diagonal back to one.
+    """
+    values, vectors = np.linalg.eigh((matrix + matrix.T) / 2)
+    fixed = (vectors * np.maximum(values, floor)) @ vectors.T
+    scale = np.sqrt(np.diag(fixed))
+    fixed = fixed / np.outer(scale, scale)
+    np.fill_diagonal(fixed, 1.0)
+    return fixed
+
+
+def estimate_distribution(players, history):
+    """
+    Estimates per-player standard deviations and the player correlation matrix.
+
+    Standard deviations scale each player's historical coefficient of variation
+    to the current projection. Pair correlations come from standardized
+    residuals in games both players appeared in, shrunk towards the average
+    teammate or opponent correlation depending on how the pair meets on this
+    slate.
+
+    Parameters:
+        players (pd.DataFrame): Slate rows with proj, player_id, teamabbrev and game.
+        history (pd.DataFrame): Rows from `load_player_history`.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Standard deviations and correlation matrix.
+    """
+    person_ids = pd.to_numeric(players['player_id'], errors='coerce').to_numpy()
+    n = len(players)
+    proj = players['proj'].to_numpy(dtype=float)
+
+    stats = history.groupby('personId')['FPTS'].agg(['mean', 'std', 'count'])
+    slate_stats = stats.reindex(person_ids)
+    cv = (slate_stats['std'] / slate_stats['mean']).where((slate_stats['count'] >= MIN_HISTORY_GAMES) & (slate_stats['mean'] > 0))
+    sd = proj * cv.fillna(DEFAULT_CV).clip(0.15, 1.0).to_numpy()
+
+    # Standardized residuals, one row per game, one column per slate player
+    column_of = {person_id: i for i, person_id in enumerate(person_ids) if not np.isnan(person_id)}
+    history = history[history['personId'].isin(column_of)]
+    residuals = np.zeros((0, n))
+    if not history.empty:
+        z = (history['FPTS'] - history['personId'].map(stats['mean'])) / history['personId'].map(stats['std'])
+        game_rows, game_index = np.unique(history['game_id'].to_numpy(), return_inverse=True)
+        residuals = np.full((len(game_rows), n), np.nan)
+        residuals[game_index, history['personId'].map(column_of).to_numpy()] = z.to_numpy(dtype=float)
+    mask = np.isfinite(residuals).astype(float)
+    filled = np.nan_to_num(residuals)
+    shared = mask.T @ mask
+    with np.errstate(invalid='ignore', divide='ignore'):
+        observed = np.where(shared > 1, (filled.T @ filled) / np.maximum(shared - 1, 1), 0.0)
+    observed = np.clip(observed, -0.95, 0.95)
+
+    teams = players['teamabbrev'].to_numpy()
+    games = players['game'].to_numpy()
+    teammates = (teams[:, None] == teams[None, :])
+    opponents = (games[:, None] == games[None, :]) & ~teammates
+    off_diagonal = ~np.eye(n, dtype=bool)
+
+    def prior(relation):
+        weights = shared * relation * off_diagonal
+        return float((observed * weights).sum() / weights.sum()) if weights.sum() else 0.0
+
+    prior_matrix = np.where(teammates, prior(teammates), np.where(opponents, prior(opponents), 0.0))
+    correlation = (shared * observed + CORRELATION_PRIOR_WEIGHT * prior_matrix) / (shared + CORRELATION_PRIOR_WEIGHT)
+    np.fill_diagonal(correlation, 1.0)
+    return sd, nearest_correlation(correlation)
+
+
+def _simulate_chunk(proj, sd, cholesky, lineup_matrix, sims, seed):
+    rng = np.random.default_rng(seed)
+    draws = proj + sd * (rng.standard_normal((sims, len(proj))) @ cholesky.T)
+
+    num_bins = int(MAX_POINTS / BIN_WIDTH)
+    bins = np.clip((draws / BIN_WIDTH).astype(int), 0, num_bins - 1)
+    flat = (bins + np.arange(len(proj)) * num_bins).ravel()
+    histogram = np.bincount(flat, minlength=len(proj) * num_bins).reshape(len(proj), num_bins)
+
+    wins = np.zeros(lineup_matrix.shape[1], dtype=np.int64)
+    score_sums = np.zeros(lineup_matrix.shape[1])
+    if lineup_matrix.shape[1]:
+        scores = draws @ lineup_matrix
+        wins = np.bincount(scores.argmax(axis=1), minlength=lineup_matrix.shape[1])
+        score_sums = scores.sum(axis=0)
+    return histogram, wins, score_sums, draws.sum(axis=0)
+
+
+def histogram_percentiles(histogram, percentiles=PERCENTILES):
+    """
+    Reads percentiles off per-player histograms, at bin midpoints.
+    """
+    cdf = np.cumsum(histogram, axis=1) / histogram.sum(axis=1, keepdims=True)
+    return {
+        q: (np.argmax(cdf >= q / 100, axis=1) + 0.5) * BIN_WIDTH
+        for q in percentiles
+    }
+
+
+def simulate_slate(players, history, lineups=(), sims=10000, chunk_size=2000, workers=None, seed=None):
+    """
+    Runs correlated Monte Carlo simulations of a slate.
+
+    Draws are generated in chunks on a process pool; each chunk returns only
+    fixed-size histograms and per-lineup counters, so memory stays bounded by
+    the chunk size whatever the number of simulations.
+
+    Parameters:
+        players (pd.DataFrame): Rows from `optimizer.load_slate_players`.
+        history (pd.DataFrame): Rows from `load_player_history`.
+        lineups (list[tuple]): Candidate lineups as player rows.
+        sims (int): Number of simulations.
+        chunk_size (int): Simulations per chunk.
+        workers (int, optional): Worker processes; defaults to `default_workers()`.
+        seed (int, optional): Seed for reproducible results.
+
+    Returns:
+        tuple[list, list]: Per-player distribution summaries and per-lineup
+        optimal frequencies, each sorted best first.
+    """
+    players = players.reset_index(drop=True)
+    proj = players['proj'].to_numpy(dtype=float)
+    sd, correlation = estimate_distribution(players, history)
+    cholesky = np.linalg.cholesky(correlation)
+
+    lineup_matrix = np.zeros((len(players), len(lineups)))
+    for column, lineup in enumerate(lineups):
+        lineup_matrix[list(lineup), column] = 1
+
+    chunks = [min(chunk_size, sims - start) for start in range(0, sims, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(chunks))
+    workers = min(workers or default_workers(), len(chunks))
+    args = [(proj, sd, cholesky, lineup_matrix, size, chunk_seed) for size, chunk_seed in zip(chunks, seeds)]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=PROCESS_CONTEXT) as executor:
+            results = list(executor.map(_simulate_chunk, *zip(*args)))
+    else:
+        results = [_simulate_chunk(*chunk_args) for chunk_args in args]
+
+    histogram = sum(result[0] for result in results)
+    wins = sum(result[1] for result in results)
+    score_sums = sum(result[2] for result in results)
+    point_sums = sum(result[3] for result in results)
+    percentiles = histogram_percentiles(histogram)
+
+    records = players.fillna("").to_dict(orient='records')
+    player_summaries = sorted([
+        {
+            "id": int(record['id']), "name": record['name'], "player_id": player_id_value(record['player_id']),
+            "proj": float(record['proj']), "sd": round(float(sd[row]), 2),
+            "mean": round(float(point_sums[row] / sims), 2),
+            **{f"p{q}": float(values[row]) for q, values in percentiles.items()}
+        }
+        for row, record in enumerate(records)
+    ], key=lambda summary: -summary["mean"])
+
+    lineup_summaries = sorted([
+        {
+            "ids": [int(records[row]['id']) for row in lineup],
+            "proj": round(float(proj[list(lineup)].sum()), 2),
+            "mean": round(float(score_sums[column] / sims), 2),
+            "optimal_rate": round(float(wins[column] / sims), 4)
+        }
+        for column, lineup in enumerate(lineups)
+    ], key=lambda summary: -summary["optimal_rate"])
+    return player_summaries, lineup_summaries
+
+
+class SimulationCache:
+    """
+    Keeps recent simulation results keyed by slate, projection version and the
+    simulation settings, so repeated requests do not rerun the simulations.
+
+    Parameters:
+        max_entries (int): Number of results kept in memory.
+    """
+
+    def __init__(self, max_entries=16):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get_or_run(self, key, run):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                record_cache('simulation', True)
+                return self.entries[key], True
+        record_cache('simulation', False)
+        result = run()
+        with self.lock:
+            self.entries[key] = result
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return result, False
@@ -0,0 +1,84 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from metrics import record_cache
+
+
+class SlatePayloadCache:
+    """
+    LRU cache of serialized `/get-slate-data` responses keyed by slate_id.
+
+    Each entry remembers the mtime and size of `sal-{slate_id}-processed.csv`
+    it was built from, so a reprocessed slate is picked up on the next request
+    without any explicit invalidation.
+
+    Parameters:
+        max_entries (int): Number of slates kept in memory.
+    """
+
+    def __init__(self, max_entries=32):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def file_path(slate_id):
+        return f"sal-{slate_id}-processed.csv"
+
+    @staticmethod
+    def build_payload(file_path):
+        # Replace NaN values with an empty string for JSON compatibility
+        df = pd.read_csv(file_path).fillna("")
+        payload = {"status": "success", "data": df.to_dict(orient="records")}
+        body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        return etag, body
+
+    def get(self, slate_id):
+        """
+        Returns the ETag and JSON body for a slate, rebuilding them if the
+        processed file changed since they were cached.
+
+        Returns:
+            tuple[str, bytes] | None: (etag, body), or None if the file does not exist.
+        """
+        file_path = self.file_path(slate_id)
+        try:
+            stat = os.stat(file_path)
+        except FileNotFoundError:
+            with self.lock:
+                self.entries.pop(slate_id, None)
+            return None
+        version = (stat.st_mtime_ns, stat.st_size)
+
+        with self.lock:
+            entry = self.entries.get(slate_id)
+            if entry is not None and entry[0] == version:
+                self.entries.move_to_end(slate_id)
+                record_cache('slate_payload', True)
+                return entry[1], entry[2]
+
+        record_cache('slate_payload', False)
+
+        etag, body = self.build_payload(file_path)
+        with self.lock:
+            self.entries[slate_id] = (version, etag, body)
+            self.entries.move_to_end(slate_id)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return etag, body
+
+
+def etag_matches(if_none_match, etag):
+    """
+    Checks an If-None-Match header value against an ETag.
+    """
+    if not if_none_match:
+        return False
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
@@ -0,0 +1,92 @@
+import os
+import threading
+
+import pandas as pd
+
+from db import get_cursor
+
+
+# Touched by update_teams.py so long-running processes reload the index
+TEAM_INDEX_STAMP = "data/teams_index.stamp"
+
+_index = None
+_index_stamp = None
+_index_lock = threading.Lock()
+
+
+class TeamIndex:
+    """
+    In-memory lookup of NBA teams by id, abbreviation and nickname, in both
+    directions. Built from the same `teams` columns `process_salary_file` used to
+    query one row at a time.
+
+    Parameters:
+        rows (list[tuple]): (team_id, abbreviation, nickname) rows.
+    """
+
+    def __init__(self, rows):
+        self.frame = pd.DataFrame(rows, columns=['team_id', 'abv', 'nickname'])
+        self.abv_to_id = dict(zip(self.frame['abv'], self.frame['team_id']))
+        self.id_to_abv = dict(zip(self.frame['team_id'], self.frame['abv']))
+        self.nickname_to_id = dict(zip(self.frame['nickname'], self.frame['team_id']))
+        self.id_to_nickname = dict(zip(self.frame['team_id'], self.frame['nickname']))
+        self.abv_to_nickname = dict(zip(self.frame['abv'], self.frame['nickname']))
+        self.nickname_to_abv = dict(zip(self.frame['nickname'], self.frame['abv']))
+
+    def __len__(self):
+        return len(self.frame)
+
+    def ids(self):
+        return list(self.id_to_abv)
+
+    def abbreviations(self):
+        return list(self.abv_to_id)
+
+    def nicknames(self):
+        return list(self.nickname_to_id)
+
+
+def load_team_index():
+    """
+    Loads every team from the 'teams' table.
+
+    Returns:
+        TeamIndex: A freshly built index.
+    """
+    with get_cursor() as cur:
+        cur.execute("SELECT nba_team_id, abv, team_nickname FROM teams;")
+        return TeamIndex(cur.fetchall())
+
+
+def _stamp_mtime():
+    try:
+        return os.path.getmtime(TEAM_INDEX_STAMP)
+    except OSError:
+        return None
+
+
+def get_team_index(refresh=False):
+    """
+    Returns the process-wide team index, loading it on first use and reloading it
+    whenever update_teams.py has touched the stamp file since the last load.
+
+    Parameters:
+        refresh (bool): Force a reload from the database.
+    """
+    global _index, _index_stamp
+    stamp = _stamp_mtime()
+    if _index is None or refresh or stamp != _index_stamp:
+        with _index_lock:
+            if _index is None or refresh or stamp != _index_stamp:
+                _index = load_team_index()
+                _index_stamp = stamp
+    return _index
+
+
+def mark_team_index_stale():
+    """
+    Touches the stamp file so every process reloads its team index on next use.
+    """
+    os.makedirs(os.path.dirname(TEAM_INDEX_STAMP), exist_ok=True)
+    with open(TEAM_INDEX_STAMP, "a"):
+        os.utime(TEAM_INDEX_STAMP, None)
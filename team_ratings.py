@@ -0,0 +1,247 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+from psycopg2.extras import execute_values
+
+from db import get_cursor
+from metrics import add_rows, print_summary, stage
+
+
+# Window name -> number of most recent games, None for every game of the season so far
+RATING_WINDOWS = {'l10': 10, 'season': None}
+
+RATING_STATS = ['pace', 'ortg', 'drtg']
+
+RATING_COLUMNS = [f"{stat}_{window}" for window in RATING_WINDOWS for stat in RATING_STATS]
+
+# Regulation team minutes (5 players x 48)
+REGULATION_TEAM_MINUTES = 240
+
+# Columns added to slate rows
+SLATE_ENV_COLUMNS = ['implied_pace', 'env_factor']
+
+
+# Function to create the team_ratings table
+def create_team_ratings_table(cur):
+    columns = ",\n            ".join(f"{column} FLOAT" for column in RATING_COLUMNS)
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS team_ratings (
+            team_id INT NOT NULL,
+            game_id TEXT NOT NULL,
+            season_id TEXT NOT NULL,
+            game_date DATE NOT NULL,
+            possessions FLOAT NOT NULL,
+            {columns},
+            PRIMARY KEY (team_id, game_id)
+        );
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS team_ratings_team_date_idx ON team_ratings (team_id, game_date DESC);")
+
+
+def possessions(fga, fta, oreb, tov):
+    """
+    Estimated possessions: FGA + 0.44 * FTA - OREB + TOV.
+    """
+    return fga + 0.44 * fta - oreb + tov
+
+
+def rolling_sum(values, groups, window=None):
+    """
+    Sums of the last `window` rows (all rows when None) within each group, for
+    rows already sorted by group and date, from one cumulative sum.
+
+    Parameters:
+        values (np.ndarray): (n,) or (n, k) array.
+        groups (np.ndarray): Group label per row; equal labels must be contiguous.
+        window (int, optional): Rows per window.
+    """
+    n = len(values)
+    totals = np.cumsum(values, axis=0)
+    index = np.arange(n)
+    new_group = np.r_[True, groups[1:] != groups[:-1]] if n else np.zeros(0, dtype=bool)
+    starts = np.maximum.accumulate(np.where(new_group, index, 0))
+    lower = starts if window is None else np.maximum(starts, index - window + 1)
+    has_before = lower > 0
+    if values.ndim > 1:
+        has_before = has_before[:, None]
+    return totals - np.where(has_before, totals[lower - 1], 0)
+
+
+def compute_team_ratings(games):
+    """
+    Computes per-game rolling pace and offensive/defensive ratings.
+
+    Game possessions average both teams' estimates. Ratings are ratios of
+    window sums (points per 100 possessions), so long games weigh more than in
+    an average of per-game ratings. Pace is possessions per 48 minutes.
+
+    Parameters:
+        games (pd.DataFrame): Team game rows with team_id, game_id, season_id,
+            game_date, min, pts, fga, fta, oreb and tov; both teams of each game.
+
+    Returns:
+        pd.DataFrame: One row per team game with possessions and RATING_COLUMNS.
+    """
+    games = games.copy()
+    games['team_poss'] = possessions(games['fga'], games['fta'], games['oreb'], games['tov'])
+    games['minutes'] = pd.to_numeric(games['min'], errors='coerce').fillna(REGULATION_TEAM_MINUTES)
+    opponents = games[['game_id', 'team_id', 'pts', 'team_poss']].rename(
+        columns={'team_id': 'opp_team_id', 'pts': 'opp_pts', 'team_poss': 'opp_poss'}
+    )
+    games = games.merge(opponents, on='game_id')
+    games = games[games['team_id'] != games['opp_team_id']]
+    games = games.sort_values(['team_id', 'season_id', 'game_date', 'game_id']).reset_index(drop=True)
+
+    poss = ((games['team_poss'] + games['opp_poss']) / 2).to_numpy(dtype=float)
+    # Columns: possessions, points for, points against, game length in 48-minute units
+    values = np.column_stack([
+        poss,
+        games['pts'].to_numpy(dtype=float),
+        games['opp_pts'].to_numpy(dtype=float),
+        games['minutes'].to_numpy(dtype=float) / REGULATION_TEAM_MINUTES
+    ])
+    groups = (games['team_id'].astype(str) + '|' + games['season_id'].astype(str)).to_numpy()
+
+    ratings = games[['team_id', 'game_id', 'season_id', 'game_date']].copy()
+    ratings['possessions'] = poss
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for window, size in RATING_WINDOWS.items():
+            sums = rolling_sum(values, groups, size)
+            ratings[f"pace_{window}"] = sums[:, 0] / sums[:, 3]
+            ratings[f"ortg_{window}"] = 100 * sums[:, 1] / sums[:, 0]
+            ratings[f"drtg_{window}"] = 100 * sums[:, 2] / sums[:, 0]
+    return ratings
+
+
+# Function to load team game rows for the given team seasons
+def load_team_games(cur, team_seasons):
+    """
+    Reads every game of the given (team_id, season_id) pairs, plus the opponent
+    row of each of those games.
+    """
+    cur.execute("""
+        WITH scoped AS (
+            SELECT DISTINCT g.game_id
+            FROM games g
+            JOIN unnest(%s::int[], %s::text[]) AS ts(team_id, season_id)
+              ON ts.team_id = g.team_id AND ts.season_id = g.season_id
+        )
+        SELECT g.team_id, g.game_id, g.season_id, g.game_date::date, g.min, g.pts, g.fga, g.fta, g.oreb, g.tov
+        FROM games g
+        JOIN scoped s ON s.game_id = g.game_id
+        WHERE g.pts IS NOT NULL;
+    """, ([team_id for team_id, _ in team_seasons], [season_id for _, season_id in team_seasons]))
+    return pd.DataFrame(
+        cur.fetchall(),
+        columns=['team_id', 'game_id', 'season_id', 'game_date', 'min', 'pts', 'fga', 'fta', 'oreb', 'tov']
+    )
+
+
+# Function to refresh team ratings for new or changed games
+def refresh_team_ratings(cur, game_ids=None):
+    """
+    Recomputes the rating series of every team season touched by the given
+    games, or by games not yet in team_ratings when `game_ids` is None, and
+    upserts them. Other seasons and teams are left alone.
+
+    Returns:
+        int: Number of team game rows written.
+    """
+    create_team_ratings_table(cur)
+    if game_ids is not None:
+        game_ids = sorted({str(game_id) for game_id in game_ids})
+        if not game_ids:
+            return 0
+        cur.execute("SELECT DISTINCT team_id, season_id FROM games WHERE game_id = ANY(%s);", (game_ids,))
+    else:
+        cur.execute("""
+            SELECT DISTINCT g.team_id, g.season_id
+            FROM games g
+            WHERE NOT EXISTS (
+                SELECT 1 FROM team_ratings r WHERE r.team_id = g.team_id AND r.game_id = g.game_id
+            );
+        """)
+    team_seasons = cur.fetchall()
+    if not team_seasons:
+        return 0
+
+    ratings = compute_team_ratings(load_team_games(cur, team_seasons))
+    # Opponent rows were only loaded to complete their games
+    ratings = ratings[pd.MultiIndex.from_frame(ratings[['team_id', 'season_id']]).isin(team_seasons)]
+    columns = ['team_id', 'game_id', 'season_id', 'game_date', 'possessions'] + RATING_COLUMNS
+    rows = ratings[columns].astype(object).where(pd.notna(ratings[columns]), None)
+    execute_values(
+        cur,
+        f"""
+        INSERT INTO team_ratings ({", ".join(columns)}) VALUES %s
+        ON CONFLICT (team_id, game_id) DO UPDATE SET
+            {", ".join(f"{column} = EXCLUDED.{column}" for column in columns[2:])};
+        """,
+        list(rows.itertuples(index=False, name=None)),
+        page_size=1000
+    )
+    return len(rows)
+
+
+# Function to read each team's latest ratings
+def load_latest_team_ratings():
+    """
+    Returns:
+        pd.DataFrame: One row per team with its ratings after its last game.
+    """
+    with get_cursor() as cur:
+        cur.execute("SELECT to_regclass('team_ratings') IS NOT NULL;")
+        if not cur.fetchone()[0]:
+            return pd.DataFrame(columns=['team_id'] + RATING_COLUMNS)
+        cur.execute(f"""
+            SELECT DISTINCT ON (team_id) team_id, {", ".join(RATING_COLUMNS)}
+            FROM team_ratings
+            ORDER BY team_id, game_date DESC, game_id DESC;
+        """)
+        return pd.DataFrame(cur.fetchall(), columns=['team_id'] + RATING_COLUMNS)
+
+
+# Function to attach implied game environment to slate rows
+def add_env_columns(salary_df, ratings=None, window='season', team_column='team_id', opp_column='opp_team_id'):
+    """
+    Adds SLATE_ENV_COLUMNS to a salary DataFrame.
+
+    implied_pace is team pace x opponent pace / league pace. env_factor is the
+    team's implied points relative to a league-average team in a league-average
+    game: (implied pace / league pace) x (team ORtg x opponent DRtg / league
+    ORtg) / league ORtg.
+
+    Parameters:
+        salary_df (pd.DataFrame): Slate rows with team and opponent IDs.
+        ratings (pd.DataFrame, optional): Rows from `load_latest_team_ratings`.
+        window (str): Rating window to use, a key of RATING_WINDOWS.
+    """
+    ratings = load_latest_team_ratings() if ratings is None else ratings
+    ratings = ratings.assign(team_id=pd.to_numeric(ratings['team_id'])).set_index('team_id')
+    pace, ortg, drtg = (ratings[f"{stat}_{window}"].astype(float) for stat in RATING_STATS)
+    league_pace, league_ortg = pace.mean(), ortg.mean()
+
+    team_ids = pd.to_numeric(salary_df[team_column], errors='coerce')
+    opp_ids = pd.to_numeric(salary_df[opp_column], errors='coerce')
+    implied_pace = team_ids.map(pace) * opp_ids.map(pace) / league_pace
+    implied_ortg = team_ids.map(ortg) * opp_ids.map(drtg) / league_ortg
+    salary_df['implied_pace'] = implied_pace.round(2)
+    salary_df['env_factor'] = ((implied_pace / league_pace) * (implied_ortg / league_ortg)).round(3)
+    return salary_df
+
+
+# Main Execution
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description="Refresh rolling team pace and efficiency ratings from the games table.")
+    arg_parser.add_argument('--rebuild', action='store_true', help="Recompute every team season.")
+    args = arg_parser.parse_args()
+
+    with stage('team_ratings', 'refresh'):
+        with get_cursor() as cur:
+            if args.rebuild:
+                cur.execute("DROP TABLE IF EXISTS team_ratings;")
+            count = refresh_team_ratings(cur)
+    add_rows('team_ratings', 'refresh', count)
+    print(f"Refreshed ratings for {count} team games.")
+    print_summary('team_ratings')
@@ -1,83 +1,190 @@
-from datetime import timezone, datetime
-from dateutil import parser
-from nba_api.live.nba.endpoints import scoreboard
-import json
-import psycopg2
-from dotenv import load_dotenv
-import os
-
-
-# Load environment variables from .env file
-load_dotenv()
-
-# Access the variables
-DB_HOST = os.getenv('DB_HOST')
-DB_USER = os.getenv('DB_USER')
-DB_PASS = os.getenv('DB_PASS')
-DB_NAME = os.getenv('DB_NAME')
-
-print(f"Database Host: {DB_HOST}")
-
-f = "{gameId}: {awayTeam} vs. {homeTeam} @ {gameTimeLTZ}"
-
-board = scoreboard.ScoreBoard()
-
-with open("scoreboard_raw.json", "w") as file:
-    json.dump(board.get_dict(), file, indent=4)
-
-print("ScoreBoardDate: " + board.score_board_date)
-
-games = board.games.get_dict()
-
-with open("games_raw.json", "w") as file:
-    json.dump(games, file, indent=4)
-
-def connect_to_postgres():
-    try:
-        conn = psycopg2.connect(
-            host=DB_HOST,
-            user=DB_USER,
-            password=DB_PASS,
-            dbname=DB_NAME
-        )
-        return conn
-    except psycopg2.Error as e:
-        print(f"Error connecting to PostgreSQL: {e}")
-        exit(1)
-
-connection = connect_to_postgres()
-cursor = connection.cursor()
-
-cursor.execute("DROP TABLE IF EXISTS games_today;")
-cursor.execute("""
-CREATE TABLE games_today (
-    game_id VARCHAR(255) PRIMARY KEY,
-    away VARCHAR(255) REFERENCES teams(team_nickname),
-    home VARCHAR(255) REFERENCES teams(team_nickname),
-    datetime TIMESTAMP
-);
-""")
-
-insert_query = "INSERT INTO games_today (game_id, away, home, datetime) VALUES (%s, %s, %s, %s);"
-for game in games:
-    game_id = game['gameId']
-    away_team = game['awayTeam']['teamName']
-    home_team = game['homeTeam']['teamName']
-    game_datetime = parser.parse(game["gameTimeUTC"]).replace(tzinfo=timezone.utc).astimezone(tz=None)
-    cursor.execute(insert_query, (game_id, away_team, home_team, game_datetime))
-
-connection.commit()
-cursor.close()
-connection.close()
-
-for game in games:
-    gameTimeLTZ = parser.parse(game["gameTimeUTC"]).replace(tzinfo=timezone.utc).astimezone(tz=None)
-    formattedTime = gameTimeLTZ.strftime("%Y-%m-%d %I:%M %p")
-    print(f.format(gameId=game['gameId'], awayTeam=game['awayTeam']['teamName'], homeTeam=game['homeTeam']['teamName'], gameTimeLTZ=formattedTime))
-
-
-
-# for game in games:
-#     gameTimeLTZ = parser.parse(game["gameTimeUTC"]).replace(tzinfo=timezone.utc).astimezone(tz=None)
-#     formattedTime = gameTimeLTZ.strftime("%Y-%m-%d %I:%M %p")
-#     print(f.format(gameId=game['gameId'], awayTeam=game['awayTeam']['teamName'], homeTeam=game['homeTeam']['teamName'], gameTimeLTZ=formattedTime))
+from datetime import timezone, datetime
+from dateutil import parser
+from nba_api.live.nba.endpoints import scoreboard
+import gzip
+import hashlib
+import json
+import os
+import time
+from psycopg2.extras import execute_values
+from db import DB_HOST, get_cursor
+from metrics import print_summary, stage, timed_request
+from team_index import get_team_index
+
+f = "{gameId}: {awayTeam} vs. {homeTeam} @ {gameTimeLTZ}"
+
+# Compressed scoreboard snapshots, named by the hash of their content
+SNAPSHOT_FOLDER = "data/scoreboard"
+LATEST_HASH_FILE = os.path.join(SNAPSHOT_FOLDER, "latest")
+
+# Snapshots older than this are deleted; the latest one is always kept
+SNAPSHOT_MAX_AGE_DAYS = float(os.getenv('SCOREBOARD_SNAPSHOT_MAX_AGE_DAYS', 14))
+
+
+# Function to hash a scoreboard payload
+def payload_hash(board_dict):
+    # Only the fields behind games_today and the game status are hashed, so live scores and clocks don't count as changes
+    games = [
+        [game['gameId'], game['awayTeam']['teamName'], game['homeTeam']['teamName'], game['gameTimeUTC'], game['gameStatus']]
+        for game in board_dict['scoreboard']['games']
+    ]
+    body = json.dumps(games, separators=(',', ':'))
+    return hashlib.sha256(body.encode('utf-8')).hexdigest()
+
+
+# Function to read the hash of the last stored scoreboard
+def load_latest_hash():
+    try:
+        with open(LATEST_HASH_FILE) as file:
+            return file.read().strip() or None
+    except OSError:
+        return None
+
+
+# Function to store a scoreboard snapshot once per distinct payload
+def save_snapshot(board_dict, digest):
+    """
+    Writes the payload as gzip-compressed JSON named by its hash and records it
+    as the latest snapshot. Payloads with the same hash share one file, the
+    first one written. Snapshots older than SNAPSHOT_MAX_AGE_DAYS are pruned.
+
+    Returns:
+        str: Path of the snapshot.
+    """
+    os.makedirs(SNAPSHOT_FOLDER, exist_ok=True)
+    path = os.path.join(SNAPSHOT_FOLDER, f"{digest}.json.gz")
+    if not os.path.exists(path):
+        tmp_path = f"{path}.tmp"
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as file:
+            json.dump(board_dict, file, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    tmp_path = f"{LATEST_HASH_FILE}.tmp"
+    with open(tmp_path, 'w') as file:
+        file.write(digest)
+    os.replace(tmp_path, LATEST_HASH_FILE)
+    prune_snapshots(keep=path)
+    return path
+
+
+# Function to delete old scoreboard snapshots
+def prune_snapshots(max_age_days=SNAPSHOT_MAX_AGE_DAYS, keep=None):
+    """
+    Deletes snapshots last written more than `max_age_days` ago, except `keep`.
+
+    Returns:
+        int: Number of deleted snapshots.
+    """
+    cutoff = time.time() - max_age_days * 86400
+    deleted = 0
+    for name in os.listdir(SNAPSHOT_FOLDER):
+        path = os.path.join(SNAPSHOT_FOLDER, name)
+        if name.endswith('.json.gz') and path != keep and os.path.getmtime(path) < cutoff:
+            os.remove(path)
+            deleted += 1
+    return deleted
+
+
+# Function to create the games_today table
+def create_games_today_table(cursor):
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS games_today (
+        game_id VARCHAR(255) PRIMARY KEY,
+        away VARCHAR(255) REFERENCES teams(team_nickname),
+        home VARCHAR(255) REFERENCES teams(team_nickname),
+        datetime TIMESTAMP
+    );
+    """)
+
+
+# Function to build games_today rows from scoreboard games
+def games_today_rows(games):
+    # Games against non-NBA teams would violate the teams foreign keys
+    team_nicknames = set(get_team_index().nicknames())
+
+    rows = []
+    for game in games:
+        if not {game['awayTeam']['teamName'], game['homeTeam']['teamName']} <= team_nicknames:
+            print(f"Skipping game {game['gameId']}: team not found in teams table")
+            continue
+        game_datetime = parser.parse(game["gameTimeUTC"]).replace(tzinfo=timezone.utc).astimezone(tz=None)
+        rows.append((game['gameId'], game['awayTeam']['teamName'], game['homeTeam']['teamName'], game_datetime))
+    return rows
+
+
+# Function to sync games_today with the scoreboard
+def upsert_games_today(cursor, rows):
+    """
+    Upserts today's games in one statement and deletes games no longer on the
+    scoreboard, in the caller's transaction. Unchanged rows are not rewritten,
+    so readers are never blocked by a table rebuild.
+
+    Returns:
+        tuple[int, int]: Counts of inserted or updated rows and deleted rows.
+    """
+    create_games_today_table(cursor)
+    written = 0
+    if rows:
+        execute_values(
+            cursor,
+            """
+            INSERT INTO games_today (game_id, away, home, datetime) VALUES %s
+            ON CONFLICT (game_id) DO UPDATE SET
+                away = EXCLUDED.away,
+                home = EXCLUDED.home,
+                datetime = EXCLUDED.datetime
+            WHERE (games_today.away, games_today.home, games_today.datetime)
+                IS DISTINCT FROM (EXCLUDED.away, EXCLUDED.home, EXCLUDED.datetime);
+            """,
+            rows
+        )
+        written = cursor.rowcount
+    cursor.execute(
+        "DELETE FROM games_today WHERE NOT (game_id = ANY(%s));",
+        ([row[0] for row in rows],)
+    )
+    return written, cursor.rowcount
+
+
+# Function to refresh games_today from the live scoreboard
+def refresh_scoreboard(force=False):
+    """
+    Fetches today's scoreboard and, if the payload changed since the last run,
+    stores a snapshot and syncs games_today.
+
+    Args:
+        force (bool): Write even when the payload hash is unchanged.
+
+    Returns:
+        list: The scoreboard games, or None if nothing changed.
+    """
+    board = timed_request('ScoreBoard', scoreboard.ScoreBoard)
+    board_dict = board.get_dict()
+    print("ScoreBoardDate: " + board.score_board_date)
+
+    digest = payload_hash(board_dict)
+    if not force and digest == load_latest_hash():
+        print("Scoreboard unchanged since the last run; skipping write.")
+        return None
+
+    games = board_dict['scoreboard']['games']
+    with stage('scoreboard', 'upsert_games_today', rows=len(games)):
+        with get_cursor() as cursor:
+            written, deleted = upsert_games_today(cursor, games_today_rows(games))
+    print(f"games_today: {written} rows written, {deleted} stale rows deleted.")
+
+    # Recorded only after the database write succeeded, so a failed run is retried
+    save_snapshot(board_dict, digest)
+    return games
+
+
+if __name__ == '__main__':
+    print(f"Database Host: {DB_HOST}")
+    games = refresh_scoreboard()
+
+    for game in games or []:
+        gameTimeLTZ = parser.parse(game["gameTimeUTC"]).replace(tzinfo=timezone.utc).astimezone(tz=None)
+        formattedTime = gameTimeLTZ.strftime("%Y-%m-%d %I:%M %p")
+        print(f.format(gameId=game['gameId'], awayTeam=game['awayTeam']['teamName'], homeTeam=game['homeTeam']['teamName'], gameTimeLTZ=formattedTime))
+
+    print_summary('scoreboard')
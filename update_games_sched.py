@@ -1,199 +1,301 @@
-from nba_api.stats.endpoints import leaguegamefinder
-import pandas as pd
-import psycopg2
-from datetime import datetime
-from dotenv import load_dotenv
-import os
-
-
-# Load environment variables from .env file
-load_dotenv()
-
-# Access the variables
-DB_HOST = os.getenv('DB_HOST')
-DB_USER = os.getenv('DB_USER')
-DB_PASS = os.getenv('DB_PASS')
-DB_NAME = os.getenv('DB_NAME')
-
-print(f"Database Host: {DB_HOST}")
-
-
-valid_abbreviations = [
-    'ATL', 'BOS', 'BKN', 'CHA', 'CHI', 'CLE', 'DAL', 'DEN',
-    'DET', 'GSW', 'HOU', 'IND', 'LAC', 'LAL', 'MEM', 'MIA',
-    'MIL', 'MIN', 'NOP', 'NYK', 'OKC', 'ORL', 'PHI', 'PHX',
-    'POR', 'SAC', 'SAS', 'TOR', 'UTA', 'WAS'
-]
-
-
-season = '2024-25'
-
-# Fetch games data
-gamefinder = leaguegamefinder.LeagueGameFinder(season_nullable=season)
-games = gamefinder.get_data_frames()[0]
-
-# Filter games based on SEASON_ID
-print(games['SEASON_ID'].unique())
-
-# Drop rows with today's date
-today = datetime.now().strftime('%Y-%m-%d')
-games_to_store = games[games['GAME_DATE'] != today]
-games_to_store = games_to_store[games_to_store['TEAM_ABBREVIATION'].isin(valid_abbreviations)]
-
-
-def connect_to_postgres():
-    try:
-        conn = psycopg2.connect(
-            host=DB_HOST,
-            user=DB_USER,
-            password=DB_PASS,
-            dbname=DB_NAME
-        )
-        return conn
-    except psycopg2.Error as e:
-        print(f"Error connecting to PostgreSQL: {e}")
-        exit(1)
-
-
-def create_game_ids_table():
-    """
-    Creates the 'game_ids' table if it does not exist.
-    """
-    conn = connect_to_postgres()
-    cur = conn.cursor()
-
-    try:
-        create_sql = '''
-            CREATE TABLE IF NOT EXISTS game_ids (
-                game_id TEXT PRIMARY KEY,
-                game_date TEXT NOT NULL
-            )
-        '''
-        cur.execute(create_sql)
-        conn.commit()
-        print("Table 'game_ids' created successfully.")
-    except Exception as e:
-        print(f"Error creating table: {e}")
-    finally:
-        cur.close()
-        conn.close()
-
-
-def append_new_game_ids(df):
-    """
-    Appends unique game_id and game_date pairs to the 'game_ids' table.
-
-    Parameters:
-        df (pd.DataFrame): The filtered games DataFrame.
-    """
-    conn = connect_to_postgres()
-    cur = conn.cursor()
-
-    try:
-        unique_games = df[['GAME_ID', 'GAME_DATE']].drop_duplicates()
-        for index, row in unique_games.iterrows():
-            insert_sql = '''
-                INSERT INTO game_ids (game_id, game_date)
-                VALUES (%s, %s)
-                ON CONFLICT (game_id) DO NOTHING;
-            '''
-            cur.execute(insert_sql, (row['GAME_ID'], row['GAME_DATE']))
-
-        conn.commit()
-        print("New game IDs inserted successfully into the 'game_ids' table.")
-    except Exception as e:
-        print(f"Error inserting game IDs: {e}")
-    finally:
-        cur.close()
-        conn.close()
-
-
-def create_games_table():
-    conn = connect_to_postgres()
-    cur = conn.cursor()
-
-    try:
-        create_sql = '''
-            CREATE TABLE IF NOT EXISTS games (
-                season_id TEXT NOT NULL,
-                team_id INT NOT NULL,
-                team_abbreviation TEXT NOT NULL,
-                team_name TEXT NOT NULL,
-                game_id TEXT NOT NULL,
-                game_date TEXT NOT NULL,
-                matchup TEXT NOT NULL,
-                wl TEXT,
-                min TEXT,
-                pts INT,
-                fgm INT,
-                fga INT,
-                fg_pct FLOAT,
-                fg3m INT,
-                fg3a INT,
-                fg3_pct FLOAT,
-                ftm INT,
-                fta INT,
-                ft_pct FLOAT,
-                oreb INT,
-                dreb INT,
-                reb INT,
-                ast INT,
-                stl INT,
-                blk INT,
-                tov INT,
-                pf INT,
-                plus_minus FLOAT,
-                PRIMARY KEY (game_id, team_id)
-            )
-        '''
-        cur.execute(create_sql)
-        conn.commit()
-        print("Table 'games' created successfully.")
-    except Exception as e:
-        print(f"Error creating table: {e}")
-    finally:
-        cur.close()
-        conn.close()
-
-
-def append_new_games(df):
-    conn = connect_to_postgres()
-    cur = conn.cursor()
-
-    try:
-        for index, row in df.iterrows():
-            insert_sql = '''
-                INSERT INTO games_sched (season_id, team_id, team_abbreviation, team_name, game_id, game_date, matchup, wl, min, pts, fgm, fga, fg_pct, fg3m, fg3a, fg3_pct, ftm, fta, ft_pct, oreb, dreb, reb, ast, stl, blk, tov, pf, plus_minus)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                ON CONFLICT (game_id, team_id) DO NOTHING;
-            '''
-            cur.execute(insert_sql, (
-                row['SEASON_ID'], row['TEAM_ID'], row['TEAM_ABBREVIATION'], row['TEAM_NAME'],
-                row['GAME_ID'], row['GAME_DATE'], row['MATCHUP'], row['WL'], row['MIN'],
-                row['PTS'], row['FGM'], row['FGA'], row['FG_PCT'], row['FG3M'], row['FG3A'],
-                row['FG3_PCT'], row['FTM'], row['FTA'], row['FT_PCT'], row['OREB'],
-                row['DREB'], row['REB'], row['AST'], row['STL'], row['BLK'], row['TOV'],
-                row['PF'], row['PLUS_MINUS']
-            ))
-
-        conn.commit()
-        print("New games data inserted successfully into the 'games' table.")
-    except Exception as e:
-        print(f"Error inserting game data: {e}")
-    finally:
-        cur.close()
-        conn.close()
-
-
-if __name__ == '__main__':
-    # Step 1: Create the game_ids table if it doesn't exist
-    create_game_ids_table()
-
-    # Step 2: Append new game IDs to the table
-    append_new_game_ids(games_to_store)
-
-    # Step 3: Create the games table if it doesn't exist
-    create_games_table()
-
-    # Step 4: Append new games data to the table
-    append_new_games(games_to_store)
+from nba_api.stats.endpoints import leaguegamefinder
+import pandas as pd
+import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from psycopg2.extras import execute_values
+from db import DB_HOST, get_connection, get_cursor
+from metrics import add_rows, print_summary, stage, timed_request
+from rate_limit import TokenBucket, call_with_retries
+from team_index import get_team_index
+from team_ratings import refresh_team_ratings
+
+
+valid_abbreviations = [
+    'ATL', 'BOS', 'BKN', 'CHA', 'CHI', 'CLE', 'DAL', 'DEN',
+    'DET', 'GSW', 'HOU', 'IND', 'LAC', 'LAL', 'MEM', 'MIA',
+    'MIL', 'MIN', 'NOP', 'NYK', 'OKC', 'ORL', 'PHI', 'PHX',
+    'POR', 'SAC', 'SAS', 'TOR', 'UTA', 'WAS'
+]
+
+
+season = '2024-25'
+
+# Days before the last stored game_date that are fetched again to pick up stat corrections
+OVERLAP_DAYS = int(os.getenv('GAMES_SYNC_OVERLAP_DAYS', 3))
+
+GAME_COLUMNS = [
+    'SEASON_ID', 'TEAM_ID', 'TEAM_ABBREVIATION', 'TEAM_NAME', 'GAME_ID', 'GAME_DATE', 'MATCHUP', 'WL', 'MIN',
+    'PTS', 'FGM', 'FGA', 'FG_PCT', 'FG3M', 'FG3A', 'FG3_PCT', 'FTM', 'FTA', 'FT_PCT', 'OREB',
+    'DREB', 'REB', 'AST', 'STL', 'BLK', 'TOV', 'PF', 'PLUS_MINUS'
+]
+
+
+def fetch_games(season=season, date_from=None, bucket=None, max_retries=3):
+    """
+    Fetches team game rows from LeagueGameFinder.
+
+    Parameters:
+        season (str): Season such as '2024-25'.
+        date_from (datetime.date, optional): Only return games on or after this date.
+        bucket (TokenBucket, optional): Rate limiter shared by concurrent requests.
+        max_retries (int): Retries with exponential backoff on errors or throttling.
+
+    Returns:
+        pd.DataFrame: One row per team per game.
+    """
+    def request():
+        gamefinder = timed_request(
+            'LeagueGameFinder',
+            leaguegamefinder.LeagueGameFinder,
+            season_nullable=season,
+            league_id_nullable='00',
+            date_from_nullable=date_from.strftime('%m/%d/%Y') if date_from else ''
+        )
+        return gamefinder.get_data_frames()[0]
+
+    return call_with_retries(request, bucket=bucket, max_retries=max_retries)
+
+
+def filter_games(games):
+    """
+    Drops games from today, which may still be in progress, and rows for non-NBA teams.
+    """
+    today = datetime.now().strftime('%Y-%m-%d')
+    games_to_store = games[games['GAME_DATE'] != today]
+    return games_to_store[games_to_store['TEAM_ABBREVIATION'].isin(get_team_index().abbreviations() or valid_abbreviations)]
+
+
+def get_last_game_date(season=season):
+    """
+    Returns the latest game_date stored for `season` (e.g. '2024-25') in any
+    season type, or None if the season has no rows yet. season_id is the
+    season-type digit followed by the starting year, e.g. '22024'.
+    """
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT to_regclass('games') IS NOT NULL;")
+            if not cur.fetchone()[0]:
+                return None
+            cur.execute("SELECT max(game_date) FROM games WHERE right(season_id, 4) = %s;", (season[:4],))
+            last = cur.fetchone()[0]
+    return datetime.strptime(last, '%Y-%m-%d').date() if last else None
+
+
+def create_game_ids_table():
+    """
+    Creates the 'game_ids' table if it does not exist.
+    """
+    with get_connection() as conn:
+        cur = conn.cursor()
+
+        try:
+            create_sql = '''
+                CREATE TABLE IF NOT EXISTS game_ids (
+                    game_id TEXT PRIMARY KEY,
+                    game_date TEXT NOT NULL
+                )
+            '''
+            cur.execute(create_sql)
+            conn.commit()
+            print("Table 'game_ids' created successfully.")
+        except Exception as e:
+            print(f"Error creating table: {e}")
+        finally:
+            cur.close()
+
+
+def append_new_game_ids(df):
+    """
+    Appends unique game_id and game_date pairs to the 'game_ids' table.
+
+    Parameters:
+        df (pd.DataFrame): The filtered games DataFrame.
+    """
+    with get_connection() as conn:
+        cur = conn.cursor()
+
+        try:
+            unique_games = df[['GAME_ID', 'GAME_DATE']].drop_duplicates()
+            execute_values(
+                cur,
+                """
+                INSERT INTO game_ids (game_id, game_date) VALUES %s
+                ON CONFLICT (game_id) DO NOTHING;
+                """,
+                list(unique_games.itertuples(index=False, name=None))
+            )
+            conn.commit()
+            print(f"Inserted {cur.rowcount} new game IDs into the 'game_ids' table.")
+        except Exception as e:
+            print(f"Error inserting game IDs: {e}")
+        finally:
+            cur.close()
+
+
+def create_games_table():
+    with get_connection() as conn:
+        cur = conn.cursor()
+
+        try:
+            create_sql = '''
+                CREATE TABLE IF NOT EXISTS games (
+                    season_id TEXT NOT NULL,
+                    team_id INT NOT NULL,
+                    team_abbreviation TEXT NOT NULL,
+                    team_name TEXT NOT NULL,
+                    game_id TEXT NOT NULL,
+                    game_date TEXT NOT NULL,
+                    matchup TEXT NOT NULL,
+                    wl TEXT,
+                    min TEXT,
+                    pts INT,
+                    fgm INT,
+                    fga INT,
+                    fg_pct FLOAT,
+                    fg3m INT,
+                    fg3a INT,
+                    fg3_pct FLOAT,
+                    ftm INT,
+                    fta INT,
+                    ft_pct FLOAT,
+                    oreb INT,
+                    dreb INT,
+                    reb INT,
+                    ast INT,
+                    stl INT,
+                    blk INT,
+                    tov INT,
+                    pf INT,
+                    plus_minus FLOAT,
+                    PRIMARY KEY (game_id, team_id)
+                )
+            '''
+            cur.execute(create_sql)
+            conn.commit()
+            print("Table 'games' created successfully.")
+        except Exception as e:
+            print(f"Error creating table: {e}")
+        finally:
+            cur.close()
+
+
+def append_new_games(df):
+    """
+    Upserts team game rows into the 'games' table in one batch. Rows that
+    already exist are updated, so re-fetched dates pick up stat corrections.
+
+    Parameters:
+        df (pd.DataFrame): The filtered games DataFrame.
+    """
+    with get_connection() as conn:
+        cur = conn.cursor()
+
+        try:
+            rows = df[GAME_COLUMNS].astype(object).where(pd.notna(df[GAME_COLUMNS]), None)
+            columns = [col.lower() for col in GAME_COLUMNS]
+            update_sql = ", ".join(f"{col} = EXCLUDED.{col}" for col in columns if col not in ('game_id', 'team_id'))
+            execute_values(
+                cur,
+                f"""
+                INSERT INTO games ({", ".join(columns)}) VALUES %s
+                ON CONFLICT (game_id, team_id) DO UPDATE SET {update_sql};
+                """,
+                list(rows.itertuples(index=False, name=None)),
+                page_size=1000
+            )
+            conn.commit()
+            print(f"Upserted {len(rows)} rows into the 'games' table.")
+        except Exception as e:
+            # Callers must not record the sync as done, so the rows are fetched again next run
+            conn.rollback()
+            print(f"Error inserting game data: {e}")
+            raise
+        finally:
+            cur.close()
+
+
+def store_games(games):
+    with stage('games', 'filter', rows=len(games)):
+        games_to_store = filter_games(games)
+    with stage('games', 'store', rows=len(games_to_store)):
+        append_new_game_ids(games_to_store)
+        append_new_games(games_to_store)
+    # Re-fetched games may carry stat corrections, so their team seasons are recomputed too
+    with stage('games', 'team_ratings'):
+        with get_cursor() as cur:
+            rated = refresh_team_ratings(cur, games_to_store['GAME_ID'].unique())
+    add_rows('games', 'team_ratings', rated)
+    return len(games_to_store)
+
+
+def sync_recent_games(season=season, overlap_days=OVERLAP_DAYS):
+    """
+    Fetches only games since the last stored game_date, minus an overlap
+    window, and upserts them. Falls back to the whole season on an empty table.
+
+    Returns:
+        int: Number of team game rows stored.
+    """
+    last_date = get_last_game_date(season)
+    date_from = last_date - timedelta(days=overlap_days) if last_date else None
+    print(f"Fetching {season} games from {date_from or 'the start of the season'}.")
+    return store_games(fetch_games(season, date_from=date_from, max_retries=3))
+
+
+def backfill_seasons(seasons, workers=3, rate=0.5, max_retries=5):
+    """
+    Fetches whole seasons in parallel under a shared rate limit and stores each
+    one as it arrives.
+
+    Returns:
+        dict: season -> rows stored, or the error message for failed seasons.
+    """
+    bucket = TokenBucket(rate, capacity=1)
+    results = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(fetch_games, backfill_season, None, bucket, max_retries): backfill_season
+            for backfill_season in seasons
+        }
+        for future in as_completed(futures):
+            backfill_season = futures[future]
+            try:
+                results[backfill_season] = store_games(future.result())
+                print(f"Stored {results[backfill_season]} rows for {backfill_season}.")
+            except Exception as e:
+                results[backfill_season] = str(e)
+                print(f"Error backfilling {backfill_season}: {e}")
+    return results
+
+
+def season_range(first, last):
+    """
+    Lists seasons from `first` to `last` inclusive, e.g. ('2021-22', '2023-24').
+    """
+    start, end = int(first[:4]), int(last[:4])
+    return [f"{year}-{str(year + 1)[-2:]}" for year in range(start, end + 1)]
+
+
+if __name__ == '__main__':
+    print(f"Database Host: {DB_HOST}")
+
+    arg_parser = argparse.ArgumentParser(description="Sync NBA team game rows into the games table.")
+    arg_parser.add_argument('--season', default=season, help="Season to sync incrementally, e.g. 2024-25.")
+    arg_parser.add_argument('--overlap-days', type=int, default=OVERLAP_DAYS, help="Days re-fetched before the last stored game_date.")
+    arg_parser.add_argument('--backfill', nargs=2, metavar=('FIRST', 'LAST'), help="Fetch every season from FIRST to LAST, e.g. 2015-16 2023-24.")
+    arg_parser.add_argument('--workers', type=int, default=3, help="Seasons fetched in parallel during a backfill.")
+    arg_parser.add_argument('--rate', type=float, default=0.5, help="Maximum requests per second during a backfill.")
+    args = arg_parser.parse_args()
+
+    # Create the tables if they don't exist
+    create_game_ids_table()
+    create_games_table()
+
+    if args.backfill:
+        backfill_seasons(season_range(*args.backfill), workers=args.workers, rate=args.rate)
+    else:
+        sync_recent_games(args.season, overlap_days=args.overlap_days)
+
+    print_summary('games')
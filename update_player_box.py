@@ -1,284 +1,668 @@
-import os
-import time
-from datetime import datetime
-import pandas as pd
-import psycopg2
-from nba_api.live.nba.endpoints import boxscore
-from dotenv import load_dotenv
-import os
-
-
-# Load environment variables from .env file
-load_dotenv()
-
-# Access the variables
-DB_HOST = os.getenv('DB_HOST')
-DB_USER = os.getenv('DB_USER')
-DB_PASS = os.getenv('DB_PASS')
-DB_NAME = os.getenv('DB_NAME')
-
-print(f"Database Host: {DB_HOST}")
-
-BOX_FOLDER = "data/nba_api/box"
-
-# Function to connect to PostgreSQL
-def connect_to_postgres():
-    try:
-        conn = psycopg2.connect(
-            host=DB_HOST,
-            user=DB_USER,
-            password=DB_PASS,
-            dbname=DB_NAME
-        )
-        return conn
-    except psycopg2.Error as e:
-        print(f"Error connecting to PostgreSQL: {e}")
-        exit(1)
-
-# Function to get team IDs
-def get_team_ids():
-    conn = connect_to_postgres()
-    cur = conn.cursor()
-    try:
-        cur.execute("SELECT id FROM teams_api;")
-        team_ids = [row[0] for row in cur.fetchall()]
-        return team_ids
-    except Exception as e:
-        print(f"Error retrieving team IDs: {e}")
-    finally:
-        cur.close()
-        conn.close()
-
-# Function to get filtered game IDs
-def get_filtered_games(team_ids):
-    """
-    Retrieves a list of game IDs for specified team IDs, excluding games that already exist in the player_box table.
-
-    Args:
-        team_ids (list[int]): List of team IDs to filter games by.
-
-    Returns:
-        list[str]: List of filtered game IDs.
-    """
-    conn = connect_to_postgres()
-    cur = conn.cursor()
-    try:
-        today = datetime.now().strftime('%Y-%m-%d')
-        query = """
-            SELECT DISTINCT g.game_id, g.game_date
-            FROM games g
-            WHERE LEFT(g.season_id, 1) NOT IN ('1', '3', '5')
-            AND g.team_id = ANY(%s::int[])
-            AND g.game_date != %s
-            AND NOT EXISTS (
-                SELECT 1
-                FROM player_box pb
-                WHERE pb.game_id = g.game_id
-            )
-            ORDER BY g.game_date ASC;
-        """
-        cur.execute(query, (team_ids, today))
-        game_ids: list[str] = [str(row[0]) for row in cur.fetchall()]
-        return game_ids
-    except Exception as e:
-        print(f"Error retrieving games: {e}")
-        return []
-    finally:
-        cur.close()
-        conn.close()
-
-
-
-# Function to add double-double and triple-double stats
-def add_doubles(df):
-    df['DD'] = ((df[['points', 'reboundsTotal', 'assists', 'steals', 'blocks']] >= 10).sum(axis=1) >= 2).astype(bool)
-    df['TD'] = ((df[['points', 'reboundsTotal', 'assists', 'steals', 'blocks']] >= 10).sum(axis=1) >= 3).astype(bool)
-
-# Function to calculate fantasy points
-def calculate_FPTS(df):
-    return (
-        df['points'] +
-        df['threePointersMade'] * 0.5 +
-        df['reboundsTotal'] * 1.25 +
-        df['assists'] * 1.5 +
-        df['steals'] * 2 +
-        df['blocks'] * 2 -
-        df['turnovers'] * 0.5 +
-        df['DD'] * 1.5 +
-        df['TD'] * 3
-    )
-
-# Function to prepare the DataFrame for SQL insertion
-def prepare_dataframe_for_sql(df):
-    df = df.where(pd.notna(df), None)  # Replace NaN with None
-
-    # Cast integer columns to float where NaN is possible
-    int_cols_with_nan = [
-        'order', 'assists', 'blocks', 'blocksReceived', 'fieldGoalsAttempted',
-        'fieldGoalsMade', 'foulsOffensive', 'foulsDrawn', 'foulsPersonal',
-        'foulsTechnical', 'freeThrowsAttempted', 'freeThrowsMade',
-        'reboundsDefensive', 'reboundsOffensive', 'reboundsTotal', 'steals',
-        'threePointersAttempted', 'threePointersMade', 'turnovers',
-        'twoPointersAttempted', 'twoPointersMade', 'pointsFastBreak',
-        'pointsInThePaint', 'pointsSecondChance', 'points'
-    ]
-    for col in int_cols_with_nan:
-        if col in df.columns:
-            df[col] = df[col].astype('float64', errors='ignore')
-
-    # Handle boolean columns
-    bool_cols = ['starter', 'oncourt', 'played']
-    for col in bool_cols:
-        if col in df.columns:
-            df[col] = df[col].map({'1': True, '0': False, None: None})
-
-    return df
-
-# Function to fetch and save boxscore data
-def fetch_and_save_boxscore(game_id):
-    try:
-        print(f"Fetching boxscore for game_id: {game_id}")
-        box = boxscore.BoxScore(str(game_id))
-        game_stats_dict = box.get_dict()
-
-        # Load player data
-        home_players = game_stats_dict['game']['homeTeam']['players']
-        away_players = game_stats_dict['game']['awayTeam']['players']
-
-        home_df = pd.DataFrame(home_players)
-        away_df = pd.DataFrame(away_players)
-
-        # Flatten statistics
-        if 'statistics' in home_df.columns:
-            home_stats = pd.json_normalize(home_df['statistics'])
-            home_df = pd.concat([home_df.drop(columns=['statistics']), home_stats], axis=1)
-
-        if 'statistics' in away_df.columns:
-            away_stats = pd.json_normalize(away_df['statistics'])
-            away_df = pd.concat([away_df.drop(columns=['statistics']), away_stats], axis=1)
-
-        # Add team and game_id columns
-        home_df['team'] = game_stats_dict['game']['homeTeam']['teamName']
-        home_df['game_id'] = game_id
-
-        away_df['team'] = game_stats_dict['game']['awayTeam']['teamName']
-        away_df['game_id'] = game_id
-
-        # Combine home and away DataFrames
-        combined_stats_df = pd.concat([away_df, home_df], ignore_index=True)
-
-        # Add doubles and FPTS
-        add_doubles(combined_stats_df)
-        combined_stats_df['FPTS'] = calculate_FPTS(combined_stats_df)
-
-        # Prepare DataFrame for SQL
-        combined_stats_df = prepare_dataframe_for_sql(combined_stats_df)
-
-        # Connect to database and insert data
-        conn = connect_to_postgres()
-        cur = conn.cursor()
-
-        # Ensure table exists
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS player_box (
-                game_id TEXT NOT NULL,
-                personId INT NOT NULL,
-                status TEXT,
-                order_num INT,
-                jerseyNum TEXT,
-                position TEXT,
-                starter BOOLEAN,
-                oncourt BOOLEAN,
-                played BOOLEAN,
-                name TEXT,
-                assists INT,
-                blocks INT,
-                blocksReceived INT,
-                fieldGoalsAttempted INT,
-                fieldGoalsMade INT,
-                fieldGoalsPercentage FLOAT,
-                foulsOffensive INT,
-                foulsDrawn INT,
-                foulsPersonal INT,
-                foulsTechnical INT,
-                freeThrowsAttempted INT,
-                freeThrowsMade INT,
-                freeThrowsPercentage FLOAT,
-                minus FLOAT,
-                minutes TEXT,
-                minutesCalculated TEXT,
-                plus FLOAT,
-                plusMinusPoints FLOAT,
-                points INT,
-                pointsFastBreak INT,
-                pointsInThePaint INT,
-                pointsSecondChance INT,
-                reboundsDefensive INT,
-                reboundsOffensive INT,
-                reboundsTotal INT,
-                steals INT,
-                threePointersAttempted INT,
-                threePointersMade INT,
-                threePointersPercentage FLOAT,
-                turnovers INT,
-                twoPointersAttempted INT,
-                twoPointersMade INT,
-                twoPointersPercentage FLOAT,
-                DD BOOLEAN,
-                TD BOOLEAN,
-                FPTS FLOAT,
-                team TEXT,
-                PRIMARY KEY (game_id, personId)
-            );
-        """)
-
-        # Insert new records
-        for _, row in combined_stats_df.iterrows():
-            try:
-                sql = """
-                    INSERT INTO player_box VALUES (
-                        %(game_id)s, %(personId)s, %(status)s, %(order)s, %(jerseyNum)s,
-                        %(position)s, %(starter)s, %(oncourt)s, %(played)s, %(name)s,
-                        %(assists)s, %(blocks)s, %(blocksReceived)s, %(fieldGoalsAttempted)s,
-                        %(fieldGoalsMade)s, %(fieldGoalsPercentage)s, %(foulsOffensive)s,
-                        %(foulsDrawn)s, %(foulsPersonal)s, %(foulsTechnical)s,
-                        %(freeThrowsAttempted)s, %(freeThrowsMade)s, %(freeThrowsPercentage)s,
-                        %(minus)s, %(minutes)s, %(minutesCalculated)s, %(plus)s,
-                        %(plusMinusPoints)s, %(points)s, %(pointsFastBreak)s,
-                        %(pointsInThePaint)s, %(pointsSecondChance)s, %(reboundsDefensive)s,
-                        %(reboundsOffensive)s, %(reboundsTotal)s, %(steals)s,
-                        %(threePointersAttempted)s, %(threePointersMade)s,
-                        %(threePointersPercentage)s, %(turnovers)s, %(twoPointersAttempted)s,
-                        %(twoPointersMade)s, %(twoPointersPercentage)s, %(DD)s, %(TD)s,
-                        %(FPTS)s, %(team)s
-                    )
-                    ON CONFLICT (game_id, personId) DO NOTHING;
-                """
-                cur.execute(sql, row.to_dict())
-            except Exception as e:
-                print(f"Error inserting row: {row.to_dict()}")
-                print(f"Exception: {e}")
-
-        conn.commit()
-        cur.close()
-        conn.close()
-        print(f"Boxscore for game {game_id} processed successfully.")
-        return True
-    except Exception as e:
-        print(f"Error fetching or saving boxscore for game {game_id}: {e}")
-        return False
-
-# Main Execution
-if __name__ == '__main__':
-    os.makedirs(BOX_FOLDER, exist_ok=True)
-
-    team_ids = get_team_ids()
-    print(f"Loaded {len(team_ids)} team IDs.")
-
-    game_ids = get_filtered_games(team_ids)
-    print(f"Found {len(game_ids)} unique game IDs to process.")
-
-    for game_id in game_ids:
-        should_delay = fetch_and_save_boxscore(game_id)
-        if should_delay:
-            time.sleep(5)
+import argparse
+import gzip
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime
+import pandas as pd
+from psycopg2.extras import execute_values
+from nba_api.live.nba.endpoints import boxscore
+from rate_limit import TokenBucket, call_with_retries
+from db import DB_HOST, get_connection, get_cursor, missing_columns
+from dvp import refresh_dvp_incremental
+from features import refresh_player_features
+from metrics import add_rows, print_summary, record_cache, stage, timed_request
+from scoring import RULE_SETS, count_doubles, invalidate_scores, score_fantasy_points
+
+
+BOX_FOLDER = "data/nba_api/box"
+BOX_CACHE_MAX_BYTES = int(os.getenv('BOX_CACHE_MAX_BYTES', 2 * 1024 ** 3))
+BOX_CACHE_MAX_AGE_DAYS = float(os.getenv('BOX_CACHE_MAX_AGE_DAYS', 730))
+
+# Columns added after player_box was first created, with their types
+PLAYER_BOX_ADDED_COLUMNS = {'secondsPlayed': 'FLOAT', 'minutesPlayed': 'FLOAT', 'game_date': 'DATE'}
+
+# Game logs per player and per team, newest first, in the keyset order used for pagination
+PLAYER_BOX_INDEXES = {
+    'player_box_personid_date_idx': "(personId, game_date DESC, game_id DESC)",
+    'player_box_team_date_idx': "(team, game_date DESC, game_id DESC, personId DESC)"
+}
+
+# Replaced by player_box_personid_date_idx
+PLAYER_BOX_DROPPED_INDEXES = ['player_box_personid_idx']
+
+_player_box_ready = False
+_player_box_lock = threading.Lock()
+
+# Function to get team IDs
+def get_team_ids():
+    try:
+        with get_cursor() as cur:
+            cur.execute("SELECT id FROM teams_api;")
+            team_ids = [row[0] for row in cur.fetchall()]
+            return team_ids
+    except Exception as e:
+        print(f"Error retrieving team IDs: {e}")
+
+# Function to get filtered game IDs
+def get_filtered_games(team_ids):
+    """
+    Retrieves a list of game IDs for specified team IDs, excluding games that already exist in the player_box table.
+
+    Args:
+        team_ids (list[int]): List of team IDs to filter games by.
+
+    Returns:
+        list[str]: List of filtered game IDs.
+    """
+    try:
+        today = datetime.now().strftime('%Y-%m-%d')
+        query = """
+            SELECT DISTINCT g.game_id, g.game_date
+            FROM games g
+            WHERE LEFT(g.season_id, 1) NOT IN ('1', '3', '5')
+            AND g.team_id = ANY(%s::int[])
+            AND g.game_date != %s
+            AND NOT EXISTS (
+                SELECT 1
+                FROM player_box pb
+                WHERE pb.game_id = g.game_id
+            )
+            ORDER BY g.game_date ASC;
+        """
+        with get_cursor() as cur:
+            cur.execute(query, (team_ids, today))
+            game_ids: list[str] = [str(row[0]) for row in cur.fetchall()]
+            return game_ids
+    except Exception as e:
+        print(f"Error retrieving games: {e}")
+        return []
+
+
+
+# Function to add double-double and triple-double stats
+def add_doubles(df):
+    double_counts = count_doubles(df)
+    df['DD'] = double_counts >= 2
+    df['TD'] = double_counts >= 3
+
+# Function to calculate DraftKings fantasy points
+def calculate_FPTS(df):
+    return pd.Series(score_fantasy_points(df, RULE_SETS['dk_classic']), index=df.index)
+
+# Function to convert ISO-8601 durations (PT34M01.00S) to seconds
+def parse_minutes_seconds(minutes):
+    parts = minutes.astype('string').str.extract(r'PT(?:(\d+)M)?(?:([\d.]+)S)?')
+    seconds = parts[0].astype(float).fillna(0) * 60 + parts[1].astype(float).fillna(0)
+    # Keep NULL for rows without a duration string
+    return seconds.where(minutes.astype('string').str.startswith('PT', na=False))
+
+# Function to add numeric playing time columns
+def add_minutes_played(df):
+    df['secondsPlayed'] = parse_minutes_seconds(df['minutes']).round(2)
+    df['minutesPlayed'] = (df['secondsPlayed'] / 60).round(4)
+
+# Function to prepare the DataFrame for SQL insertion
+def prepare_dataframe_for_sql(df):
+    df = df.where(pd.notna(df), None)  # Replace NaN with None
+
+    # Cast integer columns to float where NaN is possible
+    int_cols_with_nan = [
+        'order', 'assists', 'blocks', 'blocksReceived', 'fieldGoalsAttempted',
+        'fieldGoalsMade', 'foulsOffensive', 'foulsDrawn', 'foulsPersonal',
+        'foulsTechnical', 'freeThrowsAttempted', 'freeThrowsMade',
+        'reboundsDefensive', 'reboundsOffensive', 'reboundsTotal', 'steals',
+        'threePointersAttempted', 'threePointersMade', 'turnovers',
+        'twoPointersAttempted', 'twoPointersMade', 'pointsFastBreak',
+        'pointsInThePaint', 'pointsSecondChance', 'points'
+    ]
+    for col in int_cols_with_nan:
+        if col in df.columns:
+            df[col] = df[col].astype('float64', errors='ignore')
+
+    # Handle boolean columns
+    bool_cols = ['starter', 'oncourt', 'played']
+    for col in bool_cols:
+        if col in df.columns:
+            df[col] = df[col].map({'1': True, '0': False, None: None})
+
+    return df
+
+# Functions to read and write the raw boxscore cache
+def box_cache_path(game_id):
+    return os.path.join(BOX_FOLDER, f"{game_id}.json.gz")
+
+def load_cached_boxscore(game_id):
+    """
+    Loads a cached raw boxscore payload.
+
+    Returns:
+        dict | None: The payload, or None if the game is not cached or unreadable.
+    """
+    path = box_cache_path(game_id)
+    if not os.path.exists(path):
+        return None
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError) as e:
+        print(f"Discarding unreadable cache entry {path}: {e}")
+        os.remove(path)
+        return None
+
+def save_cached_boxscore(game_id, game_stats_dict):
+    """
+    Writes a raw boxscore payload to the cache as gzip-compressed JSON. Only final
+    games (gameStatus 3) are cached, since live payloads keep changing.
+    """
+    if game_stats_dict.get('game', {}).get('gameStatus') != 3:
+        return
+    os.makedirs(BOX_FOLDER, exist_ok=True)
+    path = box_cache_path(game_id)
+    tmp_path = f"{path}.tmp"
+    with gzip.open(tmp_path, 'wt', encoding='utf-8') as file:
+        json.dump(game_stats_dict, file, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+def evict_box_cache(max_bytes=None, max_age_days=None):
+    """
+    Evicts cache entries older than `max_age_days`, then the least recently written
+    entries until the cache fits in `max_bytes`.
+
+    Returns:
+        int: Number of evicted entries.
+    """
+    if not os.path.isdir(BOX_FOLDER):
+        return 0
+
+    entries = []
+    for name in os.listdir(BOX_FOLDER):
+        if name.endswith('.json.gz'):
+            path = os.path.join(BOX_FOLDER, name)
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, stat.st_size, path))
+    entries.sort()
+
+    evicted = 0
+    now = time.time()
+    total_bytes = sum(size for _, size, _ in entries)
+    for mtime, size, path in entries:
+        too_old = max_age_days is not None and now - mtime > max_age_days * 86400
+        too_big = max_bytes is not None and total_bytes > max_bytes
+        if not (too_old or too_big):
+            continue
+        os.remove(path)
+        total_bytes -= size
+        evicted += 1
+    return evicted
+
+# Function to fetch the raw boxscore payload
+def fetch_boxscore(game_id, bucket=None, max_retries=0, use_cache=True):
+    """
+    Fetches the raw boxscore payload for a game, from the on-disk cache when
+    available and from the live stats CDN otherwise.
+
+    Args:
+        game_id (str): The game ID.
+        bucket (TokenBucket, optional): Rate limiter shared by concurrent workers.
+        max_retries (int): Retries with exponential backoff on errors or throttling.
+        use_cache (bool): Read from and write to the raw boxscore cache.
+
+    Returns:
+        dict: The `BoxScore.get_dict()` payload.
+    """
+    if use_cache:
+        game_stats_dict = load_cached_boxscore(game_id)
+        record_cache('boxscore', game_stats_dict is not None)
+        if game_stats_dict is not None:
+            return game_stats_dict
+
+    def request():
+        return timed_request('BoxScore', lambda: boxscore.BoxScore(str(game_id)).get_dict())
+
+    game_stats_dict = call_with_retries(request, bucket=bucket, max_retries=max_retries)
+    if use_cache:
+        save_cached_boxscore(game_id, game_stats_dict)
+    return game_stats_dict
+
+# Function to flatten a boxscore payload into player records
+def boxscore_player_records(game_id, game_stats_dict):
+    records = []
+    for side in ('awayTeam', 'homeTeam'):
+        team = game_stats_dict['game'][side]
+        for player in team['players']:
+            # Flatten statistics
+            record = {key: value for key, value in player.items() if key != 'statistics'}
+            record.update(player.get('statistics', {}))
+
+            # Add team and game_id columns
+            record['team'] = team['teamName']
+            record['game_id'] = game_id
+            records.append(record)
+    return records
+
+# Function to score and prepare flattened player records
+def build_player_box_dataframe(records):
+    with stage('player_box', 'transform', rows=len(records)):
+        combined_stats_df = pd.DataFrame(records)
+
+        # Add doubles and FPTS
+        add_doubles(combined_stats_df)
+        combined_stats_df['FPTS'] = calculate_FPTS(combined_stats_df)
+        add_minutes_played(combined_stats_df)
+
+        # Prepare DataFrame for SQL
+        return prepare_dataframe_for_sql(combined_stats_df)
+
+# Function to turn a boxscore payload into player rows
+def build_boxscore_dataframe(game_id, game_stats_dict):
+    return build_player_box_dataframe(boxscore_player_records(game_id, game_stats_dict))
+
+# Function to create the player_box table
+def create_player_box_table(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS player_box (
+            game_id TEXT NOT NULL,
+            personId INT NOT NULL,
+            status TEXT,
+            order_num INT,
+            jerseyNum TEXT,
+            position TEXT,
+            starter BOOLEAN,
+            oncourt BOOLEAN,
+            played BOOLEAN,
+            name TEXT,
+            assists INT,
+            blocks INT,
+            blocksReceived INT,
+            fieldGoalsAttempted INT,
+            fieldGoalsMade INT,
+            fieldGoalsPercentage FLOAT,
+            foulsOffensive INT,
+            foulsDrawn INT,
+            foulsPersonal INT,
+            foulsTechnical INT,
+            freeThrowsAttempted INT,
+            freeThrowsMade INT,
+            freeThrowsPercentage FLOAT,
+            minus FLOAT,
+            minutes TEXT,
+            minutesCalculated TEXT,
+            plus FLOAT,
+            plusMinusPoints FLOAT,
+            points INT,
+            pointsFastBreak INT,
+            pointsInThePaint INT,
+            pointsSecondChance INT,
+            reboundsDefensive INT,
+            reboundsOffensive INT,
+            reboundsTotal INT,
+            steals INT,
+            threePointersAttempted INT,
+            threePointersMade INT,
+            threePointersPercentage FLOAT,
+            turnovers INT,
+            twoPointersAttempted INT,
+            twoPointersMade INT,
+            twoPointersPercentage FLOAT,
+            DD BOOLEAN,
+            TD BOOLEAN,
+            FPTS FLOAT,
+            team TEXT,
+            secondsPlayed FLOAT,
+            minutesPlayed FLOAT,
+            game_date DATE,
+            PRIMARY KEY (game_id, personId)
+        );
+    """)
+    # Tables created before the playing time and game_date columns existed; only ALTER when one is missing
+    for column in missing_columns(cur, 'player_box', PLAYER_BOX_ADDED_COLUMNS):
+        cur.execute(f"ALTER TABLE player_box ADD COLUMN {column} {PLAYER_BOX_ADDED_COLUMNS[column]};")
+    # Index DDL locks the table even when there is nothing to do, so the catalog is checked first
+    cur.execute(
+        "SELECT indexname FROM pg_indexes WHERE schemaname = current_schema() AND tablename = 'player_box';"
+    )
+    existing = {row[0] for row in cur.fetchall()}
+    for name, columns in PLAYER_BOX_INDEXES.items():
+        if name not in existing:
+            cur.execute(f"CREATE INDEX {name} ON player_box {columns};")
+    for name in PLAYER_BOX_DROPPED_INDEXES:
+        if name in existing:
+            cur.execute(f"DROP INDEX {name};")
+
+# Function to create and migrate player_box once per process
+def ensure_player_box_table():
+    """
+    Runs `create_player_box_table` in its own short transaction the first time
+    it is called in this process. Ingest transactions then hold no DDL locks,
+    so readers of player_box are not stalled once per saved game.
+    """
+    global _player_box_ready
+    if not _player_box_ready:
+        with _player_box_lock:
+            if not _player_box_ready:
+                with get_cursor() as cur:
+                    create_player_box_table(cur)
+                _player_box_ready = True
+
+# Function to create the per-player fantasy points per minute table
+def create_player_fpm_table(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS player_fpm (
+            personId INT PRIMARY KEY,
+            games INT NOT NULL,
+            minutesPlayed FLOAT NOT NULL,
+            FPTS FLOAT NOT NULL,
+            FPM FLOAT,
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        );
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS player_fpm_fpm_idx ON player_fpm (FPM DESC);")
+
+# Function to refresh FPTS per minute for a set of players
+def refresh_player_fpm(cur, person_ids=None):
+    """
+    Recomputes player_fpm rows from player_box for the given players, or for
+    everyone when `person_ids` is None. Only games with playing time count.
+
+    Returns:
+        int: Number of player rows written.
+    """
+    create_player_fpm_table(cur)
+    if person_ids is not None:
+        person_ids = sorted({int(person_id) for person_id in person_ids})
+        if not person_ids:
+            return 0
+    cur.execute(f"""
+        INSERT INTO player_fpm (personId, games, minutesPlayed, FPTS, FPM)
+        SELECT personId, count(*), sum(minutesPlayed), sum(FPTS), sum(FPTS) / sum(minutesPlayed)
+        FROM player_box
+        WHERE minutesPlayed > 0 {"AND personId = ANY(%s)" if person_ids is not None else ""}
+        GROUP BY personId
+        ON CONFLICT (personId) DO UPDATE SET
+            games = EXCLUDED.games,
+            minutesPlayed = EXCLUDED.minutesPlayed,
+            FPTS = EXCLUDED.FPTS,
+            FPM = EXCLUDED.FPM,
+            updated_at = now();
+    """, (person_ids,) if person_ids is not None else None)
+    return cur.rowcount
+
+# Function to backfill numeric playing time for existing rows
+def backfill_minutes_played(cur):
+    """
+    Fills secondsPlayed and minutesPlayed for rows ingested before the columns
+    existed, in one set-based UPDATE, then rebuilds player_fpm.
+
+    Returns:
+        int: Number of player_box rows updated.
+    """
+    create_player_box_table(cur)
+    cur.execute(r"""
+        UPDATE player_box
+        SET secondsPlayed = round((
+                COALESCE(substring(minutes from 'PT(\d+)M')::numeric, 0) * 60 +
+                COALESCE(substring(minutes from '([\d.]+)S')::numeric, 0)
+            ), 2)
+        WHERE secondsPlayed IS NULL AND minutes LIKE 'PT%';
+    """)
+    updated = cur.rowcount
+    cur.execute("UPDATE player_box SET minutesPlayed = round((secondsPlayed / 60)::numeric, 4) WHERE minutesPlayed IS NULL AND secondsPlayed IS NOT NULL;")
+    refresh_player_fpm(cur)
+    refresh_player_features(cur)
+    return updated
+
+# Function to copy game dates from the games table onto player_box rows
+def fill_game_dates(cur, game_ids=None):
+    """
+    Sets player_box.game_date from the games table where it is missing or
+    out of date, for the given games or for every game when `game_ids` is None.
+
+    Returns:
+        int: Number of player_box rows updated.
+    """
+    cur.execute(f"""
+        UPDATE player_box pb
+        SET game_date = g.game_date::date
+        FROM (SELECT DISTINCT game_id, game_date FROM games) g
+        WHERE pb.game_id = g.game_id
+        AND pb.game_date IS DISTINCT FROM g.game_date::date
+        {"AND pb.game_id = ANY(%s)" if game_ids is not None else ""};
+    """, (list(game_ids),) if game_ids is not None else None)
+    return cur.rowcount
+
+PLAYER_BOX_COLUMNS = [
+    'game_id', 'personId', 'status', 'order', 'jerseyNum', 'position', 'starter',
+    'oncourt', 'played', 'name', 'assists', 'blocks', 'blocksReceived',
+    'fieldGoalsAttempted', 'fieldGoalsMade', 'fieldGoalsPercentage', 'foulsOffensive',
+    'foulsDrawn', 'foulsPersonal', 'foulsTechnical', 'freeThrowsAttempted',
+    'freeThrowsMade', 'freeThrowsPercentage', 'minus', 'minutes', 'minutesCalculated',
+    'plus', 'plusMinusPoints', 'points', 'pointsFastBreak', 'pointsInThePaint',
+    'pointsSecondChance', 'reboundsDefensive', 'reboundsOffensive', 'reboundsTotal',
+    'steals', 'threePointersAttempted', 'threePointersMade', 'threePointersPercentage',
+    'turnovers', 'twoPointersAttempted', 'twoPointersMade', 'twoPointersPercentage',
+    'DD', 'TD', 'FPTS', 'team', 'secondsPlayed', 'minutesPlayed'
+]
+PLAYER_BOX_SQL_COLUMNS = [col if col != 'order' else 'order_num' for col in PLAYER_BOX_COLUMNS]
+
+# Function to save player rows to the player_box table
+def save_boxscore_dataframe(combined_stats_df, conn=None, overwrite=False):
+    """
+    Inserts boxscore rows into player_box with one batched statement.
+
+    Args:
+        combined_stats_df (pd.DataFrame): Rows built by `build_boxscore_dataframe`.
+        conn: Optional open connection; a pooled one is borrowed when omitted.
+        overwrite (bool): Update rows that already exist instead of skipping them.
+    """
+    if conn is None:
+        with get_connection() as conn:
+            return save_boxscore_dataframe(combined_stats_df, conn=conn, overwrite=overwrite)
+
+    ensure_player_box_table()
+    cur = conn.cursor()
+
+    try:
+        rows = combined_stats_df.reindex(columns=PLAYER_BOX_COLUMNS)
+        rows = rows.astype(object).where(pd.notna(rows), None).to_dict(orient='records')
+        template = "(" + ", ".join(f"%({col})s" for col in PLAYER_BOX_COLUMNS) + ")"
+
+        if overwrite:
+            update_cols = PLAYER_BOX_SQL_COLUMNS[2:]
+            conflict_sql = "DO UPDATE SET " + ", ".join(f"{col} = EXCLUDED.{col}" for col in update_cols)
+        else:
+            conflict_sql = "DO NOTHING"
+
+        with stage('player_box', 'insert', rows=len(rows)):
+            execute_values(
+                cur,
+                f"INSERT INTO player_box ({', '.join(PLAYER_BOX_SQL_COLUMNS)}) VALUES %s ON CONFLICT (game_id, personId) {conflict_sql};",
+                rows,
+                template=template,
+                page_size=1000
+            )
+            fill_game_dates(cur, [str(game_id) for game_id in combined_stats_df['game_id'].unique()])
+            if overwrite:
+                # Rewritten stats make the cached rule set scores of these games stale
+                invalidate_scores(cur, combined_stats_df['game_id'].unique())
+        # Keep per-player aggregates in step with the rows just written
+        person_ids = combined_stats_df['personId'].dropna().unique()
+        with stage('player_box', 'refresh_aggregates', rows=len(person_ids)):
+            refresh_player_fpm(cur, person_ids)
+            refresh_player_features(cur, person_ids)
+            refresh_dvp_incremental(cur, combined_stats_df['game_id'].unique())
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+# Function to rebuild player_box from the raw boxscore cache
+def replay_boxscores_from_cache(batch_size=250):
+    """
+    Rebuilds player_box rows from every cached payload without any HTTP requests.
+    Games are scored and written in batches, and existing rows are overwritten so
+    scoring or schema changes are picked up.
+
+    Returns:
+        tuple[int, int]: Counts of replayed and failed games.
+    """
+    if not os.path.isdir(BOX_FOLDER):
+        return 0, 0
+
+    game_ids = sorted(name[:-len('.json.gz')] for name in os.listdir(BOX_FOLDER) if name.endswith('.json.gz'))
+    replayed, failed = 0, 0
+    ensure_player_box_table()
+    with get_connection() as conn:
+        for start in range(0, len(game_ids), batch_size):
+            records, batch_games = [], 0
+            for game_id in game_ids[start:start + batch_size]:
+                game_stats_dict = load_cached_boxscore(game_id)
+                if game_stats_dict is None:
+                    failed += 1
+                    continue
+                records.extend(boxscore_player_records(game_id, game_stats_dict))
+                batch_games += 1
+            if not records:
+                continue
+            try:
+                save_boxscore_dataframe(build_player_box_dataframe(records), conn=conn, overwrite=True)
+                replayed += batch_games
+            except Exception as e:
+                failed += batch_games
+                print(f"Error replaying boxscore batch starting at game {game_ids[start]}: {e}")
+    return replayed, failed
+
+# Function to fetch and save boxscore data
+def fetch_and_save_boxscore(game_id, bucket=None, max_retries=0, use_cache=True):
+    try:
+        print(f"Fetching boxscore for game_id: {game_id}")
+        game_stats_dict = fetch_boxscore(game_id, bucket=bucket, max_retries=max_retries, use_cache=use_cache)
+        save_boxscore_dataframe(build_boxscore_dataframe(game_id, game_stats_dict))
+        print(f"Boxscore for game {game_id} processed successfully.")
+        return True
+    except Exception as e:
+        print(f"Error fetching or saving boxscore for game {game_id}: {e}")
+        return False
+
+# Function to ingest many games concurrently
+def ingest_boxscores(game_ids, workers=4, rate=2.0, burst=4, max_retries=5, use_cache=True):
+    """
+    Fetches boxscores on a thread pool under a shared token bucket and inserts
+    them from the calling thread as they complete, so fetching keeps going while
+    earlier games are transformed and written.
+
+    Args:
+        game_ids (list[str]): Game IDs to ingest.
+        workers (int): Maximum concurrent requests.
+        rate (float): Maximum requests per second; the bucket adapts below it on throttling.
+        burst (int): Token bucket capacity.
+        max_retries (int): Retries with exponential backoff per game.
+        use_cache (bool): Serve and store payloads through the raw boxscore cache.
+
+    Returns:
+        tuple[int, int]: Counts of processed and failed games.
+    """
+    ensure_player_box_table()
+    bucket = TokenBucket(rate, capacity=burst)
+    processed, failed = 0, 0
+    pending = {}
+    game_iter = iter(game_ids)
+
+    def submit_next(executor):
+        game_id = next(game_iter, None)
+        if game_id is not None:
+            future = executor.submit(fetch_boxscore, game_id, bucket, max_retries, use_cache)
+            pending[future] = game_id
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # Keep a bounded number of payloads in flight
+        for _ in range(workers * 2):
+            submit_next(executor)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                game_id = pending.pop(future)
+                submit_next(executor)
+                try:
+                    save_boxscore_dataframe(build_boxscore_dataframe(game_id, future.result()))
+                    processed += 1
+                    print(f"Boxscore for game {game_id} processed successfully ({bucket.rate:.2f} req/s).")
+                except Exception as e:
+                    failed += 1
+                    print(f"Error fetching or saving boxscore for game {game_id}: {e}")
+
+    return processed, failed
+
+# Main Execution
+if __name__ == '__main__':
+    print(f"Database Host: {DB_HOST}")
+
+    arg_parser = argparse.ArgumentParser(description="Load NBA boxscores into the player_box table.")
+    arg_parser.add_argument('--workers', type=int, default=4, help="Concurrent boxscore requests.")
+    arg_parser.add_argument('--rate', type=float, default=2.0, help="Maximum requests per second.")
+    arg_parser.add_argument('--burst', type=int, default=4, help="Token bucket burst size.")
+    arg_parser.add_argument('--retries', type=int, default=5, help="Retries per game with exponential backoff.")
+    arg_parser.add_argument('--sequential', action='store_true', help="Fetch one game at a time with a fixed 5 second delay.")
+    arg_parser.add_argument('--replay', action='store_true', help="Rebuild player_box from the raw boxscore cache only.")
+    arg_parser.add_argument('--backfill-minutes', action='store_true', help="Fill numeric playing time for existing rows and rebuild player_fpm.")
+    arg_parser.add_argument('--backfill-game-dates', action='store_true', help="Copy game_date from the games table onto existing rows.")
+    arg_parser.add_argument('--no-cache', action='store_true', help="Always fetch from the network and skip the raw boxscore cache.")
+    args = arg_parser.parse_args()
+
+    os.makedirs(BOX_FOLDER, exist_ok=True)
+
+    if args.backfill_minutes:
+        with get_cursor() as cur:
+            updated = backfill_minutes_played(cur)
+        print(f"Backfilled playing time for {updated} player_box rows.")
+        print_summary('player_box')
+        raise SystemExit(0)
+
+    if args.backfill_game_dates:
+        with get_cursor() as cur:
+            create_player_box_table(cur)
+            with stage('player_box', 'backfill_game_dates'):
+                updated = fill_game_dates(cur)
+            add_rows('player_box', 'backfill_game_dates', updated)
+        print(f"Backfilled game_date for {updated} player_box rows.")
+        print_summary('player_box')
+        raise SystemExit(0)
+
+    if args.replay:
+        start = time.monotonic()
+        replayed, failed = replay_boxscores_from_cache()
+        elapsed = time.monotonic() - start
+        print(f"Replayed {replayed} cached games ({failed} failed) in {elapsed:.1f}s.")
+        print_summary('player_box')
+        raise SystemExit(0)
+
+    team_ids = get_team_ids()
+    print(f"Loaded {len(team_ids)} team IDs.")
+
+    game_ids = get_filtered_games(team_ids)
+    print(f"Found {len(game_ids)} unique game IDs to process.")
+
+    if args.sequential:
+        for game_id in game_ids:
+            should_delay = fetch_and_save_boxscore(game_id, use_cache=not args.no_cache)
+            if should_delay:
+                time.sleep(5)
+    else:
+        start = time.monotonic()
+        processed, failed = ingest_boxscores(
+            game_ids, workers=args.workers, rate=args.rate, burst=args.burst, max_retries=args.retries,
+            use_cache=not args.no_cache
+        )
+        elapsed = time.monotonic() - start
+        print(f"Processed {processed} games ({failed} failed) in {elapsed:.1f}s.")
+
+    evicted = evict_box_cache(max_bytes=BOX_CACHE_MAX_BYTES, max_age_days=BOX_CACHE_MAX_AGE_DAYS)
+    if evicted:
+        print(f"Evicted {evicted} entries from the boxscore cache.")
+
+    print_summary('player_box')
\ No newline at end of file
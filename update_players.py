@@ -1,28 +1,16 @@
 import pandas as pd
-import psycopg2
-from dotenv import load_dotenv
-import os
+from nba_api.stats.static import players
+from psycopg2.extras import execute_values
+from db import get_connection
+from player_names import ensure_name_tables, mark_player_index_stale
 
-# Load environment variables from .env file
-load_dotenv()
-
-DB_HOST = os.getenv('DB_HOST')
-DB_USER = os.getenv('DB_USER')
-DB_PASS = os.getenv('DB_PASS')
-DB_NAME = os.getenv('DB_NAME')
-
-def connect_to_postgres():
-    try:
-        conn = psycopg2.connect(
-            host=DB_HOST,
-            user=DB_USER,
-            password=DB_PASS,
-            dbname=DB_NAME
-        )
-        return conn
-    except Exception as e:
-        print(f"Error connecting to PostgreSQL: {e}")
-        raise
+def fetch_players():
+    """
+    Returns every player bundled with nba_api as a DataFrame. No network request is made.
+    """
+    players_data = players.get_players()
+    print("Number of players fetched: {}".format(len(players_data)))
+    return pd.DataFrame(players_data)
 
 def create_player_ids_table(conn):
     cur = conn.cursor()
@@ -31,11 +19,14 @@ def create_player_ids_table(conn):
             CREATE TABLE IF NOT EXISTS player_ids (
                 id INT PRIMARY KEY,
                 full_name TEXT NOT NULL,
-                is_active BOOLEAN NOT NULL
+                is_active BOOLEAN NOT NULL,
+                shortname TEXT
             )
         '''
 
         cur.execute(create_sql)
+        # Tables created before the shortname match key existed
+        ensure_name_tables(cur)
         conn.commit()
         print("Table 'player_ids' created successfully.")
     except Exception as e:
@@ -45,33 +36,50 @@ def create_player_ids_table(conn):
 
 def append_new_player_ids(conn, df):
     try:
-        for index, row in df.iterrows():
-            insert_sql = '''
-                INSERT INTO player_ids (id, full_name, is_active)
-                VALUES (%s, %s, %s)
-                ON CONFLICT (id) DO UPDATE
-                SET is_active = EXCLUDED.is_active;
-            '''
-
-            conn.cursor().execute(insert_sql, (
-                row['id'], row['full_name'], row['is_active']
-            ))
+        insert_sql = '''
+            INSERT INTO player_ids (id, full_name, is_active)
+            VALUES %s
+            ON CONFLICT (id) DO UPDATE
+            SET full_name = EXCLUDED.full_name, is_active = EXCLUDED.is_active,
+                -- A renamed player's match key is recomputed by player_names.backfill_shortnames
+                shortname = CASE
+                    WHEN player_ids.full_name IS DISTINCT FROM EXCLUDED.full_name THEN NULL
+                    ELSE player_ids.shortname
+                END
+            WHERE (player_ids.full_name, player_ids.is_active)
+                IS DISTINCT FROM (EXCLUDED.full_name, EXCLUDED.is_active);
+        '''
+        rows = [
+            (int(row.id), row.full_name, bool(row.is_active))
+            for row in df[['id', 'full_name', 'is_active']].itertuples(index=False)
+        ]
 
+        with conn.cursor() as cur:
+            execute_values(cur, insert_sql, rows, page_size=1000)
         conn.commit()
         print("Player IDs inserted/updated successfully in the 'player_ids' table.")
     except Exception as e:
         print(f"Error inserting/updating player IDs: {e}")
 
-if __name__ == '__main__':
-    # Step 1: Create the player_ids table if it doesn't exist
-    conn = connect_to_postgres()
-    create_player_ids_table(conn)
+def update_players(df_players=None):
+    """
+    Stores the nba_api players and makes every process reload its name index.
+
+    Returns:
+        int: Number of players stored.
+    """
+    df_players = fetch_players() if df_players is None else df_players
+
+    with get_connection() as conn:
+        # Step 1: Create the player_ids table if it doesn't exist
+        create_player_ids_table(conn)
 
-    # Step 2: Append new player IDs to the table
-    df_players = pd.DataFrame({
-        'id': [1, 2, 3],
-        'full_name': ['John Doe', 'Jane Smith', 'Bob Johnson'],
-        'is_active': [True, False, True]
-    })
+        # Step 2: Append new player IDs to the table
+        append_new_player_ids(conn, df_players)
 
-    append_new_player_ids(conn, df_players)
+    # Step 3: Make every process reload its player name index
+    mark_player_index_stale()
+    return len(df_players)
+
+if __name__ == '__main__':
+    update_players()